@@ -8,18 +8,70 @@ Ce programme expose une API REST pour interroger les collections Qdrant
 
 import os
 import traceback
+from contextlib import asynccontextmanager
 from typing import List, Optional, Union, Any   
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
+from openai import RateLimitError
 from pydantic import BaseModel
 from main import QdrantSystem
+from query_system import InvalidCursorError, STATS_MONTHS
+from openai_scheduler import AdmissionRejected
+
+try:
+    import orjson
+except ImportError:  # Sérialisation avec le module json standard
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # Compression gzip uniquement
+    BrotliMiddleware = None
+
+# Taille minimale (octets) d'une réponse pour qu'elle soit compressée
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
+# Nombre de processus uvicorn (variable standard reconnue par uvicorn et gunicorn)
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+
+class FastJSONResponse(JSONResponse):
+    """Réponse JSON sérialisée avec orjson (json standard si orjson n'est pas installé)"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
+
+# Système Qdrant du worker courant
+clients_file = "ListeClients.csv"
+qdrant_system: Optional[QdrantSystem] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Crée le système Qdrant au démarrage de chaque worker, après le fork :
+    les connexions Qdrant/OpenAI et les pools de threads ne sont jamais
+    partagés entre processus.
+    """
+    global qdrant_system
+    qdrant_system = QdrantSystem(clients_file)
+    print(f"[🚀 Worker {os.getpid()}] Système Qdrant initialisé")
+    yield
+
 
 # Création de l'application FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     title="IT SPIRIT - API Qdrant",
     description="API pour interroger les collections Qdrant contenant des informations sur les clients IT SPIRIT et les systèmes ERP",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configuration CORS pour permettre les requêtes cross-origin
@@ -31,9 +83,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialisation du système Qdrant
-clients_file = "ListeClients.csv"
-qdrant_system = QdrantSystem(clients_file)
+# Compression des réponses volumineuses (brotli si disponible et accepté par le client, sinon gzip)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
 
 class SearchRequest(BaseModel):
     query: str
@@ -42,6 +96,16 @@ class SearchRequest(BaseModel):
     format: Optional[str] = "Summary"
     recentOnly: Optional[bool] = False
     limit: Optional[int] = 5
+    cursor: Optional[str] = None
+    deadlineMs: Optional[int] = None
+
+class StatsRequest(BaseModel):
+    collections: Optional[List[str]] = None
+    client: Optional[str] = None
+    erp: Optional[str] = None
+    recentOnly: Optional[bool] = False
+    groupBy: Optional[str] = None
+    months: Optional[int] = None
 
 class TicketPayload(BaseModel):
     client: str
@@ -58,17 +122,24 @@ class SearchResponse(BaseModel):
     format: str
     content: Any
     sources: str
+    cursor: Optional[str] = None
+    speculation: Optional[str] = None
+    degradations: List[str] = []
 
 class SummaryResponse(BaseModel):
     format: str
     content: List[str]
     sources: str
+    cursor: Optional[str] = None
+    speculation: Optional[str] = None
+    degradations: List[str] = []
 @app.get("/")
 async def root():
     """Point de terminaison racine pour vérifier que l'API est en ligne"""
     return {"status": "online", "message": "API Qdrant d'IT SPIRIT opérationnelle"}
 
-@app.post("/api/search", response_model=Union[SearchResponse, SummaryResponse])
+# Schéma de réponse pour la documentation OpenAPI seulement : la réponse est validée et sérialisée dans la route
+@app.post("/api/search", responses={200: {"model": Union[SearchResponse, SummaryResponse]}})
 async def search(request: SearchRequest):
     """Point de terminaison pour effectuer une recherche dans les collections Qdrant"""
     try:
@@ -79,31 +150,76 @@ async def search(request: SearchRequest):
         print(f"Format: {request.format}")
         print(f"Recent only: {request.recentOnly}")
         print(f"Limit: {request.limit}")
+        print(f"Cursor: {request.cursor}")
+        print(f"Deadline: {request.deadlineMs}")
 
         # Traitement de la requête
-        result = qdrant_system.process_query(
+        # Exécution dans un thread pour ne pas bloquer la boucle d'événements :
+        # les requêtes identiques concurrentes peuvent ainsi être regroupées
+        result = await run_in_threadpool(
+            qdrant_system.process_query,
             query=request.query,
             client_name=request.client,
             erp=request.erp,
             recent_only=request.recentOnly,
             limit=request.limit,
-            format_type=request.format
+            format_type=request.format,
+            cursor=request.cursor,
+            deadline_ms=request.deadlineMs
         )
 
         print(f"Résultat: {result}")
 
-        # Adaptation dynamique du modèle de retour selon le format
+        # Adaptation dynamique du modèle de retour selon le format.
+        # Le modèle est validé une seule fois ici puis sérialisé directement
+        # (la route n'a pas de response_model, qui validerait une seconde fois).
         format_type = result.get("format", request.format)
+        response_model = SummaryResponse if format_type in ("Summary", "Summary-fast") else SearchResponse
 
-        if format_type == "Summary":
-            return SummaryResponse(**result)
-        else:
-            return SearchResponse(**result)
+        return FastJSONResponse(response_model(**result).model_dump())
+
+    except AdmissionRejected as e:
+        # Quota OpenAI saturé : le client doit réessayer plus tard
+        print(f"Requête refusée: {str(e)}")
+        return FastJSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={
+                "format": "Error",
+                "content": [str(e)],
+                "sources": ""
+            }
+        )
+
+    except RateLimitError as e:
+        # Quota OpenAI dépassé malgré l'ordonnanceur (quota partagé avec d'autres applications)
+        print(f"Quota OpenAI dépassé: {str(e)}")
+        return FastJSONResponse(
+            status_code=429,
+            headers={"Retry-After": "60"},
+            content={
+                "format": "Error",
+                "content": ["Quota OpenAI dépassé, réessayer dans 60s"],
+                "sources": ""
+            }
+        )
+
+    except InvalidCursorError as e:
+        # Curseur de pagination invalide
+        print(f"Requête invalide: {str(e)}")
+        return FastJSONResponse(
+            status_code=400,
+            content={
+                "format": "Error",
+                "content": [str(e)],
+                "sources": ""
+            }
+        )
 
     except Exception as e:
         print(f"Erreur lors du traitement de la requête: {str(e)}")
         traceback.print_exc()
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={
                 "format": "Error",
@@ -121,6 +237,37 @@ async def get_clients():
         return {"clients": [], "error": str(e)}
 
 
+@app.post("/api/stats")
+async def get_stats(request: StatsRequest):
+    """Compte les documents (par statut, priorité, résolution, ERP ou mois) sans transférer de payloads"""
+    try:
+        result = await run_in_threadpool(
+            qdrant_system.get_stats,
+            collections=request.collections,
+            client_name=request.client,
+            erp=request.erp,
+            recent_only=request.recentOnly,
+            group_by=request.groupBy,
+            months=request.months or STATS_MONTHS
+        )
+        return FastJSONResponse(result)
+
+    except ValueError as e:
+        # Regroupement ou collection inconnus
+        return FastJSONResponse(status_code=400, content={"error": str(e)})
+
+    except Exception as e:
+        print(f"Erreur lors du calcul des statistiques: {str(e)}")
+        traceback.print_exc()
+        return FastJSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Retourne les métriques de fonctionnement (requêtes regroupées, etc.)"""
+    return qdrant_system.get_metrics()
+
+
 @app.get("/api/test")
 async def test():
     """
@@ -141,6 +288,6 @@ async def test():
 
 if __name__ == "__main__":
     import uvicorn
-    # Démarrage du serveur avec Uvicorn
+    # Démarrage du serveur avec Uvicorn (un processus par worker)
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=False)
+    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=False, workers=WEB_CONCURRENCY)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Indexation des documents longs par fragments
+Les documents volumineux (texte des PDF de SAP et NETSUITE_DUMMIES, pages
+CONFLUENCE) sont découpés en fragments qui se chevauchent, vectorisés un par
+un et écrits dans une collection compagnon (<COLLECTION>_CHUNKS). Chaque
+fragment porte l'identifiant de son document (parent_id) et ses métadonnées
+(client, ERP, dates, titre, URL...) : les filtres habituels s'y appliquent et
+la recherche groupée renvoie le meilleur fragment de chaque document.
+
+Utilisation :
+    python chunking.py                     # SAP, NETSUITE_DUMMIES et CONFLUENCE
+    python chunking.py CONFLUENCE
+    python chunking.py --force SAP         # redécoupe aussi les documents inchangés
+"""
+
+import os
+import sys
+import uuid
+from time import time
+from typing import Callable, Dict, List
+
+from qdrant_client.http.models import (Distance, FieldCondition, Filter, FilterSelector, MatchAny, MatchValue,
+                                       PayloadSchemaType, PointStruct, VectorParams)
+
+from context_packer import count_tokens, split_passages
+from hit_formatter import document_hash
+
+# Collections dont la collection de fragments est alimentée : la recherche y est groupée par document
+CHUNKED_COLLECTIONS = [c.strip() for c in os.getenv("CHUNKED_COLLECTIONS", "").split(",") if c.strip()]
+CHUNK_COLLECTION_SUFFIX = os.getenv("CHUNK_COLLECTION_SUFFIX", "_CHUNKS")
+
+# Taille d'un fragment et chevauchement entre deux fragments consécutifs (en tokens)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "80"))
+
+# Champs du document recopiés dans chaque fragment (filtres et affichage)
+PARENT_FIELDS = (
+    "client", "erp", "created", "updated", "summary", "title", "source_type", "assignee", "url",
+    "pdf_path", "key", "ticket_id", "status", "priority", "content_hash",
+)
+
+# Champs contenant le corps du document, par ordre de préférence
+BODY_FIELDS = ("text", "content", "description")
+
+DEFAULT_COLLECTIONS = ["SAP", "NETSUITE_DUMMIES", "CONFLUENCE"]
+SCROLL_BATCH_SIZE = 64
+EMBEDDING_BATCH_SIZE = 64
+
+
+def chunk_collection_name(collection_name: str) -> str:
+    """Nom de la collection de fragments d'une collection"""
+    return f"{collection_name}{CHUNK_COLLECTION_SUFFIX}"
+
+
+def _split_long_passage(passage: str, max_tokens: int) -> List[str]:
+    """Découpe par mots un passage sans ponctuation plus long qu'un fragment"""
+    words = passage.split()
+    pieces, piece = [], []
+    for word in words:
+        piece.append(word)
+        if count_tokens(" ".join(piece)) > max_tokens and len(piece) > 1:
+            piece.pop()
+            pieces.append(" ".join(piece))
+            piece = [word]
+    if piece:
+        pieces.append(" ".join(piece))
+    return pieces
+
+
+def split_chunks(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Découpe un texte en fragments qui se chevauchent
+
+    Les fragments suivent les limites des paragraphes et des phrases ; chaque
+    fragment reprend la fin du précédent sur environ overlap_tokens tokens.
+
+    Args:
+        text: Texte à découper
+        max_tokens: Taille maximale d'un fragment
+        overlap_tokens: Chevauchement entre deux fragments consécutifs
+
+    Returns:
+        Liste des fragments dans l'ordre du texte
+    """
+    passages = []
+    for passage in split_passages(text, min(max_tokens, 120)):
+        if count_tokens(passage) > max_tokens:
+            passages.extend(_split_long_passage(passage, max_tokens))
+        else:
+            passages.append(passage)
+
+    chunks, window, window_tokens = [], [], 0
+    for passage in passages:
+        tokens = count_tokens(passage) + 1  # Séparateur entre passages
+        if window and window_tokens + tokens > max_tokens:
+            chunks.append("\n".join(p for p, _ in window))
+            # Le fragment suivant reprend les derniers passages du précédent
+            overlap, overlap_total = [], 0
+            for previous in reversed(window):
+                if overlap_total + previous[1] > overlap_tokens or overlap_total + previous[1] + tokens > max_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_total += previous[1]
+            window, window_tokens = overlap, overlap_total
+        window.append((passage, tokens))
+        window_tokens += tokens
+    if window:
+        chunks.append("\n".join(p for p, _ in window))
+    return chunks
+
+
+def build_chunks(collection_name: str, point_id, payload: Dict[str, object]) -> List[Dict[str, object]]:
+    """
+    Construit les payloads des fragments d'un document
+
+    Args:
+        collection_name: Collection du document
+        point_id: Identifiant du document
+        payload: Payload du document
+
+    Returns:
+        Payloads des fragments (corps du fragment dans content), vide si le document n'a pas de corps
+    """
+    body = next((payload[f] for f in BODY_FIELDS if payload.get(f)), "")
+    parent = {key: payload[key] for key in PARENT_FIELDS if key in payload}
+    parent_hash = document_hash(payload)
+    chunks = []
+    for index, chunk in enumerate(split_chunks(str(body))):
+        chunks.append({
+            **parent,
+            "parent_id": str(point_id),
+            "parent_collection": collection_name,
+            "parent_hash": parent_hash,
+            "chunk_index": index,
+            "content": chunk,
+        })
+    return chunks
+
+
+def chunk_point_id(collection_name: str, parent_id, index: int) -> str:
+    """Identifiant stable d'un fragment"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{collection_name}/{parent_id}/{index}"))
+
+
+def _indexed_parents(client, target: str) -> Dict[str, str]:
+    """Empreinte de chaque document déjà découpé (lue sur son premier fragment)"""
+    parents, offset = {}, None
+    while True:
+        points, offset = client.scroll(
+            collection_name=target,
+            scroll_filter=Filter(must=[FieldCondition(key="chunk_index", match=MatchValue(value=0))]),
+            limit=256,
+            offset=offset,
+            with_payload=["parent_id", "parent_hash"],
+            with_vectors=False
+        )
+        for point in points:
+            parents[point.payload["parent_id"]] = point.payload.get("parent_hash")
+        if offset is None:
+            return parents
+
+
+def _delete_parents(client, target: str, parent_ids: List[str]):
+    if parent_ids:
+        client.delete(
+            collection_name=target,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="parent_id", match=MatchAny(any=parent_ids))
+            ]))
+        )
+
+
+def chunk_collection(client, collection_name: str, embed: Callable[[List[str]], List[List[float]]],
+                     force: bool = False) -> Dict[str, int]:
+    """
+    Met à jour la collection de fragments d'une collection
+
+    Seuls les documents nouveaux ou dont l'empreinte a changé sont redécoupés ;
+    les fragments des documents supprimés sont retirés.
+
+    Args:
+        client: Client Qdrant
+        collection_name: Collection des documents
+        embed: Fonction vectorisant une liste de textes
+        force: Redécoupe tous les documents
+
+    Returns:
+        Compteurs : documents découpés, inchangés, retirés et fragments écrits
+    """
+    target = chunk_collection_name(collection_name)
+    exists = client.collection_exists(target)
+    indexed = _indexed_parents(client, target) if exists else {}
+    stats = {"documents": 0, "unchanged": 0, "removed": 0, "chunks": 0}
+    seen = set()
+    offset = None
+
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=SCROLL_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False
+        )
+        changed, pending = [], []
+        for point in points:
+            parent_id = str(point.id)
+            seen.add(parent_id)
+            payload = point.payload or {}
+            if not force and parent_id in indexed and indexed[parent_id] == document_hash(payload):
+                stats["unchanged"] += 1
+                continue
+            changed.append(parent_id)
+            pending.extend(build_chunks(collection_name, point.id, payload))
+            stats["documents"] += 1
+
+        # Les anciens fragments des documents modifiés sont remplacés
+        _delete_parents(client, target, [p for p in changed if p in indexed])
+        for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+            batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+            vectors = embed([chunk["content"] for chunk in batch])
+            if not exists:
+                client.create_collection(target, vectors_config=VectorParams(size=len(vectors[0]),
+                                                                             distance=Distance.COSINE))
+                client.create_payload_index(target, "parent_id", PayloadSchemaType.KEYWORD)
+                client.create_payload_index(target, "chunk_index", PayloadSchemaType.INTEGER)
+                exists = True
+            client.upsert(target, points=[
+                PointStruct(id=chunk_point_id(collection_name, chunk["parent_id"], chunk["chunk_index"]),
+                            vector=vector, payload=chunk)
+                for chunk, vector in zip(batch, vectors)
+            ])
+            stats["chunks"] += len(batch)
+
+        if offset is None:
+            break
+
+    removed = [parent_id for parent_id in indexed if parent_id not in seen]
+    _delete_parents(client, target, removed)
+    stats["removed"] = len(removed)
+    return stats
+
+
+def main():
+    """Met à jour les collections de fragments demandées"""
+    from openai_scheduler import BATCH, openai_priority
+    from query_system import QdrantSystem
+
+    args = sys.argv[1:]
+    force = "--force" in args
+    collections = [a for a in args if a != "--force"] or DEFAULT_COLLECTIONS
+    system = QdrantSystem("ListeClients.csv")
+
+    # Traitement par lot : les appels OpenAI passent après les recherches interactives
+    with openai_priority(BATCH):
+        for collection_name in collections:
+            start = time()
+            stats = chunk_collection(system.client, collection_name, system.create_embeddings, force)
+            print(f"[🧩 Fragments] {collection_name}: {stats} en {time() - start:.1f}s")
+    print(f"[🧩 Fragments] Ajouter {','.join(collections)} à CHUNKED_COLLECTIONS pour activer la recherche groupée")
+
+
+if __name__ == "__main__":
+    main()
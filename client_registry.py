@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Registre des clients IT SPIRIT (ListeClients.csv)
+Le fichier est lu une seule fois, puis surveillé en arrière-plan : lorsqu'il
+change, le dictionnaire des clients, l'index de détection des noms et la table
+des identifiants de chaque client par collection (JIRA, ZENDESK, CONFLUENCE)
+sont reconstruits puis substitués en une seule affectation. Les requêtes ne
+lisent jamais le fichier et voient toujours un état complet (ancien ou nouveau).
+"""
+
+import csv
+import os
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from fuzzywuzzy import fuzz
+
+# Intervalle (secondes) de vérification des modifications du fichier clients
+CLIENTS_RELOAD_INTERVAL_S = float(os.getenv("CLIENTS_RELOAD_INTERVAL_S", "10"))
+
+# Score minimal d'une correspondance approchée entre la requête et un nom de client
+CLIENT_MATCH_MIN_SCORE = 80
+
+CLIENT_FIELDS = [('consultant', 'Consultant'), ('statut', 'Statut'), ('jira', 'JIRA'),
+                 ('zendesk', 'ZENDESK'), ('confluence', 'CONFLUENCE'), ('erp', 'ERP')]
+
+# Colonne du CSV donnant l'identifiant du client dans chaque collection
+# (les autres collections utilisent le nom canonique)
+ALIAS_COLUMNS = {"JIRA": "JIRA", "ZENDESK": "ZENDESK", "CONFLUENCE": "CONFLUENCE"}
+
+
+def normalize_string(text: str) -> str:
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8')
+    return text.upper().strip()
+
+
+def read_client_rows(clients_file: str) -> List[Dict[str, str]]:
+    """
+    Lit les lignes du fichier clients
+
+    Args:
+        clients_file: Chemin vers le fichier CSV contenant les informations clients
+
+    Returns:
+        Lignes du fichier ayant un nom de client
+
+    Raises:
+        ValueError: Si des colonnes attendues sont absentes du fichier
+    """
+    with open(clients_file, 'r', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f, delimiter=';')
+        missing = {'Client'} | {csv_field for _, csv_field in CLIENT_FIELDS}
+        missing -= set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Colonnes absentes: {', '.join(sorted(missing))}")
+        return [row for row in reader if (row.get('Client') or '').strip()]
+
+
+def merge_clients(rows: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """Regroupe les lignes par client (les lignes suivantes complètent les champs vides)"""
+    clients = {}
+    for row in rows:
+        client_name = row['Client'].strip()
+        if client_name not in clients:
+            clients[client_name] = {field: row[csv_field] for field, csv_field in CLIENT_FIELDS}
+        # Si le client existe déjà, on ne met à jour que les champs vides
+        else:
+            for field, csv_field in CLIENT_FIELDS:
+                if not clients[client_name][field] and row[csv_field]:
+                    clients[client_name][field] = row[csv_field]
+    return clients
+
+
+def build_alias_table(rows: List[Dict[str, str]]) -> Dict[str, Dict[str, Tuple[str, ...]]]:
+    """
+    Construit la table des identifiants de chaque client par collection
+
+    Toutes les lignes d'un client sont prises en compte (un client peut avoir
+    plusieurs projets JIRA ou organisations ZENDESK).
+
+    Args:
+        rows: Lignes du fichier clients
+
+    Returns:
+        Dictionnaire {collection: {client: (nom canonique, identifiants...)}}
+    """
+    table = {collection: {} for collection in ALIAS_COLUMNS}
+    for row in rows:
+        client_name = row['Client'].strip()
+        for collection, column in ALIAS_COLUMNS.items():
+            aliases = table[collection].setdefault(client_name, [client_name])
+            alias = (row.get(column) or '').strip()
+            if alias and alias not in aliases:
+                aliases.append(alias)
+    return {collection: {name: tuple(aliases) for name, aliases in clients.items()}
+            for collection, clients in table.items()}
+
+
+def load_clients(clients_file: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Charge les informations clients depuis le fichier CSV
+
+    Args:
+        clients_file: Chemin vers le fichier CSV contenant les informations clients
+
+    Returns:
+        Dictionnaire des clients avec leurs informations
+
+    Raises:
+        ValueError: Si des colonnes attendues sont absentes du fichier
+    """
+    return merge_clients(read_client_rows(clients_file))
+
+
+class ClientIndex:
+    """État immuable du registre : clients, noms normalisés et identifiants par collection"""
+
+    def __init__(self, rows: List[Dict[str, str]], mtime: float = None):
+        self.clients = merge_clients(rows)
+        self.mtime = mtime
+        # Noms normalisés une fois pour toutes, dans l'ordre du fichier
+        self.names = [(name, normalize_string(name)) for name in self.clients]
+        self.aliases = build_alias_table(rows)
+        # Nom canonique à partir du nom ou de n'importe quel identifiant
+        self.canonical = {}
+        for name, normalized in self.names:
+            self.canonical.setdefault(normalized, name)
+        for clients in self.aliases.values():
+            for name, aliases in clients.items():
+                for alias in aliases:
+                    self.canonical.setdefault(normalize_string(alias), name)
+
+    def canonical_name(self, client_name: str) -> Optional[str]:
+        """Nom canonique d'un client à partir de son nom ou d'un identifiant (None si inconnu)"""
+        return self.canonical.get(normalize_string(client_name))
+
+    def client_aliases(self, client_name: str, collection_name: str = None) -> List[str]:
+        """
+        Valeurs du champ client désignant ce client dans une collection
+
+        Args:
+            client_name: Nom canonique ou identifiant du client
+            collection_name: Collection interrogée (None : nom canonique seul)
+
+        Returns:
+            Liste des valeurs possibles (la valeur reçue seule si le client est inconnu)
+        """
+        canonical = self.canonical.get(normalize_string(client_name))
+        if canonical is None:
+            return [client_name]
+        aliases = self.aliases.get(collection_name, {}).get(canonical, (canonical,))
+        return list(aliases)
+
+    def match(self, query: str) -> Tuple[Optional[str], float, dict]:
+        """
+        Détecte un nom de client dans une requête utilisateur
+
+        Args:
+            query: Requête utilisateur
+
+        Returns:
+            Tuple (nom_client, score, source), (None, 0.0, {}) si aucun client n'est reconnu
+        """
+        if not query or len(query.strip()) < 2:
+            return None, 0.0, {}
+
+        query_normalized = normalize_string(query)
+
+        # Match exact
+        for client_name, normalized in self.names:
+            if normalized in query_normalized:
+                return client_name, 100.0, {"source": client_name}
+
+        # Match flou
+        best_match, best_score = None, 0
+        for client_name, normalized in self.names:
+            score = fuzz.ratio(query_normalized, normalized)
+            if score > best_score:
+                best_match, best_score = client_name, score
+
+        if best_match and best_score >= CLIENT_MATCH_MIN_SCORE:
+            return best_match, best_score, {"source": best_match}
+        return None, 0.0, {}
+
+
+class ClientRegistry:
+    """Registre des clients rechargé automatiquement lorsque le fichier CSV change"""
+
+    def __init__(self, clients_file: str, reload_interval: float = CLIENTS_RELOAD_INTERVAL_S):
+        self.clients_file = clients_file
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.index = ClientIndex(read_client_rows(clients_file), self._mtime())
+
+    @property
+    def clients(self) -> Dict[str, Dict[str, Any]]:
+        return self.index.clients
+
+    def match(self, query: str) -> Tuple[Optional[str], float, dict]:
+        return self.index.match(query)
+
+    def client_aliases(self, client_name: str, collection_name: str = None) -> List[str]:
+        return self.index.client_aliases(client_name, collection_name)
+
+    def canonical_name(self, client_name: str) -> Optional[str]:
+        return self.index.canonical_name(client_name)
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.clients_file).st_mtime
+        except OSError:
+            return None
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recharge le fichier s'il a été modifié depuis le dernier chargement
+
+        Un fichier illisible ou absent laisse le registre inchangé.
+
+        Returns:
+            True si un nouvel état a été substitué
+        """
+        with self._lock:
+            mtime = self._mtime()
+            if mtime is None or mtime == self.index.mtime:
+                return False
+            try:
+                index = ClientIndex(read_client_rows(self.clients_file), mtime)
+            except Exception as e:
+                print(f"[⚠️ Clients] Rechargement de {self.clients_file} impossible: {e}")
+                return False
+            if self._mtime() != mtime:
+                # Fichier en cours d'écriture : nouvel essai au prochain passage
+                return False
+            # Substitution atomique : les requêtes en cours gardent l'ancien état
+            self.index = index
+            self.reloads += 1
+        print(f"[👥 Clients] {len(index.clients)} clients rechargés depuis {self.clients_file}")
+        return True
+
+    def start(self):
+        """Démarre la surveillance du fichier en arrière-plan"""
+        with self._lock:
+            if self._thread is not None or self.reload_interval <= 0:
+                return
+            self._thread = threading.Thread(target=self._watch, name="client-registry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            self.reload_if_changed()
+
+
+_registries: Dict[Tuple[int, str], ClientRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(clients_file: str) -> ClientRegistry:
+    """Registre partagé d'un fichier clients, créé et surveillé au premier appel de chaque processus"""
+    # Le processus est inclus dans la clé : après un fork, le thread de surveillance n'existe plus
+    path = (os.getpid(), os.path.abspath(clients_file))
+    with _registries_lock:
+        registry = _registries.get(path)
+        if registry is None:
+            registry = ClientRegistry(clients_file)
+            registry.start()
+            _registries[path] = registry
+        return registry
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Regroupement des requêtes identiques concurrentes (single-flight)
+Lorsqu'une requête identique est déjà en cours de traitement, les appels
+suivants attendent son résultat au lieu de relancer enrichissement,
+embeddings, recherches Qdrant et synthèse.
+"""
+
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    """Calcul en cours, partagé par tous les appelants d'une même clé"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Exécute une seule fois les appels concurrents portant la même clé"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Exécute fn, ou attend le résultat d'un appel identique déjà en cours
+
+        Args:
+            key: Clé identifiant la requête
+            fn: Calcul à exécuter
+
+        Returns:
+            Résultat du calcul (partagé entre les appelants regroupés)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """Compteurs de requêtes exécutées, regroupées et en cours"""
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": in_flight}
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Assemblage du contexte envoyé au LLM pour les formats Summary et Guide
+Ce module compte les tokens avec un tokenizer local, sélectionne les passages
+les plus pertinents de chaque document et respecte un budget de tokens.
+"""
+
+import math
+import re
+import unicodedata
+from typing import List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Le comptage approximatif est utilisé à la place
+    tiktoken = None
+
+# Encodage utilisé par gpt-4o-mini
+ENCODING_NAME = "o200k_base"
+
+# Taille maximale d'un passage avant découpage en phrases
+PASSAGE_MAX_TOKENS = 120
+
+# Mots vides ignorés pour le calcul de pertinence
+STOP_WORDS = {
+    "LE", "LA", "LES", "UN", "UNE", "DES", "DU", "DE", "ET", "OU", "EN", "AU", "AUX",
+    "CE", "CES", "CET", "CETTE", "SUR", "PAR", "POUR", "DANS", "AVEC", "SANS", "QUI",
+    "QUE", "QUOI", "EST", "SONT", "PAS", "PLUS", "NE", "SE", "SA", "SON", "SES", "LEUR",
+    "NOUS", "VOUS", "ILS", "ELLE", "ELLES", "THE", "AND", "FOR", "WITH", "FROM",
+}
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+
+# Séparateurs du contexte : entre l'en-tête et les passages d'un document, entre deux documents
+LINE_SEPARATOR = "\n"
+BLOCK_SEPARATOR = "\n\n"
+
+_encoding = None
+
+
+def _get_encoding():
+    """Charge l'encodage tiktoken une seule fois (None si indisponible)"""
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            except Exception as e:
+                print(f"[⚠️] Tokenizer {ENCODING_NAME} indisponible, comptage approximatif: {e}")
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Compte les tokens d'un texte
+
+    Args:
+        text: Texte à mesurer
+
+    Returns:
+        Nombre de tokens (exact avec tiktoken, approximatif sinon)
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Approximation : un token par mot ou ponctuation, au moins un token pour 4 caractères
+    return max(len(_WORD_RE.findall(text)), math.ceil(len(text) / 4))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Tronque un texte pour qu'il tienne dans un nombre de tokens
+
+    Args:
+        text: Texte à tronquer
+        max_tokens: Nombre maximal de tokens
+
+    Returns:
+        Texte tronqué
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+    words = text.split()
+    truncated = " ".join(words[:max_tokens])
+    return truncated[:max_tokens * 4]
+
+
+def extract_terms(text: str) -> set:
+    """
+    Extrait les termes significatifs d'un texte (majuscules, sans accents ni mots vides)
+
+    Args:
+        text: Texte à analyser
+
+    Returns:
+        Ensemble des termes
+    """
+    if not text:
+        return set()
+    normalized = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8').upper()
+    return {w for w in re.findall(r"\w+", normalized) if len(w) >= 3 and w not in STOP_WORDS}
+
+
+def split_passages(text: str, max_tokens: int = PASSAGE_MAX_TOKENS) -> List[str]:
+    """
+    Découpe un texte en passages (paragraphes, puis groupes de phrases si trop longs)
+
+    Args:
+        text: Texte à découper
+        max_tokens: Taille maximale d'un passage
+
+    Returns:
+        Liste des passages dans l'ordre du texte
+    """
+    passages = []
+    for paragraph in _PARAGRAPH_RE.split(text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            passages.append(paragraph)
+            continue
+
+        group, group_tokens = [], 0
+        for sentence in _SENTENCE_RE.split(paragraph):
+            sentence_tokens = count_tokens(sentence)
+            if group and group_tokens + sentence_tokens > max_tokens:
+                passages.append(" ".join(group))
+                group, group_tokens = [], 0
+            group.append(sentence)
+            group_tokens += sentence_tokens
+        if group:
+            passages.append(" ".join(group))
+    return passages
+
+
+def pack_context(query: str, documents: List[Tuple[str, str]], budget: int) -> Tuple[str, int]:
+    """
+    Construit le contexte à envoyer au LLM dans la limite d'un budget de tokens.
+
+    Chaque document est représenté par son en-tête (résumé) suivi des passages
+    de son corps les plus proches de la requête. Les en-têtes sont ajoutés dans
+    l'ordre de classement des documents, puis les passages par pertinence
+    décroissante tant que le budget le permet.
+
+    Args:
+        query: Requête utilisateur servant à évaluer la pertinence des passages
+        documents: Liste de tuples (en-tête, corps) dans l'ordre de classement
+        budget: Budget maximal de tokens
+
+    Returns:
+        Tuple (contexte assemblé, nombre de tokens du contexte)
+    """
+    query_terms = extract_terms(query)
+    remaining = budget
+    line_tokens = count_tokens(LINE_SEPARATOR)
+    block_tokens = count_tokens(BLOCK_SEPARATOR)
+    headers = []
+
+    for header, _ in documents:
+        header = (header or "").strip()
+        # Chaque document après le premier est précédé d'un séparateur de bloc
+        separator_tokens = block_tokens if headers else 0
+        header_tokens = count_tokens(header)
+        if separator_tokens + header_tokens > remaining:
+            if not headers:
+                # Premier document trop long : on le tronque plutôt que de tout perdre
+                header = truncate_to_tokens(header, remaining)
+                header_tokens = count_tokens(header)
+            else:
+                break
+        headers.append(header)
+        remaining -= separator_tokens + header_tokens
+
+    candidates = []
+    for doc_index, (_, body) in enumerate(documents[:len(headers)]):
+        for position, passage in enumerate(split_passages(body)):
+            overlap = len(query_terms & extract_terms(passage))
+            # Léger bonus pour le début du document, souvent le plus informatif
+            relevance = overlap + (0.5 if position == 0 else 0.0)
+            candidates.append((-relevance, doc_index, position, passage))
+    candidates.sort(key=lambda c: c[:3])
+
+    selected = [[] for _ in headers]
+    for _, doc_index, position, passage in candidates:
+        # Un passage est séparé de l'en-tête ou du passage précédent par un retour à la ligne ;
+        # le séparateur de bloc d'un document sans en-tête est déjà compté avec l'en-tête vide
+        separator_tokens = line_tokens if headers[doc_index] or selected[doc_index] else 0
+        passage_tokens = separator_tokens + count_tokens(passage)
+        if passage_tokens <= remaining:
+            selected[doc_index].append((position, passage))
+            remaining -= passage_tokens
+
+    blocks = []
+    for header, passages in zip(headers, selected):
+        parts = [header] if header else []
+        parts.extend(passage for _, passage in sorted(passages))
+        if parts:
+            blocks.append(LINE_SEPARATOR.join(parts))
+
+    context = BLOCK_SEPARATOR.join(blocks)
+    return context, count_tokens(context)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Contrôle de fraîcheur des copies de collections
+Les copies construites par des traitements hors ligne (collections réduites de
+embedding_migration.py, collections partitionnées de sharding.py) ne suivent
+pas l'ingestion, qui écrit dans la collection d'origine. Avant de servir une
+copie, on compare périodiquement son nombre de points à celui de l'origine :
+une copie en retard n'est pas utilisée et l'écart est signalé.
+
+La comparaison (deux comptages exacts, soit un parcours complet de chaque
+collection) est faite par une seule requête à la fois : pendant qu'elle
+s'exécute, les autres requêtes gardent le dernier résultat connu.
+
+Le nombre de points ne révèle que les ajouts et les suppressions : une
+modification du payload ou du vecteur d'un point existant (réindexation sous
+le même identifiant) laisse les nombres égaux et n'est pas détectée. Après une
+telle mise à jour, la copie doit être reconstruite.
+"""
+
+import os
+import threading
+from time import monotonic
+from typing import Dict, Optional, Set, Tuple
+
+# Durée de validité d'une comparaison des nombres de points (secondes)
+COPY_SYNC_CHECK_S = float(os.getenv("COPY_SYNC_CHECK_S", "300"))
+
+# Écart de points toléré entre une collection et sa copie
+COPY_SYNC_TOLERANCE = int(os.getenv("COPY_SYNC_TOLERANCE", "0"))
+
+
+class CopySyncChecker:
+    """Compare, au plus une fois par période, le nombre de points d'une collection et de sa copie"""
+
+    def __init__(self, ttl: float = COPY_SYNC_CHECK_S, tolerance: int = COPY_SYNC_TOLERANCE):
+        self.ttl = ttl
+        self.tolerance = tolerance
+        # (origine, copie) -> (date de la comparaison, écart de points ; None si illisible)
+        self._checks: Dict[Tuple[str, str], Tuple[float, Optional[int]]] = {}
+        # Comparaisons en cours (une seule à la fois par couple)
+        self._refreshing: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def lag(self, client, source: str, copy: str) -> Optional[int]:
+        """
+        Points de l'origine absents de la copie (négatif si la copie en a trop)
+
+        Une seule requête refait une comparaison périmée ; les requêtes concurrentes
+        reçoivent le dernier écart connu (None avant la première comparaison :
+        la copie n'est alors pas servie).
+
+        Args:
+            client: Client Qdrant
+            source: Collection d'origine
+            copy: Copie de la collection
+
+        Returns:
+            Écart de points, ou None si les nombres de points n'ont pas pu être lus
+        """
+        key = (source, copy)
+        with self._lock:
+            checked = self._checks.get(key)
+            if checked is not None and (monotonic() - checked[0] < self.ttl or key in self._refreshing):
+                return checked[1]
+            if key in self._refreshing:
+                return None
+            self._refreshing.add(key)
+        lag = None
+        try:
+            lag = (client.count(source, exact=True).count
+                   - client.count(copy, exact=True).count)
+        except Exception as e:
+            print(f"[🔄 Copies] Comparaison {source} / {copy} impossible: {e}")
+        finally:
+            with self._lock:
+                self._checks[key] = (monotonic(), lag)
+                self._refreshing.discard(key)
+        if lag:
+            print(f"[🔄 Copies] {copy} en retard sur {source} ({lag:+d} points), copie non utilisée")
+        return lag
+
+    def in_sync(self, client, source: str, copy: str) -> bool:
+        """Indique si la copie peut être servie à la place de l'origine"""
+        lag = self.lag(client, source, copy)
+        return lag is not None and abs(lag) <= self.tolerance
+
+    def snapshot(self) -> Dict[str, Optional[int]]:
+        """Dernier écart connu de chaque copie"""
+        with self._lock:
+            return {copy: lag for (_, copy), (_, lag) in self._checks.items()}
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Échéance (budget de latence) d'une requête
+Chaque requête reçoit une échéance, transmise à toutes les étapes du
+traitement par le contexte d'exécution (comme la priorité OpenAI). Lorsque le
+budget restant devient trop faible, chaque étape choisit un mode moins coûteux :
+règles locales au lieu de l'enrichissement par le modèle, moins de collections
+interrogées, résumé extractif (Summary) ou résultats au format Detail (Guide)
+au lieu d'une synthèse par le modèle. Les dégradations appliquées sont
+indiquées dans la réponse.
+"""
+
+import math
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import List, Optional
+
+# Budget total d'une requête en millisecondes (0 : pas d'échéance), modifiable par requête
+REQUEST_DEADLINE_MS = int(os.getenv("REQUEST_DEADLINE_MS", "15000"))
+
+# Budget restant minimal pour enrichir la requête par le modèle (sinon règles locales)
+DEADLINE_ENRICHMENT_MS = int(os.getenv("DEADLINE_ENRICHMENT_MS", "5000"))
+# Budget restant minimal pour interroger une collection de plus (la première l'est toujours)
+DEADLINE_SEARCH_MS = int(os.getenv("DEADLINE_SEARCH_MS", "500"))
+# Budget restant minimal pour synthétiser les résultats (Summary, Guide ; sinon format Detail)
+DEADLINE_SYNTHESIS_MS = int(os.getenv("DEADLINE_SYNTHESIS_MS", "3000"))
+
+# Délai minimal laissé à un appel, même échéance dépassée
+MIN_CALL_TIMEOUT_S = 0.1
+
+# Dégradations signalées dans la réponse
+LOCAL_RULES = "local_rules"
+FEWER_COLLECTIONS = "fewer_collections"
+DETAIL_INSTEAD_OF_SYNTHESIS = "detail_instead_of_synthesis"
+EXTRACTIVE_INSTEAD_OF_SYNTHESIS = "extractive_instead_of_synthesis"
+# Collections indisponibles ou en erreur : résultats partiels (jamais mis en cache)
+PARTIAL_RESULTS = "partial_results"
+
+
+class Deadline:
+    """Échéance d'une requête et dégradations appliquées pour la respecter (budget infini : sans échéance)"""
+
+    def __init__(self, budget_ms: float = math.inf):
+        self.budget_ms = budget_ms
+        self.expires_at = monotonic() + budget_ms / 1000
+        self.degradations: List[str] = []
+        self._lock = threading.Lock()
+
+    def remaining_ms(self) -> float:
+        """Budget restant en millisecondes (négatif une fois l'échéance dépassée)"""
+        return (self.expires_at - monotonic()) * 1000
+
+    def allows(self, needed_ms: float) -> bool:
+        """Indique s'il reste au moins needed_ms millisecondes"""
+        return self.remaining_ms() >= needed_ms
+
+    def timeout(self, timeout_s: float) -> float:
+        """Délai d'un appel, réduit au budget restant"""
+        return max(MIN_CALL_TIMEOUT_S, min(timeout_s, self.remaining_ms() / 1000))
+
+    def degrade(self, degradation: str, reason: str):
+        """Enregistre une dégradation (une seule fois par type)"""
+        with self._lock:
+            if degradation in self.degradations:
+                return
+            self.degradations.append(degradation)
+        remaining_ms = self.remaining_ms()
+        remaining = f" ({remaining_ms:.0f} ms restantes)" if math.isfinite(remaining_ms) else ""
+        print(f"[⏱️ Échéance] {degradation}: {reason}{remaining}")
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(budget_ms: Optional[float] = None):
+    """
+    Fixe l'échéance des traitements effectués dans ce contexte
+
+    Args:
+        budget_ms: Budget en millisecondes (REQUEST_DEADLINE_MS par défaut, 0 : pas d'échéance)
+
+    Yields:
+        Deadline, ou None sans échéance
+    """
+    budget_ms = REQUEST_DEADLINE_MS if budget_ms is None else budget_ms
+    deadline = Deadline(budget_ms) if budget_ms > 0 else None
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Échéance de la requête en cours (None hors requête ou sans échéance)"""
+    return _deadline.get()
+
+
+def retry_allowed() -> bool:
+    """Indique si le budget restant de la requête en cours permet une nouvelle tentative"""
+    deadline = _deadline.get()
+    return deadline is None or deadline.allows(MIN_CALL_TIMEOUT_S * 1000)
+
+
+def call_timeout(timeout_s: float) -> float:
+    """Délai d'un appel réseau, réduit au budget restant de la requête en cours"""
+    deadline = _deadline.get()
+    return deadline.timeout(timeout_s) if deadline else timeout_s
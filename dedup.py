@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Élimination des quasi-doublons entre collections
+Un même incident existe souvent dans JIRA, ZENDESK et CONFLUENCE avec un texte
+presque identique. Ce module calcule une empreinte par point (SimHash 64 bits
+du résumé et du contenu, plus content_hash si disponible comme clé exacte) et
+écarte les copies.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Empreinte d'un point : (clés exactes, SimHash ou None)
+Fingerprint = Tuple[Tuple[str, ...], Optional[int]]
+
+# Distance de Hamming maximale entre deux SimHash considérés comme doublons
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+
+# Nombre maximal d'empreintes conservées en cache
+FINGERPRINT_CACHE_SIZE = int(os.getenv("FINGERPRINT_CACHE_SIZE", "50000"))
+
+# Longueur maximale du texte utilisé pour le calcul du SimHash
+FINGERPRINT_MAX_CHARS = 4000
+
+# En dessous de ce nombre de mots distincts, le SimHash n'est pas fiable :
+# seuls les textes identiques sont alors considérés comme doublons
+SIMHASH_MIN_WORDS = 8
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class FingerprintCache:
+    """Cache LRU des empreintes, indexé par (collection, identifiant du point, content_hash, empreinte du texte)"""
+
+    def __init__(self, max_size: int = FINGERPRINT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+fingerprint_cache = FingerprintCache()
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    Calcule le SimHash 64 bits d'un texte (mots normalisés pondérés par leur fréquence)
+
+    Args:
+        text: Texte à empreinter
+
+    Returns:
+        Empreinte sur 64 bits, ou None si le texte ne contient aucun mot
+    """
+    normalized = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8').upper()
+    counts = Counter(_WORD_RE.findall(normalized))
+    if not counts:
+        return None
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little") for w in counts],
+        dtype=np.uint64
+    )
+    weights = np.array(list(counts.values()), dtype=np.int64)
+
+    # Matrice (mots x 64 bits), chaque bit vaut +poids ou -poids
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little").astype(np.int64)
+    votes = ((bits * 2 - 1) * weights[:, None]).sum(axis=0)
+
+    packed = np.packbits(votes > 0, bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+
+def fingerprint_text(payload: Dict[str, Any]) -> str:
+    """Texte empreinté d'un payload : résumé et corps, tronqués à FINGERPRINT_MAX_CHARS"""
+    summary = payload.get("summary") or payload.get("title") or ""
+    body = payload.get("content") or payload.get("text") or payload.get("description") or ""
+    return f"{summary}\n{body}"[:FINGERPRINT_MAX_CHARS]
+
+
+def compute_fingerprint(payload: Dict[str, Any]) -> Optional[Fingerprint]:
+    """
+    Calcule l'empreinte d'un payload
+
+    Le SimHash du texte est toujours calculé, afin qu'un point muni de
+    content_hash soit aussi comparé aux copies qui n'en ont pas (ou dont le
+    content_hash diffère pour un texte quasi identique). content_hash n'est
+    qu'une clé exacte supplémentaire.
+
+    Args:
+        payload: Payload Qdrant du point
+
+    Returns:
+        (clés exactes, SimHash) : clés "hash:<content_hash>" et, pour un texte
+        trop court pour le SimHash, "text:<empreinte du texte normalisé>" ;
+        None si le payload ne contient ni content_hash ni texte exploitable
+    """
+    keys = []
+    content_hash = payload.get("content_hash")
+    if content_hash:
+        keys.append(f"hash:{content_hash}")
+
+    text = fingerprint_text(payload)
+    words = _WORD_RE.findall(unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8').upper())
+    text_hash = None
+    if len(set(words)) >= SIMHASH_MIN_WORDS:
+        text_hash = simhash(text)
+    elif words:
+        keys.append("text:" + hashlib.blake2b(" ".join(words).encode(), digest_size=16).hexdigest())
+    if not keys and text_hash is None:
+        return None
+    return (tuple(keys), text_hash)
+
+
+def get_fingerprint(collection_name: str, point_id, payload: Dict[str, Any]) -> Optional[Fingerprint]:
+    """
+    Retourne l'empreinte d'un point, calculée une seule fois par contenu
+
+    La clé du cache contient, outre l'identifiant du point, content_hash et une
+    empreinte du texte : un point réindexé sous le même identifiant avec un
+    nouveau texte, ou un autre fragment d'un même document (recherche groupée,
+    où l'identifiant est celui du document), est empreinté à nouveau.
+
+    Args:
+        collection_name: Nom de la collection du point
+        point_id: Identifiant Qdrant du point (None si inconnu : pas de mise en cache)
+        payload: Payload du point
+
+    Returns:
+        Empreinte du point (voir compute_fingerprint)
+    """
+    if point_id is None:
+        return compute_fingerprint(payload)
+
+    text_hash = hashlib.blake2b(fingerprint_text(payload).encode("utf-8"), digest_size=16).hexdigest()
+    key = (collection_name, point_id, payload.get("content_hash"), text_hash)
+    fingerprint = fingerprint_cache.get(key)
+    if fingerprint is None:
+        fingerprint = compute_fingerprint(payload) or ((), None)
+        fingerprint_cache.set(key, fingerprint)
+    return fingerprint if fingerprint != ((), None) else None
+
+
+class HitDeduplicator:
+    """Filtre les résultats d'une requête déjà vus sous une forme quasi identique"""
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.hashes = set()
+        self.simhashes = []
+        self.duplicates = 0
+
+    def is_duplicate(self, collection_name: str, point_id, payload: Dict[str, Any]) -> bool:
+        """
+        Indique si un résultat est un doublon d'un résultat déjà retenu, et l'enregistre sinon
+
+        Args:
+            collection_name: Nom de la collection du résultat
+            point_id: Identifiant Qdrant du point
+            payload: Payload du point
+
+        Returns:
+            True si le résultat doit être écarté
+        """
+        fingerprint = get_fingerprint(collection_name, point_id, payload)
+        if fingerprint is None:
+            return False
+
+        keys, text_hash = fingerprint
+        duplicate = any(key in self.hashes for key in keys)
+        if not duplicate and text_hash is not None:
+            duplicate = any(bin(text_hash ^ seen).count("1") <= self.max_distance for seen in self.simhashes)
+        # Les clés d'un doublon sont aussi retenues : une autre copie peut ne partager que celles-ci
+        self.hashes.update(keys)
+        if not duplicate and text_hash is not None:
+            self.simhashes.append(text_hash)
+
+        if duplicate:
+            self.duplicates += 1
+        return duplicate
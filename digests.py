@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Digests précalculés des documents
+Ce traitement hors ligne parcourt les collections et écrit dans le payload de
+chaque point un court résumé (digest_abstract, généré par gpt-4o-mini) et la
+liste de ses étapes (digest_steps, extraites localement). L'empreinte du
+contenu utilisée est conservée dans digest_hash : un point n'est recalculé
+que lorsque son content_hash change. Les formats Summary et Guide envoient ces
+digests au LLM à la place du texte brut des documents.
+
+Utilisation :
+    python digests.py                      # toutes les collections
+    python digests.py JIRA ZENDESK
+    python digests.py --force SAP          # recalcule aussi les digests à jour
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Callable, Dict, Optional, Tuple
+
+from context_packer import truncate_to_tokens
+from hit_formatter import document_hash, document_text
+from segmenter import extract_steps
+from speculation import submit_in_context
+
+# Collections dont les documents reçoivent un digest
+DIGEST_COLLECTIONS = ["JIRA", "ZENDESK", "CONFLUENCE", "SAP", "NETSUITE"]
+
+# Taille du texte envoyé au modèle, du résumé produit et nombre d'étapes conservées
+DIGEST_INPUT_TOKENS = int(os.getenv("DIGEST_INPUT_TOKENS", "2000"))
+DIGEST_ABSTRACT_TOKENS = int(os.getenv("DIGEST_ABSTRACT_TOKENS", "120"))
+DIGEST_MAX_STEPS = int(os.getenv("DIGEST_MAX_STEPS", "12"))
+
+# Nombre de résumés demandés en parallèle (le débit reste limité par l'ordonnanceur OpenAI)
+DIGEST_WORKERS = int(os.getenv("DIGEST_WORKERS", "4"))
+
+SCROLL_BATCH_SIZE = 64
+
+abstract_prompt = """
+Tu résumes des documents de support (tickets, pages de documentation) pour IT SPIRIT.
+Rédige en français un résumé factuel de 2 à 3 phrases : le problème ou le sujet,
+la cause si elle est connue, et la solution ou la procédure appliquée.
+Ne mentionne ni les personnes ni les dates. Réponds uniquement par le résumé.
+"""
+
+
+def build_digest(text: str, summarize: Callable[[str], str]) -> Dict[str, object]:
+    """
+    Calcule le digest d'un document
+
+    Args:
+        text: Texte complet du document
+        summarize: Fonction produisant le résumé d'un texte
+
+    Returns:
+        Champs digest_abstract et digest_steps du payload
+    """
+    steps = extract_steps(text)[:DIGEST_MAX_STEPS]
+    abstract = summarize(truncate_to_tokens(text, DIGEST_INPUT_TOKENS))
+    return {"digest_abstract": abstract, "digest_steps": steps}
+
+
+def needs_digest(payload: Dict[str, object], force: bool = False) -> Optional[Tuple[str, str]]:
+    """
+    Indique si un point doit recevoir un nouveau digest
+
+    Args:
+        payload: Payload Qdrant du point
+        force: Recalcule même si le digest correspond au contenu
+
+    Returns:
+        Tuple (texte, empreinte) du document à digérer, None s'il est à jour ou vide
+    """
+    text = document_text(payload)
+    if not text.strip():
+        return None
+    content_hash = document_hash(payload, text)
+    if not force and payload.get("digest_hash") == content_hash and payload.get("digest_abstract"):
+        return None
+    return text, content_hash
+
+
+def digest_collection(client, collection_name: str, summarize: Callable[[str], str],
+                      force: bool = False) -> Tuple[int, int]:
+    """
+    Met à jour les digests d'une collection
+
+    Args:
+        client: Client Qdrant
+        collection_name: Nom de la collection
+        summarize: Fonction produisant le résumé d'un texte
+        force: Recalcule tous les digests
+
+    Returns:
+        Tuple (points mis à jour, points déjà à jour ou sans texte)
+    """
+    updated = skipped = 0
+    offset = None
+    with ThreadPoolExecutor(max_workers=DIGEST_WORKERS) as executor:
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=SCROLL_BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            pending = []
+            for point in points:
+                todo = needs_digest(point.payload or {}, force)
+                if todo is None:
+                    skipped += 1
+                    continue
+                text, content_hash = todo
+                # Le contexte (priorité BATCH) est transmis aux threads de résumé
+                pending.append((point.id, content_hash, submit_in_context(executor, build_digest, text, summarize)))
+
+            for point_id, content_hash, future in pending:
+                try:
+                    digest = future.result()
+                except Exception as e:
+                    print(f"[⚠️ Digest] {collection_name}/{point_id}: {e}")
+                    continue
+                digest["digest_hash"] = content_hash
+                client.set_payload(collection_name=collection_name, payload=digest, points=[point_id])
+                updated += 1
+
+            if offset is None:
+                break
+    return updated, skipped
+
+
+def main():
+    """Met à jour les digests des collections demandées (toutes par défaut)"""
+    from openai_scheduler import BATCH, openai_priority
+    from query_system import QdrantSystem
+
+    args = sys.argv[1:]
+    force = "--force" in args
+    collections = [a for a in args if a != "--force"] or DIGEST_COLLECTIONS
+    system = QdrantSystem("ListeClients.csv")
+
+    def summarize(text: str) -> str:
+        return system.create_completion(
+            messages=[
+                {"role": "system", "content": abstract_prompt},
+                {"role": "user", "content": text}
+            ],
+            temperature=0.0,
+            max_tokens=DIGEST_ABSTRACT_TOKENS
+        )
+
+    # Traitement par lot : les appels OpenAI passent après les recherches interactives
+    with openai_priority(BATCH):
+        for collection_name in collections:
+            start = time()
+            updated, skipped = digest_collection(system.client, collection_name, summarize, force)
+            print(f"[🧾 Digests] {collection_name}: {updated} mis à jour, {skipped} inchangés "
+                  f"en {time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
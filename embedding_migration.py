@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Migration vers un modèle d'embedding de dimension réduite
+Les collections actuelles stockent des vecteurs text-embedding-ada-002 (1536
+dimensions). Ce module construit des collections « ombre » (<COLLECTION>_SMALL)
+vectorisées par un modèle plus récent à dimension réduite (256 à 512), compare
+les deux chemins sur un échantillon du trafic (double lecture : overlap@k et
+latences) et bascule chaque collection sur sa version réduite une fois le
+rappel jugé suffisant.
+
+Les scores cosinus des deux modèles n'ont pas la même échelle (environ 0.75 à
+0.9 pour ada-002, 0.3 à 0.6 pour text-embedding-3-small) : les scores du modèle
+réduit sont ramenés sur l'échelle d'ada-002 par une transformation affine
+(SHADOW_SCORE_SCALE, SHADOW_SCORE_OFFSET) avant d'être fusionnés ou comparés aux
+seuils (EARLY_STOP_SCORE, HIT_USEFUL_SCORE). La double lecture propose les
+valeurs de cette transformation à partir des scores observés sur le trafic.
+
+Les collections réduites ne suivent pas l'ingestion : ce module est à relancer
+après chaque indexation (il supprime aussi les points disparus de l'origine).
+Une collection basculée dont la version réduite n'a pas le même nombre de points
+que l'origine est servie par ada-002 jusqu'à la reconstruction (voir copy_sync.py :
+comptage périodique, par une seule requête à la fois ; les modifications de
+texte d'un point existant ne sont pas détectées).
+
+Utilisation :
+    python embedding_migration.py                  # toutes les collections
+    python embedding_migration.py JIRA ZENDESK
+    python embedding_migration.py --force SAP      # revectorise aussi les documents inchangés
+"""
+
+import hashlib
+import os
+import re
+import sys
+import threading
+from collections import defaultdict
+from time import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from context_packer import truncate_to_tokens
+from hit_formatter import document_hash, document_text
+
+# Modèle et dimension des collections réduites
+SHADOW_EMBEDDING_MODEL = os.getenv("SHADOW_EMBEDDING_MODEL", "text-embedding-3-small")
+SHADOW_EMBEDDING_DIM = int(os.getenv("SHADOW_EMBEDDING_DIM", "512"))
+SHADOW_COLLECTION_SUFFIX = os.getenv("SHADOW_COLLECTION_SUFFIX", "_SMALL")
+
+# Collections dont la version réduite existe (double lecture possible)
+SHADOW_COLLECTIONS = [c.strip() for c in os.getenv("SHADOW_COLLECTIONS", "").split(",") if c.strip()]
+# Collections servies par leur version réduite
+SHADOW_CUTOVER_COLLECTIONS = [c.strip() for c in os.getenv("SHADOW_CUTOVER_COLLECTIONS", "").split(",") if c.strip()]
+
+# Double lecture : proportion des requêtes comparées et nombre de résultats comparés
+DUAL_READ_SAMPLE_RATE = float(os.getenv("DUAL_READ_SAMPLE_RATE", "0"))
+DUAL_READ_K = int(os.getenv("DUAL_READ_K", "10"))
+DUAL_READ_WORKERS = int(os.getenv("DUAL_READ_WORKERS", "2"))
+
+# Bascule : rappel moyen minimal (overlap@k) et nombre de comparaisons requis
+CUTOVER_MIN_OVERLAP = float(os.getenv("CUTOVER_MIN_OVERLAP", "0.8"))
+CUTOVER_MIN_SAMPLES = int(os.getenv("CUTOVER_MIN_SAMPLES", "200"))
+# Bascule automatique d'une collection dès que ces seuils sont atteints
+SHADOW_AUTO_CUTOVER = os.getenv("SHADOW_AUTO_CUTOVER", "false").lower() == "true"
+
+# Calibration des scores du modèle réduit sur l'échelle d'ada-002 : score × SCALE + OFFSET
+SHADOW_SCORE_SCALE = float(os.getenv("SHADOW_SCORE_SCALE", "0.5"))
+SHADOW_SCORE_OFFSET = float(os.getenv("SHADOW_SCORE_OFFSET", "0.6"))
+
+# Taille maximale du texte vectorisé (limite des modèles OpenAI : 8191 tokens)
+EMBEDDING_INPUT_TOKENS = 8000
+
+DEFAULT_COLLECTIONS = ["JIRA", "CONFLUENCE", "ZENDESK", "NETSUITE", "NETSUITE_DUMMIES", "SAP"]
+SCROLL_BATCH_SIZE = 64
+
+
+class EmbeddingSpace:
+    """Modèle d'embedding et collections associées"""
+
+    __slots__ = ("name", "model", "dimensions", "suffix", "score_scale", "score_offset")
+
+    def __init__(self, name: str, model: str, dimensions: Optional[int], suffix: str,
+                 score_scale: float = 1.0, score_offset: float = 0.0):
+        self.name = name
+        self.model = model
+        self.dimensions = dimensions  # None : dimension native du modèle
+        self.suffix = suffix
+        # Transformation des scores vers l'échelle d'ada-002
+        self.score_scale = score_scale
+        self.score_offset = score_offset
+
+    def collection_name(self, collection_name: str) -> str:
+        """Collection Qdrant contenant les vecteurs de ce modèle"""
+        return f"{collection_name}{self.suffix}"
+
+    def calibrate(self, score: float) -> float:
+        """Score ramené sur l'échelle d'ada-002 (fusion des résultats et seuils)"""
+        return score * self.score_scale + self.score_offset
+
+    def raw_score(self, score: float) -> float:
+        """Score cosinus d'origine d'un score calibré"""
+        return (score - self.score_offset) / self.score_scale
+
+    def cache_key(self, text: str) -> str:
+        """Clé du cache partagé des embeddings"""
+        if self.dimensions is None:
+            return f"{self.model}:{text}"
+        return f"{self.model}/{self.dimensions}:{text}"
+
+    def __repr__(self):
+        return f"EmbeddingSpace({self.name})"
+
+
+LEGACY_SPACE = EmbeddingSpace("ada-002", "text-embedding-ada-002", None, "")
+SHADOW_SPACE = EmbeddingSpace("reduit", SHADOW_EMBEDDING_MODEL, SHADOW_EMBEDDING_DIM, SHADOW_COLLECTION_SUFFIX,
+                              SHADOW_SCORE_SCALE, SHADOW_SCORE_OFFSET)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class StubEmbedder:
+    """
+    Embeddings déterministes sans appel réseau (tests et essais hors ligne)
+
+    Chaque mot est projeté par hachage sur une dimension, avec un signe : deux
+    textes partageant des mots ont des vecteurs proches, quel que soit l'espace.
+    """
+
+    def __init__(self, default_dimensions: int = 1536):
+        self.default_dimensions = default_dimensions
+
+    def __call__(self, texts: List[str], space: EmbeddingSpace) -> List[List[float]]:
+        dimensions = space.dimensions or self.default_dimensions
+        vectors = []
+        for text in texts:
+            vector = np.zeros(dimensions, dtype=np.float32)
+            for token in _TOKEN_RE.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vector[value % dimensions] += 1.0 if value >> 63 else -1.0
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                vector[0], norm = 1.0, 1.0
+            vectors.append((vector / norm).tolist())
+        return vectors
+
+
+def overlap_at_k(reference_ids: List[Any], candidate_ids: List[Any], k: int = DUAL_READ_K) -> float:
+    """
+    Proportion des k premiers résultats de référence retrouvés parmi les k premiers candidats
+
+    Args:
+        reference_ids: Identifiants renvoyés par le chemin de référence (ada-002)
+        candidate_ids: Identifiants renvoyés par le chemin réduit
+        k: Nombre de résultats comparés
+
+    Returns:
+        Overlap@k entre 0 et 1 (1 si la référence est vide)
+    """
+    reference = {str(i) for i in reference_ids[:k]}
+    if not reference:
+        return 1.0
+    return len(reference & {str(i) for i in candidate_ids[:k]}) / len(reference)
+
+
+class DualReadStats:
+    """Résultats de la double lecture par collection"""
+
+    def __init__(self, min_overlap: float = CUTOVER_MIN_OVERLAP, min_samples: int = CUTOVER_MIN_SAMPLES):
+        self.min_overlap = min_overlap
+        self.min_samples = min_samples
+        self._stats = defaultdict(lambda: {"samples": 0, "overlap": 0.0, "legacy_ms": 0.0, "shadow_ms": 0.0})
+        # Scores des deux chemins (rang par rang, scores cosinus d'origine) pour la calibration
+        self._scores = defaultdict(lambda: {"n": 0, "legacy": 0.0, "legacy_sq": 0.0, "shadow": 0.0, "shadow_sq": 0.0})
+        self._lock = threading.Lock()
+
+    def record(self, collection_name: str, overlap: float, legacy_ms: float, shadow_ms: float,
+               legacy_scores: List[float] = (), shadow_scores: List[float] = ()):
+        with self._lock:
+            stats = self._stats[collection_name]
+            stats["samples"] += 1
+            stats["overlap"] += overlap
+            stats["legacy_ms"] += legacy_ms
+            stats["shadow_ms"] += shadow_ms
+            scores = self._scores[collection_name]
+            for legacy, shadow in zip(legacy_scores, shadow_scores):
+                scores["n"] += 1
+                scores["legacy"] += legacy
+                scores["legacy_sq"] += legacy * legacy
+                scores["shadow"] += shadow
+                scores["shadow_sq"] += shadow * shadow
+
+    def calibration(self, collection_name: str) -> Optional[Dict[str, float]]:
+        """
+        Transformation affine alignant moyenne et écart type des scores réduits sur ceux d'ada-002
+
+        Returns:
+            Dictionnaire {"scale", "offset"}, ou None sans scores comparables
+        """
+        with self._lock:
+            scores = dict(self._scores.get(collection_name) or {})
+        n = scores.get("n", 0)
+        if n < 2:
+            return None
+        legacy_mean, shadow_mean = scores["legacy"] / n, scores["shadow"] / n
+        legacy_var = max(scores["legacy_sq"] / n - legacy_mean ** 2, 0.0)
+        shadow_var = max(scores["shadow_sq"] / n - shadow_mean ** 2, 0.0)
+        if shadow_var == 0:
+            return None
+        scale = (legacy_var / shadow_var) ** 0.5
+        return {"scale": round(scale, 3), "offset": round(legacy_mean - scale * shadow_mean, 3)}
+
+    def ready(self, collection_name: str) -> bool:
+        """Indique si la version réduite d'une collection peut la remplacer"""
+        with self._lock:
+            stats = self._stats.get(collection_name)
+            return bool(stats and stats["samples"] >= self.min_samples
+                        and stats["overlap"] / stats["samples"] >= self.min_overlap)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Moyennes par collection : overlap@k, latences des deux chemins, bascule possible"""
+        with self._lock:
+            items = [(name, dict(stats)) for name, stats in self._stats.items()]
+        summary = {}
+        for name, stats in items:
+            samples = stats["samples"]
+            summary[name] = {
+                "samples": samples,
+                f"overlap_at_{DUAL_READ_K}": round(stats["overlap"] / samples, 3),
+                "legacy_ms": round(stats["legacy_ms"] / samples, 1),
+                "shadow_ms": round(stats["shadow_ms"] / samples, 1),
+                "ready": self.ready(name),
+                "score_calibration": self.calibration(name),
+            }
+        return summary
+
+
+def build_shadow_collection(client, collection_name: str, embed: Callable[[List[str]], List[List[float]]],
+                            force: bool = False) -> Dict[str, int]:
+    """
+    Construit ou met à jour la version réduite d'une collection
+
+    Les points gardent leur identifiant et leur payload ; seul le vecteur change.
+    Un point dont l'empreinte (embedding_hash) n'a pas changé n'est pas revectorisé,
+    et les points supprimés de la collection d'origine le sont aussi de la version réduite.
+
+    Args:
+        client: Client Qdrant
+        collection_name: Collection d'origine
+        embed: Fonction vectorisant une liste de textes avec le modèle réduit
+        force: Revectorise tous les points
+
+    Returns:
+        Compteurs : points vectorisés, inchangés et supprimés
+    """
+    target = SHADOW_SPACE.collection_name(collection_name)
+    if not client.collection_exists(target):
+        client.create_collection(target, vectors_config=VectorParams(size=SHADOW_EMBEDDING_DIM,
+                                                                     distance=Distance.COSINE))
+        source = client.get_collection(collection_name)
+        for field, schema in (source.payload_schema or {}).items():
+            client.create_payload_index(target, field, schema.data_type)
+
+    stats = {"embedded": 0, "unchanged": 0, "deleted": 0}
+    source_ids = set()
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=SCROLL_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False
+        )
+        existing = {}
+        if points and not force:
+            existing = {p.id: (p.payload or {}).get("embedding_hash") for p in client.retrieve(
+                target, ids=[p.id for p in points], with_payload=["embedding_hash"], with_vectors=False)}
+
+        pending = []
+        for point in points:
+            source_ids.add(point.id)
+            payload = dict(point.payload or {})
+            text = document_text(payload)
+            content_hash = document_hash(payload, text)
+            if existing.get(point.id) == content_hash:
+                stats["unchanged"] += 1
+                continue
+            payload["embedding_hash"] = content_hash
+            pending.append((point.id, payload, truncate_to_tokens(text, EMBEDDING_INPUT_TOKENS) or " "))
+
+        if pending:
+            vectors = embed([text for _, _, text in pending])
+            client.upsert(target, points=[
+                PointStruct(id=point_id, vector=vector, payload=payload)
+                for (point_id, payload, _), vector in zip(pending, vectors)
+            ])
+            stats["embedded"] += len(pending)
+
+        if offset is None:
+            break
+
+    # Points disparus de l'origine
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=target, limit=SCROLL_BATCH_SIZE, offset=offset,
+                                       with_payload=False, with_vectors=False)
+        removed = [p.id for p in points if p.id not in source_ids]
+        if removed:
+            client.delete(target, points_selector=removed)
+            stats["deleted"] += len(removed)
+        if offset is None:
+            break
+    return stats
+
+
+def main():
+    """Construit les collections réduites demandées (toutes par défaut)"""
+    from openai_scheduler import BATCH, openai_priority
+    from query_system import QdrantSystem
+
+    args = sys.argv[1:]
+    force = "--force" in args
+    collections = [a for a in args if a != "--force"] or DEFAULT_COLLECTIONS
+    system = QdrantSystem("ListeClients.csv")
+
+    # Traitement par lot : les appels OpenAI passent après les recherches interactives
+    with openai_priority(BATCH):
+        for collection_name in collections:
+            start = time()
+            stats = build_shadow_collection(system.client, collection_name,
+                                            lambda texts: system.create_embeddings(texts, SHADOW_SPACE), force)
+            print(f"[📐 Embeddings réduits] {collection_name} → {SHADOW_SPACE.collection_name(collection_name)}: "
+                  f"{stats} en {time() - start:.1f}s")
+    print(f"[📐 Embeddings réduits] Ajouter {','.join(collections)} à SHADOW_COLLECTIONS et "
+          f"DUAL_READ_SAMPLE_RATE > 0 pour comparer les deux chemins ; relancer après chaque indexation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Résumé extractif local pour le format Summary-fast
+Les phrases des documents retenus sont pondérées par TF-IDF puis classées par
+TextRank (marche aléatoire sur le graphe de similarité cosinus des phrases,
+orientée vers les phrases proches de la requête). Les phrases quasi identiques
+sont écartées et les meilleures sont renvoyées dans l'ordre des documents, sans
+aucun appel au modèle. Ce résumé sert aussi de repli au format Summary lorsque
+le modèle est indisponible ou que l'échéance de la requête est trop proche.
+"""
+
+import os
+import re
+import unicodedata
+from typing import List
+
+import numpy as np
+
+from context_packer import STOP_WORDS, truncate_to_tokens
+
+# Nombre de phrases du résumé
+SUMMARY_FAST_SENTENCES = int(os.getenv("SUMMARY_FAST_SENTENCES", "5"))
+
+# Tokens lus dans chaque document
+SUMMARY_FAST_INPUT_TOKENS = int(os.getenv("SUMMARY_FAST_INPUT_TOKENS", "1500"))
+
+# Similarité cosinus au-delà de laquelle deux phrases sont considérées comme identiques
+SUMMARY_DEDUP_SIMILARITY = float(os.getenv("SUMMARY_DEDUP_SIMILARITY", "0.8"))
+
+# Paramètres de TextRank
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+TEXTRANK_TOLERANCE = 1e-6
+
+# Longueur des phrases retenues (en termes significatifs et en caractères)
+MIN_SENTENCE_TERMS = 3
+MAX_SENTENCE_CHARS = 400
+
+# Mots vides français (majuscules, sans accents), en plus de ceux du contexte LLM
+FRENCH_STOP_WORDS = STOP_WORDS | {
+    "ALORS", "AUSSI", "AUTRE", "AUTRES", "AVAIT", "AVANT", "AVOIR", "BIEN", "CAR", "CELA", "CELLE", "CELUI",
+    "CES", "CHAQUE", "COMME", "COMMENT", "DEJA", "DEPUIS", "DONC", "DONT", "ENCORE", "ENTRE", "ETAIT", "ETAT",
+    "ETE", "ETRE", "FAIRE", "FAIT", "ICI", "IL", "JE", "LEURS", "LORS", "LUI", "MAIS", "MEME", "MES", "MOI",
+    "MON", "NOTRE", "NOS", "ONT", "PEU", "PEUT", "PLUSIEURS", "PUIS", "QUAND", "QUEL", "QUELLE", "QUELS",
+    "SELON", "SERA", "SONT", "SOUS", "TOUJOURS", "TOUS", "TOUT", "TOUTE", "TOUTES", "TRES", "VERS", "VOTRE",
+    "VOS", "BONJOUR", "MERCI", "CORDIALEMENT", "THIS", "THAT", "ARE", "WAS", "HAVE", "HAS", "NOT",
+}
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_TERM_RE = re.compile(r"\w+")
+
+
+def sentence_terms(sentence: str) -> List[str]:
+    """Termes significatifs d'une phrase, avec répétitions (majuscules, sans accents ni mots vides)"""
+    normalized = unicodedata.normalize('NFKD', sentence).encode('ASCII', 'ignore').decode('utf-8').upper()
+    return [w for w in _TERM_RE.findall(normalized)
+            if len(w) >= 3 and w not in FRENCH_STOP_WORDS and not w.isdigit()]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Phrases d'un texte (ponctuation finale ou retour à la ligne), espaces normalisés"""
+    sentences = []
+    for sentence in _SENTENCE_RE.split(text or ""):
+        sentence = " ".join(sentence.split()).lstrip("-*•·– ")
+        if sentence:
+            sentences.append(sentence[:MAX_SENTENCE_CHARS])
+    return sentences
+
+
+def textrank(similarity: np.ndarray, bias: np.ndarray) -> np.ndarray:
+    """
+    Score TextRank de chaque phrase
+
+    Args:
+        similarity: Matrice carrée des similarités entre phrases (diagonale nulle)
+        bias: Probabilité de saut vers chaque phrase (somme 1)
+
+    Returns:
+        Score de chaque phrase (somme 1)
+    """
+    weights = similarity.sum(axis=1, keepdims=True)
+    # Une phrase isolée redistribue son score selon le biais
+    transition = np.where(weights > 0, similarity / np.where(weights > 0, weights, 1), bias)
+    scores = bias.copy()
+    for _ in range(TEXTRANK_ITERATIONS):
+        updated = (1 - TEXTRANK_DAMPING) * bias + TEXTRANK_DAMPING * transition.T @ scores
+        if np.abs(updated - scores).sum() < TEXTRANK_TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+def summarize(query: str, documents: List[str], max_sentences: int = SUMMARY_FAST_SENTENCES) -> List[str]:
+    """
+    Résumé extractif des documents retenus pour une requête
+
+    Args:
+        query: Texte de la requête utilisateur
+        documents: Textes des documents, par ordre de pertinence
+        max_sentences: Nombre maximal de phrases
+
+    Returns:
+        Phrases retenues, dans l'ordre des documents
+    """
+    sentences, terms, seen = [], [], set()
+    for document in documents:
+        for sentence in split_sentences(truncate_to_tokens(document, SUMMARY_FAST_INPUT_TOKENS)):
+            sentence_key = sentence.casefold()
+            words = sentence_terms(sentence)
+            if len(words) < MIN_SENTENCE_TERMS or sentence_key in seen:
+                continue
+            seen.add(sentence_key)
+            sentences.append(sentence)
+            terms.append(words)
+    if not sentences:
+        return []
+
+    # Matrice TF-IDF des phrases (lignes normées)
+    vocabulary = {term: i for i, term in enumerate(sorted({t for words in terms for t in words}))}
+    tf = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+    for row, words in enumerate(terms):
+        for term in words:
+            tf[row, vocabulary[term]] += 1
+    idf = np.log((1 + len(sentences)) / (1 + (tf > 0).sum(axis=0))) + 1
+    tfidf = np.log1p(tf) * idf
+    tfidf /= np.linalg.norm(tfidf, axis=1, keepdims=True)
+
+    similarity = tfidf @ tfidf.T
+    np.fill_diagonal(similarity, 0.0)
+
+    # Saut aléatoire orienté vers les phrases qui partagent des termes avec la requête
+    query_vector = np.zeros(len(vocabulary), dtype=np.float32)
+    for term in sentence_terms(query):
+        if term in vocabulary:
+            query_vector[vocabulary[term]] = idf[vocabulary[term]]
+    bias = 1.0 + tfidf @ query_vector / (np.linalg.norm(query_vector) or 1.0)
+    scores = textrank(similarity, bias / bias.sum())
+
+    selected = []
+    for index in np.argsort(-scores, kind="stable"):
+        if len(selected) >= max_sentences:
+            break
+        # Phrases quasi identiques (même contenu reformulé ou répété d'un ticket à l'autre)
+        if any(similarity[index, other] >= SUMMARY_DEDUP_SIMILARITY for other in selected):
+            continue
+        selected.append(index)
+    return [sentences[index] for index in sorted(selected)]
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Formatage par lot des résultats de recherche
+Ce module transforme une liste complète de résultats Qdrant en enregistrements
+compacts (__slots__), avec un cache des dates formatées et une attribution
+vectorisée des couleurs de score.
+"""
+
+import hashlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Seuils de score et couleurs associées (rouge < 0.50 <= orange < 0.80 <= vert)
+SCORE_THRESHOLDS = np.array([0.50, 0.80])
+SCORE_COLORS = np.array(["red", "orange", "green"])
+
+# Tous les fuseaux horaires (et changements d'heure) sont alignés sur des
+# quarts d'heure : deux timestamps du même quart d'heure ont la même date locale
+_DATE_BUCKET_SECONDS = 900
+
+GUIDE_FIELDS = ("summary", "description", "content", "text", "comments")
+
+# Formats dont le prompt de synthèse utilise les digests précalculés (voir digests.py)
+DIGEST_FORMATS = ("Summary", "Guide")
+
+# Formats conservant le texte complet des documents (synthèse Guide, résumé extractif Summary-fast)
+CONTENT_FORMATS = ("Guide", "Summary-fast")
+
+
+@lru_cache(maxsize=16384)
+def _format_bucket(bucket: int) -> Optional[str]:
+    try:
+        return datetime.fromtimestamp(bucket * _DATE_BUCKET_SECONDS).strftime('%d/%m/%Y')
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def format_timestamp(ts):
+    """
+    Formate un timestamp en date jj/mm/aaaa (les autres valeurs sont renvoyées telles quelles)
+
+    Args:
+        ts: Timestamp (entier, flottant ou chaîne de chiffres) ou valeur quelconque
+
+    Returns:
+        Date formatée, ou la valeur d'origine si elle n'est pas un timestamp
+    """
+    if isinstance(ts, (int, float)):
+        seconds = ts
+    elif isinstance(ts, str) and ts.isdigit():
+        seconds = int(ts)
+    else:
+        return ts
+    try:
+        formatted = _format_bucket(int(seconds // _DATE_BUCKET_SECONDS))
+    except (OverflowError, ValueError):
+        return ts
+    return formatted if formatted is not None else ts
+
+
+def document_text(payload: Dict[str, Any]) -> str:
+    """Texte complet d'un document, tel qu'utilisé pour le format Guide"""
+    get = payload.get
+    return "\n".join(str(val) for val in (get(key) for key in GUIDE_FIELDS) if val)
+
+
+def document_hash(payload: Dict[str, Any], text: str = None) -> str:
+    """
+    Empreinte du contenu d'un document : content_hash du payload, sinon empreinte de son texte
+
+    Args:
+        payload: Payload Qdrant du point
+        text: Texte du document s'il est déjà calculé (optionnel)
+
+    Returns:
+        Empreinte du contenu
+    """
+    content_hash = payload.get("content_hash")
+    if content_hash:
+        return str(content_hash)
+    if text is None:
+        text = document_text(payload)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def current_digest(payload: Dict[str, Any], text: str = None) -> Optional[Tuple[str, List[str]]]:
+    """
+    Digest précalculé d'un document, s'il correspond encore à son contenu
+
+    Args:
+        payload: Payload Qdrant du point
+        text: Texte du document s'il est déjà calculé (optionnel)
+
+    Returns:
+        Tuple (résumé, étapes), ou None si le digest est absent ou périmé
+    """
+    digest_hash = payload.get("digest_hash")
+    if not digest_hash or not payload.get("digest_abstract"):
+        return None
+    if digest_hash != document_hash(payload, text):
+        return None
+    return payload["digest_abstract"], list(payload.get("digest_steps") or [])
+
+
+def score_colors(scores: List[Optional[float]]) -> List[str]:
+    """
+    Attribue une couleur à chaque score en une seule opération vectorisée
+
+    Args:
+        scores: Scores de similarité (None si la recherche n'est pas vectorielle)
+
+    Returns:
+        Couleurs ("green", "orange", "red", ou "gray" sans score)
+    """
+    if not scores:
+        return []
+    values = np.array([np.nan if s is None else s for s in scores], dtype=float)
+    colors = SCORE_COLORS[np.searchsorted(SCORE_THRESHOLDS, np.nan_to_num(values, nan=0.0), side="right")]
+    return np.where(np.isnan(values), "gray", colors).tolist()
+
+
+class TicketHit:
+    """Résultat de recherche formaté"""
+
+    __slots__ = ("point_id", "client", "source", "summary", "created", "updated",
+                 "assignee", "url", "score", "color", "content", "content_hash", "digest")
+
+    def __init__(self, point_id, client, source, summary, created, updated,
+                 assignee, url, score, color, content=None, content_hash=None, digest=None):
+        self.point_id = point_id
+        self.client = client
+        self.source = source
+        self.summary = summary
+        self.created = created
+        self.updated = updated
+        self.assignee = assignee
+        self.url = url
+        self.score = score
+        self.color = color
+        self.content = content
+        self.content_hash = content_hash
+        self.digest = digest  # (résumé, étapes) précalculés, None si absent ou périmé
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation dictionnaire, identique à celle de format_ticket_payload"""
+        data = {
+            "client": self.client,
+            "source": self.source,
+            "summary": self.summary,
+            "created": self.created,
+            "updated": self.updated,
+            "assignee": self.assignee,
+            "url": self.url,
+            "score": self.score,
+            "color": self.color,
+        }
+        if self.content is not None:
+            data["content"] = self.content
+        return data
+
+
+def format_hits(hits: Iterable[Tuple[dict, Optional[float], Any]], format_type: str = "Detail") -> List[TicketHit]:
+    """
+    Formate une liste complète de résultats
+
+    Args:
+        hits: Tuples (payload, score, identifiant du point)
+        format_type: Format de la réponse (le contenu complet n'est conservé que pour Guide et
+            Summary-fast, les digests que pour Summary et Guide)
+
+    Returns:
+        Liste d'enregistrements TicketHit, dans l'ordre des résultats
+    """
+    hits = list(hits)
+    colors = score_colors([score for _, score, _ in hits])
+    with_content = format_type in CONTENT_FORMATS
+    with_digest = format_type in DIGEST_FORMATS
+
+    records = []
+    for (payload, score, point_id), color in zip(hits, colors):
+        get = payload.get
+        content = None
+        if with_content:
+            content = document_text(payload)
+        digest = current_digest(payload, content) if with_digest else None
+        records.append(TicketHit(
+            point_id,
+            get("client", "N/A"),
+            get("source_type", "N/A"),
+            payload["summary"] if "summary" in payload else get("description", ""),
+            format_timestamp(get("created", "N/A")),
+            format_timestamp(get("updated", "N/A")),
+            get("assignee", "N/A"),
+            get("url"),
+            round(score, 4) if score is not None else None,
+            color,
+            content,
+            get("content_hash") if with_content else None,
+            digest,
+        ))
+    return records
+
+
+def render_detail(hit: TicketHit) -> str:
+    """
+    Rend un résultat au format Detail
+
+    Args:
+        hit: Résultat formaté
+
+    Returns:
+        Texte Markdown du résultat
+    """
+    parts = [f"## {hit.summary}\n\n"]
+    if hit.content is not None:
+        parts.append(f"{hit.content}\n\n")
+    parts.append(f"Score de similarité : {hit.score}\n\n")
+    parts.append(f"---\nCréé le: {hit.created}\nMis à jour le: {hit.updated}\nAssigné à: {hit.assignee}")
+    return "".join(parts)
+
+
+def render_details(hits: Iterable[TicketHit]) -> List[str]:
+    """Rend une liste de résultats au format Detail"""
+    return [render_detail(hit) for hit in hits]
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Statistiques de résultats par collection
+Ce module enregistre, par client et par ERP, le taux de résultats utiles, le
+meilleur score et la latence de chaque collection. Ces statistiques servent à
+ordonner les collections interrogées et à ignorer celles qui n'ont jamais
+rien renvoyé d'utile, avec un taux d'exploration pour les garder à jour.
+"""
+
+import os
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Score à partir duquel un résultat est considéré comme utile
+HIT_USEFUL_SCORE = float(os.getenv("HIT_USEFUL_SCORE", "0.75"))
+
+# Nombre de requêtes sans résultat utile avant d'ignorer une collection
+HIT_STATS_MIN_QUERIES = int(os.getenv("HIT_STATS_MIN_QUERIES", "20"))
+
+# Proportion des requêtes qui interrogent toutes les collections pour rafraîchir les statistiques
+HIT_STATS_EXPLORATION_RATE = float(os.getenv("HIT_STATS_EXPLORATION_RATE", "0.1"))
+
+# Poids des nouvelles mesures dans les moyennes glissantes
+EWMA_ALPHA = 0.2
+
+
+class CollectionStats:
+    """Statistiques d'une collection pour un périmètre (client, ERP ou global)"""
+
+    __slots__ = ("queries", "useful", "best_score", "top_score", "latency_ms")
+
+    def __init__(self):
+        self.queries = 0
+        self.useful = 0
+        self.best_score = 0.0
+        self.top_score = None
+        self.latency_ms = None
+
+    def record(self, top_score: float, latency_ms: float, useful_score: float):
+        self.queries += 1
+        if top_score >= useful_score:
+            self.useful += 1
+        self.best_score = max(self.best_score, top_score)
+        self.top_score = top_score if self.top_score is None else (
+            EWMA_ALPHA * top_score + (1 - EWMA_ALPHA) * self.top_score)
+        self.latency_ms = latency_ms if self.latency_ms is None else (
+            EWMA_ALPHA * latency_ms + (1 - EWMA_ALPHA) * self.latency_ms)
+
+    @property
+    def hit_rate(self) -> float:
+        """Probabilité estimée (lissage de Laplace) qu'une requête renvoie un résultat utile"""
+        return (self.useful + 1) / (self.queries + 2)
+
+    def to_dict(self) -> dict:
+        return {
+            "queries": self.queries,
+            "hit_rate": round(self.useful / self.queries, 3) if self.queries else None,
+            "best_score": round(self.best_score, 4),
+            "top_score": round(self.top_score, 4) if self.top_score is not None else None,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+        }
+
+
+class HitStatistics:
+    """Statistiques par (périmètre, collection), partagées entre les requêtes"""
+
+    def __init__(self, useful_score: float = HIT_USEFUL_SCORE, min_queries: int = HIT_STATS_MIN_QUERIES,
+                 exploration_rate: float = HIT_STATS_EXPLORATION_RATE, rng: Optional[random.Random] = None):
+        self.useful_score = useful_score
+        self.min_queries = min_queries
+        self.exploration_rate = exploration_rate
+        self.rng = rng or random.Random()
+        self._stats: Dict[Tuple[str, str], CollectionStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scopes(client_name: str = None, erp: str = None) -> List[str]:
+        """Périmètres d'une requête, du plus précis au plus général"""
+        scopes = []
+        if client_name:
+            scopes.append(f"client:{client_name}")
+        if erp:
+            scopes.append(f"erp:{erp}")
+        scopes.append("global")
+        return scopes
+
+    def record(self, scopes: List[str], collection_name: str, scores: List[float], latency_ms: float):
+        """
+        Enregistre le résultat d'une recherche dans une collection
+
+        Args:
+            scopes: Périmètres de la requête (voir scopes)
+            collection_name: Collection interrogée
+            scores: Scores des résultats obtenus
+            latency_ms: Durée de la recherche
+        """
+        top_score = max(scores) if scores else 0.0
+        with self._lock:
+            for scope in scopes:
+                stats = self._stats.setdefault((scope, collection_name), CollectionStats())
+                stats.record(top_score, latency_ms, self.useful_score)
+
+    def _lookup(self, scopes: List[str], collection_name: str) -> Optional[CollectionStats]:
+        # Périmètre le plus précis disposant de suffisamment de mesures
+        fallback = None
+        for scope in scopes:
+            stats = self._stats.get((scope, collection_name))
+            if stats is None:
+                continue
+            if stats.queries >= self.min_queries:
+                return stats
+            fallback = fallback or stats
+        return fallback
+
+    def plan(self, scopes: List[str], collections: List[str]) -> Tuple[List[str], List[str], bool]:
+        """
+        Ordonne les collections à interroger pour une requête
+
+        Args:
+            scopes: Périmètres de la requête
+            collections: Collections candidates, dans l'ordre de priorité statique
+
+        Returns:
+            Tuple (collections ordonnées, collections ignorées, requête d'exploration)
+        """
+        exploring = self.rng.random() < self.exploration_rate
+        ranked, skipped = [], []
+        with self._lock:
+            for position, collection_name in enumerate(collections):
+                stats = self._lookup(scopes, collection_name)
+                if (not exploring and stats is not None and stats.queries >= self.min_queries
+                        and stats.useful == 0 and stats.best_score < self.useful_score):
+                    skipped.append(collection_name)
+                    continue
+                hit_rate = stats.hit_rate if stats is not None else 0.5
+                latency = stats.latency_ms if stats is not None and stats.latency_ms is not None else 0.0
+                ranked.append((-round(hit_rate, 2), latency, position, collection_name))
+        ranked.sort()
+        return [c for *_, c in ranked], skipped, exploring
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        """Statistiques courantes, par périmètre puis par collection"""
+        with self._lock:
+            snapshot = {}
+            for (scope, collection_name), stats in self._stats.items():
+                snapshot.setdefault(scope, {})[collection_name] = stats.to_dict()
+            return snapshot
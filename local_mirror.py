@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Miroir local des collections Qdrant
+La synchronisation parcourt chaque collection et écrit une matrice de vecteurs
+float32 normalisés, les colonnes des champs filtrables (codes des valeurs et
+dates), les payloads d'affichage et, à part, les textes des documents ; tous
+sont lus en mémoire partagée via np.memmap. La recherche locale applique le
+filtre sur les colonnes, puis fait un produit matrice-vecteur NumPy suivi
+d'une sélection des k meilleurs résultats : seuls les payloads des résultats
+retenus sont décodés, et leurs textes ne sont lus que pour eux.
+
+Utilisation :
+    python local_mirror.py                 # synchronise toutes les collections
+    python local_mirror.py SAP NETSUITE_DUMMIES
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+from time import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http.models import FieldCondition, Filter
+
+# Répertoire du miroir local (vide : miroir désactivé)
+LOCAL_MIRROR_DIR = os.getenv("LOCAL_MIRROR_DIR", "")
+
+# Champs conservés dans les payloads d'affichage du miroir (les descriptions de pièces jointes sont ignorées)
+MIRROR_PAYLOAD_FIELDS = (
+    "client", "erp", "created", "updated", "summary", "title", "source_type", "assignee", "url",
+    "content_hash", "status", "priority", "resolution", "pdf_path", "key", "ticket_id",
+    "digest_abstract", "digest_steps", "digest_hash",
+)
+# Textes des documents, stockés à part et lus pour les seuls résultats retenus
+MIRROR_TEXT_FIELDS = ("description", "content", "text", "comments")
+
+# Colonnes de filtrage : valeurs exactes (match) et nombres (range)
+MIRROR_KEYWORD_FIELDS = ("client", "erp", "source_type", "status", "priority", "resolution")
+MIRROR_RANGE_FIELDS = ("created", "updated")
+
+SCROLL_BATCH_SIZE = 256
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _write_record(records_file, offsets: List[int], record: Dict[str, Any]):
+    offsets.append(records_file.tell())
+    records_file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+
+
+def _keyword_code(vocabulary: Dict[Any, int], value) -> int:
+    """Code d'une valeur exacte (-1 : absente ou non comparable)"""
+    if value is None or not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        return -1
+    return vocabulary.setdefault(value, len(vocabulary))
+
+
+def _range_value(value) -> float:
+    """Valeur numérique d'un champ de plage (NaN : absente ou non numérique, comme pour matches_filter)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+def sync_collection(client, collection_name: str, mirror_dir: str) -> int:
+    """
+    Copie une collection Qdrant dans le miroir local
+
+    Les fichiers sont écrits dans un répertoire temporaire puis substitués
+    à l'ancienne copie en une seule opération.
+
+    Args:
+        client: Client Qdrant
+        collection_name: Nom de la collection
+        mirror_dir: Répertoire racine du miroir
+
+    Returns:
+        Nombre de points copiés
+    """
+    target = os.path.join(mirror_dir, collection_name)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    ids, offsets, text_offsets = [], [], []
+    vocabularies = {field: {} for field in MIRROR_KEYWORD_FIELDS}
+    keyword_codes = {field: [] for field in MIRROR_KEYWORD_FIELDS}
+    range_values = {field: [] for field in MIRROR_RANGE_FIELDS}
+    dim = None
+    offset = None
+    with open(os.path.join(tmp, "vectors.f32"), "wb") as vectors_file, \
+            open(os.path.join(tmp, "payloads.jsonl"), "wb") as payloads_file, \
+            open(os.path.join(tmp, "texts.jsonl"), "wb") as texts_file:
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=SCROLL_BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            batch = []
+            for point in points:
+                vector = point.vector
+                if isinstance(vector, dict):  # Vecteurs nommés : on garde le premier
+                    vector = next(iter(vector.values()))
+                if not vector:
+                    continue
+                batch.append(vector)
+                ids.append(point.id)
+                payload = point.payload or {}
+                _write_record(payloads_file, offsets, {k: v for k, v in payload.items() if k in MIRROR_PAYLOAD_FIELDS})
+                _write_record(texts_file, text_offsets, {k: v for k, v in payload.items() if k in MIRROR_TEXT_FIELDS})
+                for field in MIRROR_KEYWORD_FIELDS:
+                    keyword_codes[field].append(_keyword_code(vocabularies[field], payload.get(field)))
+                for field in MIRROR_RANGE_FIELDS:
+                    range_values[field].append(_range_value(payload.get(field)))
+
+            if batch:
+                matrix = _normalize_rows(np.asarray(batch, dtype=np.float32))
+                dim = matrix.shape[1]
+                vectors_file.write(matrix.astype(np.float32).tobytes())
+
+            if offset is None:
+                break
+        # Fin du dernier enregistrement : l'enregistrement i occupe [offsets[i], offsets[i + 1])
+        offsets.append(payloads_file.tell())
+        text_offsets.append(texts_file.tell())
+
+    np.save(os.path.join(tmp, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(tmp, "text_offsets.npy"), np.asarray(text_offsets, dtype=np.int64))
+    np.savez(os.path.join(tmp, "columns.npz"),
+             **{field: np.asarray(codes, dtype=np.int32) for field, codes in keyword_codes.items()},
+             **{field: np.asarray(values, dtype=np.float64) for field, values in range_values.items()})
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": len(ids), "dim": dim or 0, "ids": ids, "synced_at": int(time()),
+                   "vocabularies": {field: list(vocabulary) for field, vocabulary in vocabularies.items()}}, f)
+
+    shutil.rmtree(target + ".old", ignore_errors=True)
+    if os.path.exists(target):
+        os.replace(target, target + ".old")
+    os.replace(tmp, target)
+    shutil.rmtree(target + ".old", ignore_errors=True)
+    return len(ids)
+
+
+def _as_list(conditions) -> list:
+    if conditions is None:
+        return []
+    return conditions if isinstance(conditions, list) else [conditions]
+
+
+def _condition_matches(payload: Dict[str, Any], condition) -> bool:
+    if isinstance(condition, Filter):
+        return matches_filter(payload, condition)
+    if not isinstance(condition, FieldCondition):
+        raise ValueError(f"Condition non gérée par le miroir local: {type(condition).__name__}")
+
+    value = payload.get(condition.key)
+    if condition.match is not None:
+        if hasattr(condition.match, "value"):
+            return value == condition.match.value
+        if hasattr(condition.match, "any"):
+            return value in condition.match.any
+        raise ValueError(f"Match non géré par le miroir local: {type(condition.match).__name__}")
+    if condition.range is not None:
+        if not isinstance(value, (int, float)):
+            return False
+        r = condition.range
+        return ((r.gt is None or value > r.gt) and (r.gte is None or value >= r.gte)
+                and (r.lt is None or value < r.lt) and (r.lte is None or value <= r.lte))
+    raise ValueError(f"Condition non gérée par le miroir local sur {condition.key}")
+
+
+def matches_filter(payload: Dict[str, Any], query_filter: Optional[Filter]) -> bool:
+    """
+    Évalue un filtre Qdrant (must / should / must_not) sur un payload
+
+    Args:
+        payload: Payload du point
+        query_filter: Filtre Qdrant (None : tout point correspond)
+
+    Returns:
+        True si le payload satisfait le filtre
+
+    Raises:
+        ValueError: Si le filtre utilise une condition non gérée localement
+    """
+    if query_filter is None:
+        return True
+
+    must = _as_list(query_filter.must)
+    should = _as_list(query_filter.should)
+    must_not = _as_list(query_filter.must_not)
+    return (all(_condition_matches(payload, c) for c in must)
+            and (not should or any(_condition_matches(payload, c) for c in should))
+            and not any(_condition_matches(payload, c) for c in must_not))
+
+
+class MirroredCollection:
+    """Copie locale d'une collection, ouverte en lecture seule"""
+
+    def __init__(self, path: str):
+        meta_path = os.path.join(path, "meta.json")
+        self.mtime = os.path.getmtime(meta_path)
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids = meta["ids"]
+        self.synced_at = meta["synced_at"]
+        count, dim = meta["count"], meta["dim"]
+        self.vectors = (np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+                        if count else np.zeros((0, dim), dtype=np.float32))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.text_offsets = np.load(os.path.join(path, "text_offsets.npy"))
+        # Projections en mémoire partagée plutôt que fichiers ouverts : rien à fermer au rechargement,
+        # l'ancienne copie est libérée une fois ses dernières recherches terminées
+        self._payloads = self._map(os.path.join(path, "payloads.jsonl"))
+        self._texts = self._map(os.path.join(path, "texts.jsonl"))
+        with np.load(os.path.join(path, "columns.npz")) as columns:
+            self.columns = {field: columns[field] for field in columns.files}
+        self.codes = {field: {value: code for code, value in enumerate(values)}
+                      for field, values in meta["vocabularies"].items()}
+
+    @staticmethod
+    def _map(path: str) -> np.ndarray:
+        if not os.path.getsize(path):
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode="r")
+
+    @staticmethod
+    def _record(records: np.ndarray, offsets: np.ndarray, row: int) -> Dict[str, Any]:
+        return json.loads(records[int(offsets[row]):int(offsets[row + 1])].tobytes())
+
+    def payload(self, row: int) -> Dict[str, Any]:
+        """Payload d'affichage d'un point"""
+        return self._record(self._payloads, self.offsets, row)
+
+    def text_fields(self, row: int) -> Dict[str, Any]:
+        """Textes d'un point (description, contenu, commentaires)"""
+        return self._record(self._texts, self.text_offsets, row)
+
+    def _condition_mask(self, condition) -> Optional[np.ndarray]:
+        """Lignes satisfaisant une condition, calculées sur les colonnes (None : condition non indexée)"""
+        if isinstance(condition, Filter):
+            return self.filter_mask(condition)
+        if not isinstance(condition, FieldCondition) or condition.key not in self.columns:
+            return None
+        column = self.columns[condition.key]
+        if condition.match is not None and condition.key in self.codes:
+            codes = self.codes[condition.key]
+            if hasattr(condition.match, "value"):
+                values = [condition.match.value]
+            elif hasattr(condition.match, "any"):
+                values = condition.match.any
+            else:
+                return None
+            return np.isin(column, [codes[v] for v in values if v in codes])
+        if condition.range is not None and condition.key in MIRROR_RANGE_FIELDS:
+            r = condition.range
+            mask = ~np.isnan(column)
+            if r.gt is not None:
+                mask &= column > r.gt
+            if r.gte is not None:
+                mask &= column >= r.gte
+            if r.lt is not None:
+                mask &= column < r.lt
+            if r.lte is not None:
+                mask &= column <= r.lte
+            return mask
+        return None
+
+    def filter_mask(self, query_filter: Filter) -> Optional[np.ndarray]:
+        """
+        Lignes pouvant satisfaire un filtre, calculées sur les colonnes
+
+        Les conditions sur des champs non indexés n'écartent aucune ligne : le
+        filtre complet est ensuite vérifié sur le payload des lignes retenues.
+
+        Returns:
+            Masque booléen des lignes, ou None si aucune condition n'est indexée
+        """
+        mask = None
+        for condition in _as_list(query_filter.must):
+            condition_mask = self._condition_mask(condition)
+            if condition_mask is not None:
+                mask = condition_mask if mask is None else mask & condition_mask
+        should = [self._condition_mask(c) for c in _as_list(query_filter.should)]
+        if should and all(m is not None for m in should):
+            should_mask = np.logical_or.reduce(should)
+            mask = should_mask if mask is None else mask & should_mask
+        for condition in _as_list(query_filter.must_not):
+            # Le masque d'un sous-filtre peut retenir trop de lignes : son complément n'est pas sûr
+            condition_mask = None if isinstance(condition, Filter) else self._condition_mask(condition)
+            if condition_mask is not None:
+                mask = ~condition_mask if mask is None else mask & ~condition_mask
+        return mask
+
+    def search(self, vector: List[float], query_filter: Filter = None, limit: int = 5) -> List[Tuple[dict, float, Any]]:
+        """
+        Recherche les points les plus proches (similarité cosinus)
+
+        Args:
+            vector: Vecteur de la requête
+            query_filter: Filtre Qdrant appliqué aux colonnes puis aux payloads (optionnel)
+            limit: Nombre de résultats
+
+        Returns:
+            Liste de tuples (payload avec ses textes, score, identifiant du point)
+        """
+        if not len(self.ids) or limit <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self.vectors @ query
+
+        mask = self.filter_mask(query_filter) if query_filter is not None else None
+        if mask is None:
+            candidates = np.arange(len(scores))
+        else:
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+        candidate_scores = scores[candidates]
+
+        if query_filter is None:
+            k = min(limit, len(candidates))
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+            order = candidates[top[np.argsort(-candidate_scores[top])]]
+        else:
+            order = candidates[np.argsort(-candidate_scores)]
+
+        results = []
+        for row in order:
+            payload = self.payload(row)
+            if matches_filter(payload, query_filter):
+                payload.update(self.text_fields(row))
+                results.append((payload, float(scores[row]), self.ids[row]))
+                if len(results) >= limit:
+                    break
+        return results
+
+
+class LocalMirror:
+    """Accès aux collections du miroir local, chargées à la demande"""
+
+    def __init__(self, mirror_dir: str):
+        self.mirror_dir = mirror_dir
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def get(self, collection_name: str) -> Optional[MirroredCollection]:
+        """Retourne la copie locale d'une collection (rechargée après une nouvelle synchronisation)"""
+        path = os.path.join(self.mirror_dir, collection_name)
+        meta_path = os.path.join(path, "meta.json")
+        # Sans colonnes de filtrage, la copie date d'un format antérieur : elle est à resynchroniser
+        if not os.path.exists(meta_path) or not os.path.exists(os.path.join(path, "columns.npz")):
+            return None
+        with self._lock:
+            mirrored = self._collections.get(collection_name)
+            if mirrored is None or os.path.getmtime(meta_path) != mirrored.mtime:
+                mirrored = MirroredCollection(path)
+                self._collections[collection_name] = mirrored
+            return mirrored
+
+    def has(self, collection_name: str) -> bool:
+        return self.get(collection_name) is not None
+
+    def search(self, collection_name: str, vector: List[float], query_filter: Filter = None, limit: int = 5):
+        mirrored = self.get(collection_name)
+        if mirrored is None:
+            raise KeyError(f"Collection {collection_name} absente du miroir local")
+        return mirrored.search(vector, query_filter, limit)
+
+
+def main():
+    """Synchronise les collections demandées (toutes par défaut) dans LOCAL_MIRROR_DIR"""
+    from dotenv import load_dotenv
+    from qdrant_client import QdrantClient
+
+    load_dotenv()
+    mirror_dir = os.getenv("LOCAL_MIRROR_DIR") or "mirror"
+    collections = sys.argv[1:] or ["JIRA", "CONFLUENCE", "ZENDESK", "NETSUITE", "NETSUITE_DUMMIES", "SAP"]
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+
+    os.makedirs(mirror_dir, exist_ok=True)
+    for collection_name in collections:
+        start = time()
+        count = sync_collection(client, collection_name, mirror_dir)
+        print(f"[🪞 Miroir] {collection_name}: {count} points copiés en {time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
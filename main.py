@@ -5,11 +5,28 @@
 Programme client Qdrant pour IT SPIRIT
 Ce programme permet d'interroger les collections Qdrant contenant des informations
 sur les clients IT SPIRIT et les systèmes ERP (SAP et NetSuite).
+
+Traitement par lot d'un fichier de requêtes JSONL :
+    python main.py --batch requetes.jsonl --output resultats.jsonl [--workers 4]
+
+Chaque ligne d'entrée contient `query` et, optionnellement, `client`, `erp`,
+`format`, `limit` et `recent_only`. Les résultats sont écrits au fil de l'eau ;
+le fichier de résultats sert de point de reprise : une exécution interrompue,
+relancée avec les mêmes arguments, ne traite que les lignes restantes.
 """
 
+import argparse
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import time
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+import numpy as np
 from dotenv import load_dotenv
 from query_system import QdrantSystem
+from openai_scheduler import BATCH, openai_priority
+from speculation import submit_in_context
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -35,7 +52,11 @@ COLLECTIONS = {
 }
 
 # Définition des formats de réponse
-FORMATS = ["Summary", "Detail", "Guide"]
+FORMATS = ["Summary", "Summary-fast", "Detail", "Guide"]
+
+# Traitement par lot : requêtes traitées en parallèle et requêtes vectorisées par appel OpenAI
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_EMBEDDING_SIZE = int(os.getenv("BATCH_EMBEDDING_SIZE", "32"))
 
 def search_all_clients(query_text: str, format_type="Summary", recent_only=False, limit=3):
     """
@@ -45,23 +66,199 @@ def search_all_clients(query_text: str, format_type="Summary", recent_only=False
     system = QdrantSystem(clients_file)
     all_results = {}
 
-    for client_name in system.clients:
+    # Traitement par lot : les appels OpenAI passent après les recherches interactives
+    with openai_priority(BATCH):
+        for client_name in system.clients:
+            try:
+                result = system.process_query(
+                    query=query_text,
+                    client_name=client_name,
+                    format_type=format_type,
+                    recent_only=recent_only,
+                    limit=limit,
+                    deadline_ms=0
+                )
+                all_results[client_name] = result["content"]
+            except Exception as e:
+                all_results[client_name] = [f"Erreur: {str(e)}"]
+
+    return all_results
+
+
+def read_queries(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Lit un fichier de requêtes JSONL
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        Itérateur de tuples (numéro de ligne, requête) ; les lignes vides sont ignorées
+
+    Raises:
+        ValueError: Si une ligne n'est pas un objet JSON contenant `query`
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: JSON invalide ({e})") from e
+            if not isinstance(item, dict) or not item.get("query"):
+                raise ValueError(f"{path}:{line_number}: champ `query` manquant")
+            yield line_number, item
+
+
+def completed_lines(output_path: str) -> Set[int]:
+    """
+    Lignes déjà traitées avec succès d'après le fichier de résultats (point de reprise)
+
+    Le fichier est compacté : une dernière ligne incomplète, laissée par un arrêt
+    brutal, les lignes illisibles et les résultats en erreur (rejoués à la
+    reprise) en sont retirés, de sorte que chaque ligne d'entrée y figure au plus
+    une fois.
+
+    Args:
+        output_path: Fichier de résultats JSONL
+
+    Returns:
+        Numéros des lignes d'entrée dont le résultat est enregistré sans erreur
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    kept = []
+    compact = True
+    with open(output_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                compact = False
+                break
+            try:
+                record = json.loads(raw)
+                line = record["line"]
+            except (ValueError, KeyError, TypeError):
+                # Ligne illisible (fichier endommagé) : retirée, la requête sera rejouée
+                compact = False
+                continue
+            if record.get("error") or line in done:
+                compact = False
+                continue
+            done.add(line)
+            kept.append(raw)
+    if not compact:
+        # Réécriture complète puis remplacement : un arrêt pendant le compactage ne perd aucun résultat
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.writelines(kept)
+        os.replace(tmp_path, output_path)
+    return done
+
+
+def run_batch(system, input_path: str, output_path: str, workers: int = BATCH_WORKERS,
+              embedding_batch: int = BATCH_EMBEDDING_SIZE, use_cache: bool = False) -> Dict[str, Any]:
+    """
+    Exécute un fichier de requêtes JSONL et écrit les résultats au fil de l'eau
+
+    Les requêtes sont traitées par fenêtres de `embedding_batch` : leurs embeddings
+    sont calculés en un seul appel, puis elles s'exécutent sur `workers` threads.
+    Chaque résultat est ajouté au fichier de sortie dès qu'il est connu ; les
+    requêtes en erreur y figurent aussi et sont rejouées (puis retirées) à la reprise.
+    Par défaut, le cache partagé des résultats n'est ni lu ni alimenté : chaque
+    requête est réellement exécutée.
+
+    Args:
+        system: QdrantSystem utilisé pour les requêtes
+        input_path: Fichier de requêtes JSONL
+        output_path: Fichier de résultats JSONL (ajout en fin de fichier)
+        workers: Nombre de requêtes traitées en parallèle
+        embedding_batch: Nombre de requêtes vectorisées par appel OpenAI
+        use_cache: Passer par le cache partagé des résultats (réponses d'au plus RESULT_CACHE_TTL_S secondes)
+
+    Returns:
+        Statistiques du traitement (requêtes traitées, ignorées, en erreur, débit, latences)
+    """
+    done = completed_lines(output_path)
+    pending = [(n, item) for n, item in read_queries(input_path) if n not in done]
+    stats = {"processed": 0, "skipped": len(done), "errors": 0}
+    latencies: List[float] = []
+    start = time()
+
+    def run_one(line_number, item):
+        query_start = time()
+        record = {"line": line_number, "query": item["query"]}
         try:
-            result = system.process_query(
-                query=query_text,
-                client_name=client_name,
-                format_type=format_type,
-                recent_only=recent_only,
-                limit=limit
+            record["result"] = system.process_query(
+                query=item["query"],
+                client_name=item.get("client"),
+                erp=item.get("erp"),
+                recent_only=bool(item.get("recent_only", False)),
+                limit=int(item.get("limit", 5)),
+                format_type=item.get("format", "Summary"),
+                # Pas d'échéance en traitement par lot : la priorité BATCH peut retarder les appels OpenAI
+                deadline_ms=0,
+                use_cache=use_cache
             )
-            all_results[client_name] = result["content"]
         except Exception as e:
-            all_results[client_name] = [f"Erreur: {str(e)}"]
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["latency_ms"] = round((time() - query_start) * 1000, 1)
+        return record
 
-    return all_results
+    # Traitement par lot : les appels OpenAI passent après les recherches interactives
+    with openai_priority(BATCH), open(output_path, "a", encoding="utf-8") as output, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        for window_start in range(0, len(pending), embedding_batch):
+            window = pending[window_start:window_start + embedding_batch]
+            queries = [item["query"] for _, item in window]
+            try:
+                system.prime_embeddings(queries)
+            except Exception as e:
+                print(f"[📦 Lot] Embeddings groupés en échec ({e}), calcul requête par requête")
 
+            futures = [submit_in_context(executor, run_one, n, item) for n, item in window]
+            for future in as_completed(futures):
+                record = future.result()
+                output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                output.flush()
+                stats["errors" if "error" in record else "processed"] += 1
+                latencies.append(record["latency_ms"])
+
+            # Embeddings inutilisés (requête sans recherche vectorielle ou servie par le cache)
+            for query in queries:
+                system.primed_embeddings.pop(query, None)
+
+            print(f"[📦 Lot] {window_start + len(window)}/{len(pending)} requêtes")
+
+    elapsed = time() - start
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["queries_per_s"] = round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0
+    if latencies:
+        stats["p50_ms"] = round(float(np.percentile(latencies, 50)), 1)
+        stats["p95_ms"] = round(float(np.percentile(latencies, 95)), 1)
+    return stats
+
+
+def main():
+    """Point d'entrée : traitement par lot si --batch est indiqué, sinon requête de démonstration"""
+    parser = argparse.ArgumentParser(description="Requêtes Qdrant IT SPIRIT")
+    parser.add_argument("--batch", metavar="REQUETES.jsonl", help="Fichier de requêtes JSONL à traiter")
+    parser.add_argument("--output", metavar="RESULTATS.jsonl", help="Fichier de résultats (par défaut <entrée>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Requêtes traitées en parallèle")
+    parser.add_argument("--embedding-batch", type=int, default=BATCH_EMBEDDING_SIZE,
+                        help="Requêtes vectorisées par appel OpenAI")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Réutiliser (et alimenter) le cache partagé des résultats")
+    args = parser.parse_args()
+
+    if args.batch:
+        output_path = args.output or os.path.splitext(args.batch)[0] + ".results.jsonl"
+        system = QdrantSystem("ListeClients.csv")
+        stats = run_batch(system, args.batch, output_path, args.workers, args.embedding_batch, args.use_cache)
+        print(f"[📦 Lot] Terminé : {json.dumps(stats, ensure_ascii=False)}")
+        return
 
-if __name__ == "__main__":
     results = search_all_clients("Problèmes de connexion", format_type="Summary", recent_only=False)
 
     # Affichage des résultats
@@ -69,3 +266,7 @@ if __name__ == "__main__":
         print(f"\n=== {client} ===")
         for r in responses:
             print(f"- {r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ordonnancement des appels OpenAI sous quota
+Tous les appels OpenAI (enrichissement, embeddings, synthèse) passent par un
+ordonnanceur partagé qui respecte un double budget « seau à jetons » (requêtes
+et tokens par minute). Les appels en attente sont servis par priorité (les
+recherches interactives avant les traitements par lot). Une requête interactive
+est rejetée immédiatement, avec un délai Retry-After, lorsque son attente
+estimée dépasse la limite fixée ou le budget restant de sa requête (deadline.py).
+"""
+
+import heapq
+import itertools
+import math
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Any, Callable
+
+from openai import RateLimitError
+
+from deadline import current_deadline
+
+# Priorités (la plus petite valeur est servie en premier)
+INTERACTIVE = 0
+BATCH = 1
+
+_priority: ContextVar[int] = ContextVar("openai_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def openai_priority(priority: int):
+    """Fixe la priorité des appels OpenAI effectués dans ce contexte"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Appel refusé : le quota OpenAI ne permet pas de le servir dans le délai imparti"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Quota OpenAI saturé, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineRejected(AdmissionRejected):
+    """Appel refusé : l'attente estimée dépasse le budget restant de la requête"""
+
+
+class TokenBucket:
+    """Seau à jetons rechargé en continu (capacité par minute)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = monotonic()
+
+    def _refill(self):
+        now = monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Délai avant que `amount` jetons soient disponibles"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+
+    def deficit(self, amount: float) -> float:
+        """Délai avant que `amount` jetons aient été fournis, même au-delà de la capacité"""
+        self._refill()
+        return max(0.0, (amount - self.available) / self.rate)
+
+    def consume(self, amount: float):
+        self._refill()
+        self.available -= amount
+
+    def drain(self):
+        self._refill()
+        self.available = min(self.available, 0.0)
+
+
+class OpenAIScheduler:
+    """Ordonnanceur partagé des appels OpenAI"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 max_queue: int = 100, max_wait: float = 10.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _estimated_wait(self, priority: int, estimated_tokens: int) -> float:
+        # Budget nécessaire aux appels servis avant celui-ci, plus le sien
+        ahead = [e for e in self._queue if e[0] <= priority]
+        requests = len(ahead) + 1
+        tokens = sum(e[2] for e in ahead) + estimated_tokens
+        return max(self.requests.deficit(requests), self.tokens.deficit(tokens))
+
+    def _acquire(self, estimated_tokens: int):
+        priority = _priority.get()
+        estimated_tokens = max(1, int(estimated_tokens))
+        with self._cond:
+            wait = self._estimated_wait(priority, estimated_tokens)
+            if len(self._queue) >= self.max_queue or (priority == INTERACTIVE and wait > self.max_wait):
+                self.rejected += 1
+                raise AdmissionRejected(max(1, math.ceil(wait)))
+            deadline = current_deadline()
+            if deadline is not None and wait * 1000 > deadline.remaining_ms():
+                self.rejected += 1
+                raise DeadlineRejected(max(1, math.ceil(wait)))
+
+            entry = (priority, next(self._seq), estimated_tokens)
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    if self._queue[0] is entry:
+                        delay = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                        if delay <= 0:
+                            break
+                        self._cond.wait(timeout=delay)
+                    else:
+                        self._cond.wait()
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+                self.admitted += 1
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+        return estimated_tokens
+
+    def submit(self, fn: Callable[[], Any], estimated_tokens: int) -> Any:
+        """
+        Exécute un appel OpenAI lorsque le budget le permet
+
+        Args:
+            fn: Appel OpenAI à exécuter
+            estimated_tokens: Estimation des tokens consommés (entrée + sortie maximale)
+
+        Returns:
+            Réponse de l'appel
+
+        Raises:
+            AdmissionRejected: Si l'attente estimée dépasse la limite (appels interactifs)
+                ou si la file d'attente est pleine
+            DeadlineRejected: Si l'attente estimée dépasse le budget restant de la requête
+        """
+        reserved = self._acquire(estimated_tokens)
+        try:
+            response = fn()
+        except RateLimitError:
+            # Le quota réel est épuisé : on suspend les appels jusqu'à recharge
+            with self._cond:
+                self.tokens.drain()
+            raise
+
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        if isinstance(used, int):
+            with self._cond:
+                # Correction de l'estimation avec la consommation réelle
+                self.tokens.consume(used - reserved)
+        return response
+
+    def stats(self) -> dict:
+        """État de l'ordonnanceur"""
+        with self._cond:
+            self.tokens._refill()
+            self.requests._refill()
+            return {
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "available_requests": round(self.requests.available, 1),
+                "available_tokens": round(self.tokens.available),
+            }
+
+
+def scheduler_from_env() -> OpenAIScheduler:
+    """
+    Crée l'ordonnanceur à partir des variables d'environnement
+
+    Le quota est réparti entre les workers de l'API (WEB_CONCURRENCY), chacun
+    disposant de son propre ordonnanceur.
+    """
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return OpenAIScheduler(
+        requests_per_minute=float(os.getenv("OPENAI_RPM", "500")) / workers,
+        tokens_per_minute=float(os.getenv("OPENAI_TPM", "200000")) / workers,
+        max_queue=int(os.getenv("OPENAI_MAX_QUEUE", "100")),
+        max_wait=float(os.getenv("OPENAI_MAX_QUEUE_WAIT_S", "10")),
+    )
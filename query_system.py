@@ -7,23 +7,62 @@ Ce système permet d'interroger les collections Qdrant selon les priorités déf
 et de formater les réponses selon les formats demandés.
 """
 
-import csv
+import base64
+import hashlib
+import hmac
 import os
 import re   
 import json
-import unicodedata
-from fuzzywuzzy import fuzz 
+import random
+import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from dotenv import load_dotenv
-from qdrant_client.http.models import FieldCondition, MatchValue, Range, Filter
+from qdrant_client.http.models import FieldCondition, MatchAny, MatchValue, Range, Filter
 from qdrant_client import QdrantClient
 from time import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from context_packer import count_tokens, pack_context
+from dedup import HitDeduplicator
+from hit_formatter import format_hits, render_details
+from segmenter import extract_steps, get_segmentation, segment_cache
+from local_mirror import LocalMirror, LOCAL_MIRROR_DIR
+from chunking import CHUNKED_COLLECTIONS, chunk_collection_name
+from sharding import SHARDED_COLLECTIONS, ShardRouter
+from ranking import (RECENCY_PREFETCH_FACTOR, RECENCY_RANKING, blend_recency, created_timestamp, recency_enabled,
+                     recency_query, similarity_score)
+from coalescing import SingleFlight
+from copy_sync import CopySyncChecker
+from client_registry import get_registry, normalize_string
+from hit_stats import HitStatistics
+from openai_scheduler import AdmissionRejected, DeadlineRejected, scheduler_from_env
+from speculation import Speculation, submit_in_context
+from deadline import (DEADLINE_ENRICHMENT_MS, DEADLINE_SEARCH_MS, DEADLINE_SYNTHESIS_MS, DETAIL_INSTEAD_OF_SYNTHESIS,
+                      EXTRACTIVE_INSTEAD_OF_SYNTHESIS, FEWER_COLLECTIONS, LOCAL_RULES, PARTIAL_RESULTS, Deadline, call_timeout,
+                      current_deadline, request_deadline, retry_allowed)
+from extractive_summary import summarize
+from embedding_migration import (LEGACY_SPACE, SHADOW_SPACE, SHADOW_COLLECTIONS, SHADOW_CUTOVER_COLLECTIONS,
+                                 DUAL_READ_K, DUAL_READ_SAMPLE_RATE, DUAL_READ_WORKERS, SHADOW_AUTO_CUTOVER,
+                                 DualReadStats, EmbeddingSpace, overlap_at_k)
+from shared_cache import (SharedCache, SHARED_CACHE_PATH, EMBEDDING_CACHE_TTL_S, ENRICHMENT_CACHE_TTL_S,
+                          RESULT_CACHE_TTL_S)
+from resilience import (CircuitBreaker, CollectionUnavailableError, HedgePool, LatencyTracker, hedged_call,
+                        is_client_error, is_transient_error, retry_call)
 
 # Chargement des variables d'environnement
 load_dotenv()
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Délais et nouvelles tentatives des appels OpenAI (les tentatives sont gérées par retry_call)
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "20"))
+OPENAI_RETRIES = int(os.getenv("OPENAI_RETRIES", "2"))
+OPENAI_RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=OPENAI_TIMEOUT_S, max_retries=0)
+
+# Ordonnanceur partagé de tous les appels OpenAI (quota de requêtes et de tokens par minute)
+openai_scheduler = scheduler_from_env()
 
 # Définition du prompt système pour OpenAI
 system_prompt = """
@@ -63,58 +102,142 @@ Tu dois retourner un JSON brut, sans balises Markdown ni code. Ce JSON doit cont
 # Définition des collections
 COLLECTIONS = ["JIRA", "CONFLUENCE", "ZENDESK", "NETSUITE", "NETSUITE_DUMMIES", "SAP"]
 
+# Nombre maximal de résultats par page (limite demandée, proposée par le modèle ou lue dans un curseur)
+MAX_QUERY_LIMIT = int(os.getenv("MAX_QUERY_LIMIT", "50"))
+
+# Clé de signature des curseurs de pagination, commune à tous les workers
+# (sans elle, une clé aléatoire est tirée : les curseurs ne valent que pour ce processus)
+CURSOR_SECRET = (os.getenv("CURSOR_SECRET") or os.urandom(32).hex()).encode("utf-8")
+
 # Définition des formats de réponse
-FORMATS = ["Summary", "Detail", "Guide"]
+FORMATS = ["Summary", "Summary-fast", "Detail", "Guide"]
 
-def normalize_string(text: str) -> str:
-    if not text:
-        return ""
-    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8')
-    return text.upper().strip()
+# Format de repli de chaque format synthétisé par le modèle (modèle indisponible ou échéance proche)
+SYNTHESIS_FALLBACKS = {"Summary": "Summary-fast", "Guide": "Detail"}
+
+# Budget de tokens du contexte envoyé au LLM pour les formats Summary et Guide
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Résultats supplémentaires demandés par collection pour remplacer les doublons écartés
+DEDUP_OVERFETCH = int(os.getenv("DEDUP_OVERFETCH", "3"))
+
+# Collections servies en priorité par le miroir local (petites collections)
+LOCAL_MIRROR_PRIMARY = [c.strip() for c in os.getenv("LOCAL_MIRROR_PRIMARY", "SAP,NETSUITE_DUMMIES").split(",") if c.strip()]
+
+# Budget de latence (ms) d'une recherche distante avant repli sur le miroir local
+REMOTE_SEARCH_BUDGET_MS = int(os.getenv("REMOTE_SEARCH_BUDGET_MS", "1500"))
+
+# Score de confiance : la recherche s'arrête dès que `limit` résultats l'atteignent
+EARLY_STOP_SCORE = float(os.getenv("EARLY_STOP_SCORE", "0.80"))
+
+# Délai et nouvelles tentatives des appels Qdrant
+QDRANT_TIMEOUT_S = float(os.getenv("QDRANT_TIMEOUT_S", "5"))
+QDRANT_RETRIES = int(os.getenv("QDRANT_RETRIES", "1"))
+
+# Requête Qdrant dupliquée si la première dépasse ce percentile des latences récentes
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "50"))
+HEDGE_MIN_SAMPLES = 20
+# Requêtes dupliquées simultanées au plus (pool distinct des recherches principales)
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "4"))
+
+# Disjoncteur par collection : échecs consécutifs, durée de mise à l'écart, seuil d'appel lent
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_S = float(os.getenv("BREAKER_COOLDOWN_S", "30"))
+BREAKER_SLOW_MS = float(os.getenv("BREAKER_SLOW_MS", "3000"))
+
+# Nombre de threads utilisés pour les appels distants concurrents
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+
+# Exécution spéculative : embedding et recherche par défaut lancés pendant l'enrichissement
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "true").lower() == "true"
+SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "16"))
+# Nombre de collections prioritaires cherchées par anticipation (les suivantes attendent l'enrichissement)
+SPECULATIVE_COLLECTIONS = int(os.getenv("SPECULATIVE_COLLECTIONS", "2"))
+
+# Statistiques (/api/stats) : champs de regroupement, nombre de mois et de valeurs par défaut
+STATS_GROUP_FIELDS = ("status", "priority", "resolution", "erp")
+STATS_MONTHS = int(os.getenv("STATS_MONTHS", "12"))
+STATS_FACET_LIMIT = int(os.getenv("STATS_FACET_LIMIT", "50"))
+# Nombre maximal de mois du regroupement mensuel (un comptage par mois et par collection)
+STATS_MAX_MONTHS = int(os.getenv("STATS_MAX_MONTHS", "36"))
+# Threads des comptages : pool distinct de celui des recherches
+STATS_WORKERS = int(os.getenv("STATS_WORKERS", "4"))
 
 def extract_client_name_from_csv(query: str, csv_path: str = "ListeClients.csv"):
     """
     Détecte un nom de client dans une requête utilisateur, basé sur ListeClients.csv
+    Le fichier est lu via le registre des clients (rechargé en arrière-plan), jamais à chaque requête.
     Retourne: (nom_client, score, source)
     """
-    if not query or len(query.strip()) < 2:
-        return None, 0.0, {}
-
-    query_normalized = normalize_string(query)
-    best_match = None
-    best_score = 0
-    best_source = None
-
     try:
-        with open(csv_path, mode='r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                client_name = row.get("Client", "").strip()
-                if not client_name:
-                    continue
-
-                # Match exact
-                if normalize_string(client_name) in query_normalized:
-                    return client_name, 100.0, {"source": client_name}
-
-                # Match flou
-                score = fuzz.ratio(query_normalized, normalize_string(client_name))
-                if score > best_score:
-                    best_score = score
-                    best_match = client_name
-                    best_source = client_name
-
-        if best_match and best_score >= 80:
-            return best_match, best_score, {"source": best_source}
-
+        return get_registry(csv_path).match(query)
     except Exception as e:
         print(f"[⚠️] Erreur lors de la détection client depuis CSV: {e}")
-
-    return None, 0.0, {}
+        return None, 0.0, {}
 
 def extract_json(text: str) -> str:
     match = re.search(r"\{[\s\S]*\}", text)
     return match.group(0) if match else text
+
+class InvalidCursorError(ValueError):
+    """Curseur de pagination invalide"""
+
+def _cursor_signature(raw: bytes) -> str:
+    """Signature HMAC-SHA256 (tronquée) du contenu d'un curseur"""
+    digest = hmac.new(CURSOR_SECRET, raw, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """
+    Encode l'état de pagination d'une recherche sans embedding en curseur opaque
+
+    Args:
+        state: Collections, filtres, limite, index de collection et offset de la page suivante
+
+    Returns:
+        Curseur opaque (base64 url-safe, suivi de sa signature)
+    """
+    raw = json.dumps(state, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return f"{base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')}.{_cursor_signature(raw)}"
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Décode et vérifie un curseur produit par encode_cursor
+
+    Le curseur doit porter une signature valide ; ses collections doivent être
+    connues, son index désigner l'une d'elles et sa limite est ramenée à MAX_QUERY_LIMIT.
+
+    Args:
+        cursor: Curseur opaque reçu du client
+
+    Returns:
+        État de pagination
+
+    Raises:
+        InvalidCursorError: Si le curseur est invalide
+    """
+    try:
+        encoded, _, signature = cursor.partition(".")
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        if not hmac.compare_digest(signature, _cursor_signature(raw)):
+            raise ValueError("signature invalide")
+        state = json.loads(raw)
+        collections = state["collections"]
+        if not isinstance(collections, list) or not isinstance(state["filters"], dict):
+            raise ValueError("structure inattendue")
+        if not collections or not set(collections) <= set(COLLECTIONS):
+            raise ValueError("collections inconnues")
+        state["index"] = int(state["index"])
+        if not 0 <= state["index"] < len(collections):
+            raise ValueError("index hors limites")
+        state["limit"] = max(1, min(int(state["limit"]), MAX_QUERY_LIMIT))
+        if not isinstance(state["offset"], (int, str, type(None))):
+            raise ValueError("offset inattendu")
+    except Exception as e:
+        raise InvalidCursorError(f"Curseur invalide: {e}") from e
+    return state
+
 class QdrantSystem:
     """Système de requêtes pour les collections Qdrant d'IT SPIRIT"""
     
@@ -125,13 +248,43 @@ class QdrantSystem:
         Args:
             clients_file: Chemin vers le fichier CSV contenant les informations clients
         """
-        self.clients = self._load_clients(clients_file)
+        self.client_registry = get_registry(clients_file)
         self.collections = COLLECTIONS
         self.formats = FORMATS
         self.client = QdrantClient(
             url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
+            api_key=os.getenv("QDRANT_API_KEY"),
+            timeout=QDRANT_TIMEOUT_S
         )
+        self.local_mirror = LocalMirror(LOCAL_MIRROR_DIR) if LOCAL_MIRROR_DIR else None
+        # Fraîcheur des copies (partitionnées, réduites) par rapport aux collections d'origine
+        self.copy_sync = CopySyncChecker()
+        # Collections partitionnées par client : seul le shard du client filtré est interrogé
+        self.shard_router = ShardRouter(self.client, self.client_registry, copy_sync=self.copy_sync)
+        self.executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS)
+        # Les comptages de /api/stats ont leur propre pool : ils ne retardent pas les recherches
+        self.stats_executor = ThreadPoolExecutor(max_workers=STATS_WORKERS)
+        # Les requêtes dupliquées ont leur propre pool borné : un blocage de Qdrant ne sature pas self.executor
+        self.hedge_pool = HedgePool(ThreadPoolExecutor(max_workers=HEDGE_WORKERS), HEDGE_WORKERS)
+        self.single_flight = SingleFlight()
+        self.hit_stats = HitStatistics()
+        self.breakers = defaultdict(lambda: CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN_S, BREAKER_SLOW_MS))
+        self.latencies = defaultdict(LatencyTracker)
+        # Pool distinct de self.executor : les tâches spéculatives y attendent les recherches dupliquées
+        self.speculation_executor = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS)
+        self.speculation_stats = {"hit": 0, "partial": 0, "miss": 0}
+        # Cache partagé entre les workers (embeddings, requêtes enrichies, résultats)
+        self.shared_cache = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
+        # Embeddings calculés à l'avance par lot (traitement par lot), consommés une seule fois
+        self.primed_embeddings: Dict[str, List[float]] = {}
+        # Fonction (textes, espace) -> vecteurs remplaçant l'API OpenAI (StubEmbedder hors ligne)
+        self.embedder = None
+        # Migration vers le modèle réduit : collections basculées et comparaisons des deux chemins
+        self.cutover_collections = set(SHADOW_CUTOVER_COLLECTIONS)
+        self.dual_read = DualReadStats()
+        self.dual_read_executor = ThreadPoolExecutor(max_workers=DUAL_READ_WORKERS)
+        for collection_name in self.cutover_collections & set(SHARDED_COLLECTIONS):
+            print(f"[🔀 Migration] {collection_name} basculée : sa version réduite n'est pas partitionnée par client")
     def enrich_query_with_openai(self, user_query):
         """
         Enrichit une requête utilisateur en utilisant l'API OpenAI et en ajoutant des filtres locaux.
@@ -142,71 +295,189 @@ class QdrantSystem:
         Returns:
             dict: La requête enrichie sous forme de dictionnaire JSON.
         """
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_query}
-            ],
-            temperature=0.0,
-            max_tokens=300
-        )
-
-        enriched_query = response.choices[0].message.content.strip()
+        # Seule la réponse du modèle est mise en cache : les filtres locaux
+        # (dates relatives notamment) sont recalculés à chaque requête
+        enriched_query = self.shared_cache.get_json("enrichment", user_query) if self.shared_cache else None
+        if enriched_query is None:
+            enriched_query = self.create_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_query}
+                ],
+                temperature=0.0,
+                max_tokens=300
+            )
+            if self.shared_cache:
+                self.shared_cache.set_json("enrichment", user_query, enriched_query, ENRICHMENT_CACHE_TTL_S)
         enriched_json = json.loads(extract_json(enriched_query))
+        enriched_json["filters"] = self.apply_local_rules(user_query, enriched_json.get("filters", {}))
 
-        filters = enriched_json.get("filters", {})
+        print("[🧠 GPT - Query enrichie]", json.dumps(enriched_json, indent=2))
+        return enriched_json
+
+    def apply_local_rules(self, user_query: str, filters: dict = None) -> dict:
+        """
+        Complète les filtres avec les règles locales (période récente, client détecté)
+
+        Appliquées seules, ces règles prédisent les filtres de l'enrichissement
+        lorsque le modèle n'en ajoute aucun (voir l'exécution spéculative).
+
+        Args:
+            user_query: La requête utilisateur
+            filters: Filtres déjà établis (optionnel)
+
+        Returns:
+            Filtres complétés
+        """
+        filters = dict(filters or {})
         query_upper = user_query.upper()
 
         if "date" not in filters and any(w in query_upper for w in ["TICKET", "RÉCENT", "RÉCENTS", "RECENT"]):
-            six_months_ago = int(time()) - 60*60*24*180
+            # Arrondi au jour : la prédiction et l'enrichissement calculent la même borne
+            six_months_ago = int(time()) // 86400 * 86400 - 60*60*24*180
             filters["date"] = {"gte": six_months_ago}
-            enriched_json["filters"] = filters
 
         if not filters.get("client"):
-            detected_client, score, _ = extract_client_name_from_csv(user_query)
+            detected_client, score, _ = self.client_registry.match(user_query)
             if detected_client:
                 filters["client"] = detected_client
-                enriched_json["filters"] = filters
 
-        print("[🧠 GPT - Query enrichie]", json.dumps(enriched_json, indent=2))
-        return enriched_json
+        return filters
     
-    def _load_clients(self, clients_file: str) -> Dict[str, Dict[str, Any]]:
+    def create_embedding(self, text: str, space: EmbeddingSpace = LEGACY_SPACE) -> List[float]:
         """
-        Charge les informations clients depuis le fichier CSV
-        
+        Calcule l'embedding d'un texte (via l'ordonnanceur OpenAI, avec délai maximal et nouvelles tentatives)
+        Les embeddings sont conservés en float32 dans le cache partagé.
+
         Args:
-            clients_file: Chemin vers le fichier CSV contenant les informations clients
-            
+            text: Texte à vectoriser
+            space: Modèle d'embedding (ada-002 par défaut, voir embedding_migration.py)
+
         Returns:
-            Dictionnaire des clients avec leurs informations
+            Vecteur d'embedding
         """
-        clients = {}
-        
-        with open(clients_file, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                client_name = row['Client']
-                if client_name not in clients:
-                    clients[client_name] = {
-                        'consultant': row['Consultant'],
-                        'statut': row['Statut'],
-                        'jira': row['JIRA'],
-                        'zendesk': row['ZENDESK'],
-                        'confluence': row['CONFLUENCE'],
-                        'erp': row['ERP']
-                    }
-                # Si le client existe déjà, on ne met à jour que les champs vides
-                else:
-                    for field, csv_field in [('consultant', 'Consultant'), ('statut', 'Statut'), 
-                                           ('jira', 'JIRA'), ('zendesk', 'ZENDESK'), 
-                                           ('confluence', 'CONFLUENCE'), ('erp', 'ERP')]:
-                        if not clients[client_name][field] and row[csv_field]:
-                            clients[client_name][field] = row[csv_field]
-        
-        return clients
-    def simple_filter_search(self, collection_name, client_name=None, recent_only=False, filters: Filter = None, limit=5):
+        if space is LEGACY_SPACE:
+            primed = self.primed_embeddings.pop(text, None)
+            if primed is not None:
+                return primed
+
+        cache_key = space.cache_key(text)
+        if self.shared_cache:
+            cached = self.shared_cache.get("embedding", cache_key)
+            if cached is not None:
+                return np.frombuffer(cached, dtype=np.float32).tolist()
+
+        embedding = self.create_embeddings([text], space)[0]
+        if self.shared_cache:
+            self.shared_cache.set("embedding", cache_key, np.asarray(embedding, dtype=np.float32).tobytes(),
+                                  EMBEDDING_CACHE_TTL_S)
+        return embedding
+
+    def create_embeddings(self, texts: List[str], space: EmbeddingSpace = LEGACY_SPACE) -> List[List[float]]:
+        """
+        Calcule les embeddings d'une liste de textes en un seul appel (traitements par lot)
+
+        Args:
+            texts: Textes à vectoriser
+            space: Modèle d'embedding (ada-002 par défaut, voir embedding_migration.py)
+
+        Returns:
+            Vecteurs d'embedding, dans l'ordre des textes
+        """
+        if not texts:
+            return []
+        if self.embedder is not None:
+            return self.embedder(texts, space)
+        options = {"dimensions": space.dimensions} if space.dimensions else {}
+        response = retry_call(
+            lambda: openai_scheduler.submit(
+                lambda: openai_client.embeddings.create(input=texts, model=space.model,
+                                                        timeout=call_timeout(OPENAI_TIMEOUT_S), **options),
+                sum(count_tokens(text) for text in texts)
+            ),
+            attempts=OPENAI_RETRIES + 1,
+            retry_on=OPENAI_RETRYABLE_ERRORS,
+            before_retry=retry_allowed
+        )
+        return [item.embedding for item in response.data]
+
+    def prime_embeddings(self, texts: List[str]):
+        """
+        Calcule en un seul appel les embeddings de requêtes à venir (traitement par lot)
+
+        Chaque embedding est consommé par le premier create_embedding du même texte.
+
+        Args:
+            texts: Requêtes dont l'embedding sera nécessaire
+        """
+        missing = list(dict.fromkeys(t for t in texts if t and t not in self.primed_embeddings))
+        for text, embedding in zip(missing, self.create_embeddings(missing)):
+            self.primed_embeddings[text] = embedding
+
+    def create_completion(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """
+        Appelle gpt-4o-mini (via l'ordonnanceur OpenAI, avec délai maximal et nouvelles tentatives)
+
+        Args:
+            messages: Messages de la conversation
+            temperature: Température d'échantillonnage
+            max_tokens: Nombre maximal de tokens générés
+
+        Returns:
+            Texte de la réponse
+        """
+        estimated_tokens = sum(count_tokens(m["content"]) for m in messages) + max_tokens
+        response = retry_call(
+            lambda: openai_scheduler.submit(
+                lambda: openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=call_timeout(OPENAI_TIMEOUT_S)
+                ),
+                estimated_tokens
+            ),
+            attempts=OPENAI_RETRIES + 1,
+            retry_on=OPENAI_RETRYABLE_ERRORS,
+            before_retry=retry_allowed
+        )
+        return response.choices[0].message.content.strip()
+
+    def _guarded_call(self, collection_name: str, fn):
+        """
+        Exécute un appel Qdrant sur une collection derrière son disjoncteur, avec nouvelles tentatives
+
+        Seules les erreurs de connexion et les réponses 5xx sont retentées (un délai
+        dépassé ne l'est pas), et seulement si l'échéance de la requête le permet.
+        Une erreur propre à la requête (4xx, filtre invalide par exemple) ne compte
+        pas comme un échec de la collection.
+
+        Raises:
+            CollectionUnavailableError: Si le disjoncteur de la collection est ouvert
+        """
+        breaker = self.breakers[collection_name]
+        if not breaker.allow():
+            raise CollectionUnavailableError(f"Collection {collection_name} temporairement écartée")
+        start = time()
+        try:
+            result = retry_call(fn, attempts=QDRANT_RETRIES + 1, retry_if=is_transient_error,
+                                before_retry=retry_allowed)
+        except Exception as e:
+            if is_client_error(e):
+                breaker.record_ignored()
+            else:
+                breaker.record_failure()
+            raise
+        breaker.record_success((time() - start) * 1000)
+        return result
+
+    @property
+    def clients(self) -> Dict[str, Dict[str, Any]]:
+        """Clients connus (état courant du registre, rechargé lorsque le CSV change)"""
+        return self.client_registry.clients
+
+    def simple_filter_search(self, collection_name, client_name=None, recent_only=False, filters: Filter = None, limit=5, offset=None):
         """
         Effectue une recherche simple dans une collection Qdrant sans vectorisation.
 
@@ -216,9 +487,11 @@ class QdrantSystem:
             recent_only: Si True, filtre les résultats pour les éléments créés il y a moins de 6 mois (optionnel)
             filters: Objet Filter Qdrant à appliquer (filtrage par client, date, etc.) (optionnel)
             limit: Nombre de résultats à retourner
+            offset: Identifiant du point à partir duquel reprendre le parcours (optionnel)
 
         Returns:
-            Liste des payloads formatés
+            Tuple (liste de tuples (payload, score, identifiant du point) avec un score
+            toujours None, identifiant du point de la page suivante ou None)
         """
         filter_conditions = []
 
@@ -226,7 +499,7 @@ class QdrantSystem:
             filter_conditions.append(
                 FieldCondition(
                     key="client",
-                    match=MatchValue(value=client_name)
+                    match=MatchAny(any=self.client_registry.client_aliases(client_name, collection_name))
                 )
             )
 
@@ -244,19 +517,30 @@ class QdrantSystem:
         else:
             search_filter = Filter(must=filter_conditions) if filter_conditions else None
 
-        results, _ = self.client.scroll(
-            collection_name=collection_name,
+        physical_name, shards = self.shard_router.route(collection_name, search_filter)
+        results, next_offset = self._guarded_call(collection_name, lambda: self.client.scroll(
+            collection_name=physical_name,
             scroll_filter=search_filter,
             limit=limit,
-            with_payload=True
-        )
+            offset=offset,
+            with_payload=True,
+            shard_key_selector=shards
+        ))
 
-        return [self.format_ticket_payload(hit.payload) for hit in results]
+        return [(hit.payload, None, hit.id) for hit in results], next_offset
 
-    def search_in_collection(self, collection_name: str, query: str, client_name: str = None, recent_only: bool = False, limit: int = 5, filters: Filter = None):
+    def search_in_collection(self, collection_name: str, query: str, client_name: str = None, recent_only: bool = False, limit: int = 5, filters: Filter = None,
+                             query_vector: List[float] = None, grouped: bool = None, space: EmbeddingSpace = None):
         """
         Effectue une recherche dans une collection avec vectorisation et filtres.
 
+        En mode groupé, la recherche porte sur la collection de fragments (voir
+        chunking.py) et renvoie le meilleur fragment de chaque document : le
+        payload contient le texte de ce fragment (content) et les métadonnées du document.
+        Une collection basculée sur le modèle réduit est cherchée dans sa version
+        réduite (voir embedding_migration.py), sans miroir local, fragments ni
+        partitionnement par client ; ses scores sont ramenés sur l'échelle d'ada-002.
+
         Args:
             collection_name: Nom de la collection
             query: Texte de la requête utilisateur
@@ -264,25 +548,455 @@ class QdrantSystem:
             recent_only: Booléen pour filtrer les données récentes (non utilisé ici)
             limit: Nombre de résultats à retourner
             filters: Filtre Qdrant (déjà construit via enrich_query_with_openai)
+            query_vector: Embedding de la requête dans l'espace cherché, s'il est déjà calculé (optionnel)
+            grouped: Recherche groupée par document (par défaut pour les collections de CHUNKED_COLLECTIONS)
+            space: Modèle d'embedding cherché (par défaut celui servant la collection)
 
         Returns:
-            Liste des documents pertinents (payloads) avec leurs scores
+            Liste de tuples (payload, score, identifiant du point ; celui du document en mode groupé)
         """
-        embedding_response = openai_client.embeddings.create(
-            input=query,
-            model="text-embedding-ada-002"
-        )
-        query_vector = embedding_response.data[0].embedding
+        space = space or self.embedding_space(collection_name)
+        if query_vector is None:
+            query_vector = self.create_embedding(query, space)
+        if space is not LEGACY_SPACE:
+            shadow_name = space.collection_name(collection_name)
+            hits = self._remote_search(shadow_name, query_vector, filters, limit)
+            return [(payload, self._calibrated_score(collection_name, shadow_name, space, score, payload), point_id)
+                    for payload, score, point_id in hits]
+
+        if grouped is None:
+            grouped = collection_name in CHUNKED_COLLECTIONS
+        if grouped:
+            return self._remote_search(collection_name, query_vector, filters, limit, grouped=True)
+
+        mirror = self.local_mirror
+        mirrored = mirror is not None and mirror.has(collection_name)
+
+        # Petites collections : le miroir local est la source principale
+        if mirrored and collection_name in LOCAL_MIRROR_PRIMARY:
+            try:
+                return self._mirror_search(collection_name, query_vector, filters, limit)
+            except ValueError as e:
+                print(f"[🪞 Miroir] {collection_name}: filtre non géré localement ({e}), recherche distante")
+                mirrored = False
 
-        results = self.client.search(
-            collection_name=collection_name,
-            query_vector=query_vector,
-            query_filter=filters,
-            limit=limit,
-            with_payload=True
-        )
+        if not mirrored:
+            return self._remote_search(collection_name, query_vector, filters, limit)
+
+        # Autres collections : repli sur le miroir si Qdrant dépasse son budget de latence
+        try:
+            return self._remote_search(collection_name, query_vector, filters, limit,
+                                       timeout=min(QDRANT_TIMEOUT_S, REMOTE_SEARCH_BUDGET_MS / 1000))
+        except Exception as e:
+            reason = "délai dépassé" if isinstance(e, TimeoutError) else str(e)
+            print(f"[🪞 Miroir] {collection_name}: recherche distante en échec ({reason}), repli sur le miroir local")
+            return self._mirror_search(collection_name, query_vector, filters, limit)
+
+    @staticmethod
+    def _calibrated_score(collection_name: str, shadow_name: str, space: EmbeddingSpace, score: float,
+                          payload: Dict[str, Any]) -> float:
+        """Score d'une collection réduite sur l'échelle d'ada-002 (seule la similarité est calibrée)"""
+        now = time()
+        similarity = space.calibrate(similarity_score(shadow_name, score, payload, now))
+        return blend_recency(collection_name, similarity, payload, now) if recency_enabled(collection_name) else similarity
+
+    def embedding_space(self, collection_name: str) -> EmbeddingSpace:
+        """
+        Modèle d'embedding servant une collection
+
+        Une collection basculée est servie par sa version réduite tant que celle-ci
+        a le même nombre de points que l'origine ; sinon (ingestion depuis la
+        dernière reconstruction) par ada-002. La comparaison est partagée avec le
+        routage des shards (self.copy_sync) : une seule requête recompte les points
+        lorsqu'elle est périmée, les autres gardent le dernier résultat.
+        """
+        if collection_name in self.cutover_collections and \
+                self.copy_sync.in_sync(self.client, collection_name, SHADOW_SPACE.collection_name(collection_name)):
+            return SHADOW_SPACE
+        return LEGACY_SPACE
 
-        return [(hit.payload, hit.score) for hit in results]
+    def _mirror_search(self, collection_name: str, query_vector: List[float], filters: Filter, limit: int):
+        """
+        Recherche dans le miroir local, classée comme la recherche distante
+
+        Le miroir ne connaît que la similarité : la fraîcheur y est appliquée par
+        le même calcul que la formule Qdrant, sur un nombre élargi de candidats.
+
+        Returns:
+            Liste de tuples (payload, score, identifiant du point)
+        """
+        if not recency_enabled(collection_name):
+            return self.local_mirror.search(collection_name, query_vector, filters, limit)
+        now = time()
+        hits = self.local_mirror.search(collection_name, query_vector, filters, limit * RECENCY_PREFETCH_FACTOR)
+        blended = [(payload, blend_recency(collection_name, score, payload, now), point_id)
+                   for payload, score, point_id in hits]
+        blended.sort(key=lambda hit: hit[1], reverse=True)
+        return blended[:limit]
+
+    def _remote_search(self, collection_name: str, query_vector: List[float], filters: Filter, limit: int,
+                       timeout: float = QDRANT_TIMEOUT_S, grouped: bool = False):
+        """
+        Recherche vectorielle sur le cluster Qdrant distant.
+
+        La recherche passe par le disjoncteur de la collection. Si elle tarde
+        au-delà du percentile HEDGE_PERCENTILE des latences récentes, une
+        requête identique est lancée en parallèle et la première réponse est retenue.
+        En mode groupé, la collection de fragments est interrogée avec un seul
+        fragment par document (group_by sur parent_id). Si le classement par
+        fraîcheur est actif, Qdrant combine similarité et date (voir ranking.py).
+
+        Returns:
+            Liste de tuples (payload, score, identifiant du point)
+
+        Raises:
+            CollectionUnavailableError: Si le disjoncteur de la collection est ouvert
+            TimeoutError: Si aucune réponse n'arrive avant timeout secondes (ou avant l'échéance de la requête)
+        """
+        tracker = self.latencies[collection_name]
+        hedge_delay = None
+        if len(tracker) >= HEDGE_MIN_SAMPLES:
+            hedge_delay = max(HEDGE_MIN_DELAY_MS, tracker.percentile(HEDGE_PERCENTILE)) / 1000
+
+        recency = recency_enabled(collection_name)
+
+        def search():
+            start = time()
+            physical_name, shards = self.shard_router.route(collection_name, filters)
+            if recency:
+                # Prefetch vectoriel filtré puis formule similarité + fraîcheur, le tout dans Qdrant
+                results = self.client.query_points(
+                    collection_name=physical_name,
+                    **recency_query(collection_name, query_vector, filters, limit, time()),
+                    limit=limit,
+                    with_payload=True,
+                    shard_key_selector=shards
+                ).points
+            else:
+                results = self.client.search(
+                    collection_name=physical_name,
+                    query_vector=query_vector,
+                    query_filter=filters,
+                    limit=limit,
+                    with_payload=True,
+                    shard_key_selector=shards
+                )
+            tracker.record((time() - start) * 1000)
+            return [(hit.payload, hit.score, hit.id) for hit in results]
+
+        def grouped_search():
+            start = time()
+            if recency:
+                query = recency_query(collection_name, query_vector, filters, limit, time())
+            else:
+                query = {"query": query_vector, "query_filter": filters}
+            results = self.client.query_points_groups(
+                collection_name=chunk_collection_name(collection_name),
+                **query,
+                group_by="parent_id",
+                group_size=1,
+                limit=limit,
+                with_payload=True
+            )
+            tracker.record((time() - start) * 1000)
+            return [(group.hits[0].payload, group.hits[0].score, group.id) for group in results.groups if group.hits]
+
+        run = grouped_search if grouped else search
+        # Le délai de chaque tentative est réduit au budget restant à ce moment
+        return self._guarded_call(collection_name, lambda: hedged_call(self.executor, run, hedge_delay,
+                                                                           call_timeout(timeout), self.hedge_pool))
+
+    def _start_speculation(self, query: str, client_name: str, erp: str, recent_only: bool, limit: int) -> Speculation:
+        """
+        Lance, pendant l'enrichissement, l'embedding de la requête et la recherche par défaut
+
+        La recherche par défaut porte sur les SPECULATIVE_COLLECTIONS premières collections
+        prévues pour le client et l'ERP choisis dans l'interface, avec les filtres
+        prédits par les règles locales.
+
+        Returns:
+            Speculation à transmettre à _collect_vector_hits
+        """
+        embedding = submit_in_context(self.speculation_executor, self.create_embedding, query)
+
+        filters_dict = self.apply_local_rules(query)
+        scope_client = filters_dict.get("client") or client_name
+        scope_erp = erp or self.get_client_erp(scope_client)
+        scopes = HitStatistics.scopes(normalize_string(scope_client), scope_erp)
+        ordered, _, _ = self.hit_stats.plan(scopes, self.get_prioritized_collections(client_name, erp))
+
+        def timed_search(collection_name, query_filter, fetch_limit):
+            # L'embedding spéculatif est celui d'ada-002 ; une collection basculée calcule le sien
+            query_vector = embedding.result() if self.embedding_space(collection_name) is LEGACY_SPACE else None
+            start = time()
+            hits = self.search_in_collection(
+                collection_name=collection_name,
+                query=query,
+                client_name=client_name,
+                recent_only=recent_only,
+                limit=fetch_limit,
+                filters=query_filter,
+                query_vector=query_vector
+            )
+            return hits, (time() - start) * 1000
+
+        fetch_limit = limit + DEDUP_OVERFETCH
+        searches = {}
+        for collection_name in ordered[:SPECULATIVE_COLLECTIONS]:
+            query_filter = self.apply_filters(filters_dict, collection_name)
+            future = submit_in_context(self.speculation_executor, timed_search, collection_name, query_filter, fetch_limit)
+            searches[collection_name] = (query_filter, fetch_limit, future)
+        return Speculation(embedding, searches)
+
+    def _collect_vector_hits(self, query, collections, filters_by_collection, limit, scopes, client_name=None,
+                             recent_only=False, speculation: Speculation = None):
+        """
+        Recherche vectorielle dans les collections, ordonnées selon les statistiques de résultats.
+
+        Les collections qui n'ont jamais rien renvoyé d'utile pour ce périmètre sont
+        ignorées, et la recherche s'arrête dès que `limit` résultats dépassent le
+        score de confiance (sauf pour les requêtes d'exploration) ou lorsque
+        l'échéance de la requête approche (DEADLINE_SEARCH_MS). Pour une part
+        DUAL_READ_SAMPLE_RATE des requêtes, les collections ayant une version réduite
+        sont aussi cherchées avec l'autre modèle, en arrière-plan, pour comparaison.
+
+        Args:
+            query: Texte de la requête utilisateur
+            collections: Collections candidates, par ordre de priorité
+            filters_by_collection: Filtre Qdrant de chaque collection
+            limit: Nombre de résultats à retourner
+            scopes: Périmètres statistiques de la requête (client, ERP, global)
+            client_name: Nom du client (optionnel)
+            recent_only: Booléen pour filtrer les données récentes (optionnel)
+            speculation: Embedding et recherches lancés pendant l'enrichissement (optionnel),
+                réutilisés lorsqu'ils correspondent à la recherche voulue
+
+        Returns:
+            Tuple (meilleurs résultats (payload, score, identifiant) par score décroissant,
+            collections effectivement interrogées, collections écartées par leur disjoncteur ou en erreur)
+        """
+        ordered, skipped, exploring = self.hit_stats.plan(scopes, collections)
+        if skipped:
+            print(f"[📊 Statistiques] Collections ignorées (jamais utiles pour {scopes[0]}): {', '.join(skipped)}")
+        deadline = current_deadline()
+
+        # Embedding de la requête par modèle, calculé à la première collection qui en a besoin
+        vectors = {}
+        if speculation is not None:
+            try:
+                vectors[LEGACY_SPACE.name] = speculation.query_vector()
+            except Exception as e:
+                print(f"[🔮 Spéculation] Embedding spéculatif en échec ({e}), nouveau calcul")
+
+        def query_vector(space):
+            if space.name not in vectors:
+                vectors[space.name] = self.create_embedding(query, space)
+            return vectors[space.name]
+
+        dual_read = DUAL_READ_SAMPLE_RATE > 0 and random.random() < DUAL_READ_SAMPLE_RATE
+
+        raw_hits = []
+        searched = []
+        unavailable = []
+        confident = 0
+        deduplicator = HitDeduplicator()
+
+        for position, collection_name in enumerate(ordered):
+            if confident >= limit and not exploring:
+                break
+            # Échéance proche : les collections suivantes (les moins prioritaires) ne sont pas interrogées
+            if position and deadline and not deadline.allows(DEADLINE_SEARCH_MS):
+                deadline.degrade(FEWER_COLLECTIONS, f"non interrogées : {', '.join(ordered[position:])}")
+                break
+            try:
+                searched.append(collection_name)
+                # On demande quelques résultats de plus pour remplacer les doublons écartés
+                fetch_limit = limit + DEDUP_OVERFETCH
+                query_filter = filters_by_collection[collection_name]
+                speculative = speculation.take(collection_name, query_filter, fetch_limit) if speculation else None
+                hits = None
+                if speculative is not None:
+                    try:
+                        hits, latency_ms = speculative.result()
+                    except Exception as e:
+                        # Embedding ou recherche spéculative en échec : la recherche est refaite normalement
+                        print(f"[🔮 Spéculation] {collection_name}: recherche spéculative en échec ({e}), nouvelle recherche")
+                        speculation.fail(collection_name)
+                if hits is None:
+                    space = self.embedding_space(collection_name)
+                    vector = query_vector(space)
+                    start = time()
+                    hits = self.search_in_collection(
+                        collection_name=collection_name,
+                        query=query,
+                        client_name=client_name,
+                        recent_only=recent_only,
+                        limit=fetch_limit,
+                        filters=query_filter,
+                        query_vector=vector,
+                        space=space
+                    )
+                    latency_ms = (time() - start) * 1000
+                # Statistiques et arrêt anticipé portent sur la similarité, hors part de fraîcheur
+                now = time()
+                similarities = [similarity_score(collection_name, score, payload, now) for payload, score, _ in hits]
+                self.hit_stats.record(scopes, collection_name, similarities, latency_ms)
+                if dual_read and collection_name in SHADOW_COLLECTIONS:
+                    self._start_dual_read(collection_name, query, query_filter, fetch_limit, hits, latency_ms,
+                                          vectors.get(LEGACY_SPACE.name))
+
+                for (payload, score, point_id), similarity in zip(hits, similarities):
+                    if deduplicator.is_duplicate(collection_name, point_id, payload):
+                        continue
+                    raw_hits.append((payload, score, point_id))
+                    if similarity >= EARLY_STOP_SCORE:
+                        confident += 1
+
+            except CollectionUnavailableError as e:
+                searched.remove(collection_name)
+                unavailable.append(collection_name)
+                print(f"[⚡ Disjoncteur] {e}")
+            except Exception as e:
+                searched.remove(collection_name)
+                unavailable.append(collection_name)
+                print(f"Erreur dans la collection {collection_name}: {str(e)}")
+
+        if deduplicator.duplicates:
+            print(f"[🧹 Dédoublonnage] {deduplicator.duplicates} doublon(s) écarté(s)")
+
+        raw_hits.sort(key=lambda hit: hit[1], reverse=True)
+        return raw_hits[:limit], searched, unavailable
+
+    def _start_dual_read(self, collection_name: str, query: str, query_filter: Filter, limit: int,
+                         hits: List[tuple], latency_ms: float, legacy_vector: List[float] = None):
+        """
+        Compare en arrière-plan les résultats d'ada-002 et du modèle réduit pour une collection
+
+        La recherche avec l'autre modèle ne retarde pas la réponse ; son overlap@k
+        et les latences des deux chemins alimentent self.dual_read. Avec
+        SHADOW_AUTO_CUTOVER, la collection bascule dès que les seuils sont atteints.
+
+        Args:
+            collection_name: Collection logique comparée
+            query: Texte de la requête utilisateur
+            query_filter: Filtre appliqué à la recherche servie
+            limit: Nombre de résultats demandés
+            hits: Résultats servis (payload, score, identifiant)
+            latency_ms: Durée de la recherche servie
+            legacy_vector: Embedding ada-002 de la requête, s'il est déjà calculé
+        """
+        served = self.embedding_space(collection_name)
+        other = SHADOW_SPACE if served is LEGACY_SPACE else LEGACY_SPACE
+
+        def compare():
+            vector = legacy_vector if other is LEGACY_SPACE and legacy_vector is not None else \
+                self.create_embedding(query, other)
+            start = time()
+            other_hits = self.search_in_collection(collection_name, query, limit=limit, filters=query_filter,
+                                                   query_vector=vector, space=other)
+            other_ms = (time() - start) * 1000
+            if served is LEGACY_SPACE:
+                legacy_hits, shadow_hits, legacy_ms, shadow_ms = hits, other_hits, latency_ms, other_ms
+            else:
+                legacy_hits, shadow_hits, legacy_ms, shadow_ms = other_hits, hits, other_ms, latency_ms
+            overlap = overlap_at_k([point_id for _, _, point_id in legacy_hits],
+                                   [point_id for _, _, point_id in shadow_hits], DUAL_READ_K)
+            # Scores cosinus d'origine, rang par rang, pour proposer la calibration du modèle réduit
+            now = time()
+            self.dual_read.record(
+                collection_name, overlap, legacy_ms, shadow_ms,
+                [similarity_score(collection_name, score, payload, now) for payload, score, _ in legacy_hits[:DUAL_READ_K]],
+                [SHADOW_SPACE.raw_score(similarity_score(collection_name, score, payload, now))
+                 for payload, score, _ in shadow_hits[:DUAL_READ_K]]
+            )
+            print(f"[🔀 Double lecture] {collection_name}: overlap@{DUAL_READ_K}={overlap:.2f}, "
+                  f"ada-002 {legacy_ms:.0f} ms, réduit {shadow_ms:.0f} ms")
+            if SHADOW_AUTO_CUTOVER and served is LEGACY_SPACE and self.dual_read.ready(collection_name):
+                self.cutover_collections.add(collection_name)
+                print(f"[🔀 Double lecture] {collection_name}: bascule sur {SHADOW_SPACE.collection_name(collection_name)}")
+
+        def run():
+            try:
+                # Comparaison hors échéance : la requête servie a déjà répondu
+                with request_deadline(0):
+                    compare()
+            except Exception as e:
+                print(f"[🔀 Double lecture] {collection_name}: comparaison en échec ({e})")
+
+        submit_in_context(self.dual_read_executor, run)
+
+    def _collect_filter_hits(self, collections, filters_by_collection, filters_dict, limit, start_index=0,
+                             start_offset=None, client_name=None, recent_only=False):
+        """
+        Recherche par filtres seuls, page par page.
+
+        Args:
+            collections: Collections à parcourir, dans l'ordre
+            filters_by_collection: Filtre Qdrant de chaque collection
+            filters_dict: Filtres d'origine (conservés dans le curseur)
+            limit: Taille de la page
+            start_index: Index de la collection où reprendre
+            start_offset: Offset de reprise dans cette collection
+            client_name: Nom du client (optionnel)
+            recent_only: Booléen pour filtrer les données récentes (optionnel)
+
+        Returns:
+            Tuple (résultats (payload, None, identifiant), curseur de la page suivante ou None,
+            collections écartées par leur disjoncteur ou en erreur)
+        """
+        raw_hits = []
+        unavailable = []
+        deduplicator = HitDeduplicator()
+        next_page = None  # (index de la collection, offset) de la page suivante
+
+        for index in range(start_index, len(collections)):
+            collection_name = collections[index]
+            try:
+                remaining = limit - len(raw_hits)
+                if remaining <= 0:
+                    next_page = (index, None)
+                    break
+
+                # On lit exactement ce qui manque pour ne sauter aucun point
+                hits, next_offset = self.simple_filter_search(
+                    collection_name=collection_name,
+                    filters=filters_by_collection[collection_name],
+                    client_name=client_name,
+                    recent_only=recent_only,
+                    limit=remaining,
+                    offset=start_offset if index == start_index else None
+                )
+                if next_offset is not None:
+                    next_page = (index, next_offset)
+
+                for payload, score, point_id in hits:
+                    if deduplicator.is_duplicate(collection_name, point_id, payload):
+                        continue
+                    raw_hits.append((payload, score, point_id))
+
+                if next_page:
+                    break
+
+            except CollectionUnavailableError as e:
+                unavailable.append(collection_name)
+                print(f"[⚡ Disjoncteur] {e}")
+            except Exception as e:
+                unavailable.append(collection_name)
+                print(f"Erreur dans la collection {collection_name}: {str(e)}")
+
+        if deduplicator.duplicates:
+            print(f"[🧹 Dédoublonnage] {deduplicator.duplicates} doublon(s) écarté(s)")
+
+        next_cursor = None
+        if next_page:
+            next_cursor = encode_cursor({
+                "collections": collections,
+                "filters": filters_dict,
+                "limit": limit,
+                "index": next_page[0],
+                "offset": next_page[1],
+            })
+        return raw_hits, next_cursor, unavailable
 
     def get_client_erp(self, client_name: str) -> str:
         """
@@ -367,47 +1081,18 @@ class QdrantSystem:
             return False
 
     def format_ticket_payload(self, payload: dict, score: float = None, format_type: str = "Detail") -> dict:
-        def get_score_color(score):
-            if score is None:
-                return "gray"
-            if score >= 0.80:
-                return "green"
-            elif score >= 0.50:
-                return "orange"
-            else:
-                return "red"
-
-        def format_timestamp(ts):
-            try:
-                if isinstance(ts, (int, float)):
-                    return datetime.fromtimestamp(ts).strftime('%d/%m/%Y')
-                elif isinstance(ts, str) and ts.isdigit():
-                    return datetime.fromtimestamp(int(ts)).strftime('%d/%m/%Y')
-                return ts
-            except Exception:
-                return ts
-
-        base = {
-            "client": payload.get("client", "N/A"),
-            "source": payload.get("source_type", "N/A"),
-            "summary": payload.get("summary", payload.get("description", "")),
-            "created": format_timestamp(payload.get("created", "N/A")),
-            "updated": format_timestamp(payload.get("updated", "N/A")),
-            "assignee": payload.get("assignee", "N/A"),
-            "url": payload.get("url", None),
-            "score": round(score, 4) if score is not None else None,
-            "color": get_score_color(score),
-        }
+        """
+        Formate le payload d'un résultat (voir hit_formatter.format_hits pour le formatage par lot)
 
-        if format_type == "Guide":
-            content_parts = []
-            for key in ["summary", "description", "content", "text", "comments"]:
-                val = payload.get(key)
-                if val:
-                    content_parts.append(str(val))
-            base["content"] = "\n".join(content_parts)
+        Args:
+            payload: Payload Qdrant du résultat
+            score: Score de similarité (optionnel)
+            format_type: Format de la réponse (le contenu complet n'est conservé que pour Guide)
 
-        return base
+        Returns:
+            Dictionnaire du résultat formaté
+        """
+        return format_hits([(payload, score, None)], format_type)[0].to_dict()
 
     def format_response(self, content: Dict[str, Any], format_type: str = "Summary") -> str:
         """
@@ -424,7 +1109,7 @@ class QdrantSystem:
             format_type = "Summary"
         
         # Formatage selon le type demandé
-        if format_type == "Summary":
+        if format_type in ("Summary", "Summary-fast"):
             # Résumé bref
             return self._format_summary(content)
         elif format_type == "Detail":
@@ -442,12 +1127,17 @@ class QdrantSystem:
         except Exception:
             return None  # ou raise une erreur selon ton choix
 
-    def apply_filters(self, filters: dict) -> Filter:
+    def apply_filters(self, filters: dict, collection_name: str = None) -> Filter:
         """
         Transforme un dictionnaire de filtres en objet Filter pour Qdrant
 
+        Le client est désigné différemment selon la source (ex. ADVIGO dans ZENDESK,
+        ADVIQO-Support dans CONFLUENCE) : le filtre client accepte tous les
+        identifiants connus du client dans la collection (table issue de ListeClients.csv).
+
         Args:
             filters: Dictionnaire de filtres (client, erp, date, etc.)
+            collection_name: Collection interrogée (None : nom canonique du client seul)
 
         Returns:
             Objet Filter compatible avec Qdrant
@@ -455,8 +1145,9 @@ class QdrantSystem:
         conditions = []
 
         if "client" in filters:
+            aliases = self.client_registry.client_aliases(filters["client"], collection_name)
             conditions.append(
-                FieldCondition(key="client", match=MatchValue(value=filters["client"]))
+                FieldCondition(key="client", match=MatchAny(any=aliases))
             )
 
         if "erp" in filters:
@@ -509,28 +1200,28 @@ class QdrantSystem:
             Explication complète
         """
         # Implémentation du formatage en détail
-        detail = ""
+        parts = []
         
         # Titre ou résumé
         if "title" in content:
-            detail += f"## {content['title']}\n\n"
+            parts.append(f"## {content['title']}\n\n")
         elif "summary" in content:
-            detail += f"## {content['summary']}\n\n"
+            parts.append(f"## {content['summary']}\n\n")
         
         # Contenu principal
         if "content" in content:
-            detail += f"{content['content']}\n\n"
+            parts.append(f"{content['content']}\n\n")
         elif "description" in content:
-            detail += f"{content['description']}\n\n"
+            parts.append(f"{content['description']}\n\n")
         elif "text" in content:
-            detail += f"{content['text']}\n\n"
+            parts.append(f"{content['text']}\n\n")
         
         # Informations supplémentaires
         if "comments" in content and content["comments"]:
-            detail += f"### Commentaires\n{content['comments']}\n\n"
+            parts.append(f"### Commentaires\n{content['comments']}\n\n")
         # Ajouter le score
         if "score" in content:
-            detail += f"Score de similarité : {content['score']}\n\n"
+            parts.append(f"Score de similarité : {content['score']}\n\n")
         # Métadonnées
         metadata = []
         if "created" in content:
@@ -541,9 +1232,9 @@ class QdrantSystem:
             metadata.append(f"Assigné à: {content['assignee']}")
         
         if metadata:
-            detail += "---\n" + "\n".join(metadata)
+            parts.append("---\n" + "\n".join(metadata))
         
-        return detail
+        return "".join(parts)
     
     def _format_guide(self, content: Dict[str, Any]) -> str:
         """
@@ -595,7 +1286,7 @@ class QdrantSystem:
     
     def _extract_steps(self, text: str) -> List[str]:
         """
-        Extrait les étapes d'un texte
+        Extrait les étapes d'un texte (étapes numérotées, « Étape n », « Step n » ou puces)
         
         Args:
             text: Texte à analyser
@@ -603,58 +1294,25 @@ class QdrantSystem:
         Returns:
             Liste des étapes extraites
         """
-        # Recherche de patterns comme "1.", "Step 1:", "Étape 1:", etc.
-        steps = []
-        lines = text.split("\n")
-        
-        # Patterns possibles pour les étapes
-        step_patterns = [
-            r"^\d+\.",  # "1."
-            r"^Step \d+:",  # "Step 1:"
-            r"^Étape \d+:",  # "Étape 1:"
-            r"^Étape \d+\.",  # "Étape 1."
-        ]
-        
-        current_step = ""
-        in_step = False
-        
-        for line in lines:
-            is_step_header = any(pattern in line for pattern in step_patterns)
-            
-            if is_step_header:
-                if in_step and current_step:
-                    steps.append(current_step.strip())
-                current_step = line
-                in_step = True
-            elif in_step:
-                current_step += " " + line
-        
-        # Ajouter la dernière étape
-        if in_step and current_step:
-            steps.append(current_step.strip())
-        
-        # Si on n'a pas trouvé d'étapes avec les patterns, on essaie de diviser le texte
-        if not steps and len(lines) > 3:
-            # On divise le texte en paragraphes et on prend chaque paragraphe comme une étape
-            paragraphs = []
-            current_para = ""
-            
-            for line in lines:
-                if line.strip():
-                    current_para += line + " "
-                elif current_para:
-                    paragraphs.append(current_para.strip())
-                    current_para = ""
-            
-            if current_para:
-                paragraphs.append(current_para.strip())
-            
-            # Si on a entre 3 et 10 paragraphes, on les considère comme des étapes
-            if 3 <= len(paragraphs) <= 10:
-                steps = paragraphs
-        
-        return steps
+        return extract_steps(text)
     
+    def _guide_passages(self, hit) -> str:
+        """
+        Corps d'un document pour le contexte Guide : son digest précalculé s'il est à jour,
+        sinon son texte où chaque étape détectée forme un passage distinct
+
+        Args:
+            hit: Résultat formaté (TicketHit)
+
+        Returns:
+            Texte découpé en paragraphes
+        """
+        if hit.digest:
+            abstract, steps = hit.digest
+            return "\n\n".join([abstract] + [f"Étape {i} : {step}" for i, step in enumerate(steps, 1)])
+        segmentation = get_segmentation(hit.content, (hit.source, hit.point_id), hit.content_hash)
+        return segmentation.passages(hit.content)
+
     def create_response(self, query_result: Dict[str, Any], format_type: str = "Summary", collections_used: List[str] = None) -> Dict[str, str]:
         """
         Crée la réponse finale au format demandé
@@ -677,105 +1335,394 @@ class QdrantSystem:
             "content": content,
             "sources": ", ".join(collections_used)
         }
-    def process_query(self, query, client_name=None, erp=None, recent_only=False, limit=5, format_type="Summary"):
+    def process_query(self, query, client_name=None, erp=None, recent_only=False, limit=5, format_type="Summary", cursor=None,
+                      deadline_ms=None, use_cache=True):
         """
         Traite une requête utilisateur et renvoie les résultats formatés.
+
+        Les requêtes identiques reçues pendant qu'un traitement est en cours
+        (même requête normalisée, client, ERP, format, limite et échéance) attendent
+        ce traitement et reçoivent le même résultat.
+
+        L'embedding de la requête et une recherche par défaut sont lancés pendant
+        l'enrichissement (SPECULATIVE_SEARCH) ; le champ "speculation" de la réponse
+        indique s'ils ont pu être réutilisés (hit, partial, miss).
+
+        En mode sans embedding, la réponse contient un curseur ("cursor") lorsque
+        d'autres résultats sont disponibles. Le renvoyer via le paramètre cursor
+        donne la page suivante, sans refaire l'enrichissement de la requête.
+
+        Les résultats sont conservés RESULT_CACHE_TTL_S secondes dans le cache
+        partagé entre les workers (use_cache=False : cache ni lu ni alimenté).
+
+        Le traitement dispose de deadline_ms millisecondes (REQUEST_DEADLINE_MS par
+        défaut, 0 : sans limite). Quand le budget restant devient faible, les étapes
+        passent en mode dégradé (voir deadline.py) ; le champ "degradations" de la
+        réponse les énumère, et une réponse dégradée n'est pas mise en cache.
         """
-        USE_EMBEDDING = os.getenv("USE_EMBEDDING", "true").lower() == "true"
-        enriched_query = self.enrich_query_with_openai(query)
+        key = (
+            " ".join(normalize_string(query).split()),
+            normalize_string(client_name),
+            normalize_string(erp),
+            format_type,
+            limit,
+            bool(recent_only),
+            cursor,
+        )
+        def run():
+            with request_deadline(deadline_ms):
+                if not use_cache:
+                    return self._process_query(query, client_name, erp, recent_only, limit, format_type, cursor)
+                return self._cached_process_query(key, query, client_name, erp, recent_only, limit, format_type, cursor)
+
+        # Seules les requêtes de même budget attendent le même traitement (le cache, lui, ignore le budget :
+        # seules les réponses non dégradées y sont conservées)
+        return self.single_flight.do(key + (deadline_ms, use_cache), run)
+
+    def _cached_process_query(self, key, *args):
+        """Traitement d'une requête via le cache partagé des résultats"""
+        if not self.shared_cache:
+            return self._process_query(*args)
+
+        cache_key = json.dumps(key, ensure_ascii=False)
+        result = self.shared_cache.get_json("result", cache_key)
+        if result is None:
+            result = self._process_query(*args)
+            if not result["degradations"]:
+                self.shared_cache.set_json("result", cache_key, result, RESULT_CACHE_TTL_S)
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Retourne les métriques de fonctionnement du système
 
-        collections = enriched_query.get("collections")
-        if not collections:
-            collections = self.get_prioritized_collections(client_name, erp)
+        Returns:
+            Dictionnaire des compteurs par composant
+        """
+        return {
+            "coalescing": self.single_flight.stats(),
+            "openai_scheduler": openai_scheduler.stats(),
+            "shared_cache": self.shared_cache.stats() if self.shared_cache else None,
+            "clients": {"count": len(self.clients), "reloads": self.client_registry.reloads},
+            "speculation": dict(self.speculation_stats),
+            "segment_cache": segment_cache.stats(),
+            "shards": dict(self.shard_router.stats),
+            "hedges": {"skipped": self.hedge_pool.skipped},
+            "embedding_migration": {"cutover": sorted(self.cutover_collections), "dual_read": self.dual_read.summary()},
+            "copy_lag": self.copy_sync.snapshot(),
+            "hit_stats": self.hit_stats.snapshot(),
+            "collections": {
+                name: {
+                    "breaker": breaker.state,
+                    "failures": breaker.failures,
+                    f"p{HEDGE_PERCENTILE:g}_ms": self.latencies[name].percentile(HEDGE_PERCENTILE),
+                }
+                for name, breaker in list(self.breakers.items())
+            },
+        }
 
-        filters = self.apply_filters(enriched_query.get("filters", {}))
-        limit = enriched_query.get("limit", limit)
-        use_embedding = enriched_query.get("use_embedding", USE_EMBEDDING)
+    @staticmethod
+    def month_ranges(start_ts: int, end_ts: int) -> List[tuple]:
+        """
+        Découpe une période en mois calendaires
 
-        all_results = []
+        Args:
+            start_ts: Début de la période (timestamp)
+            end_ts: Fin de la période (timestamp)
 
-        for collection_name in collections:
-            try:
-                remaining = limit - len(all_results)
-                if remaining <= 0:
-                    break
+        Returns:
+            Liste de tuples (mois « AAAA-MM », début inclus, fin exclue) dans l'ordre chronologique
+        """
+        start = datetime.fromtimestamp(start_ts)
+        month = datetime(start.year, start.month, 1)
+        ranges = []
+        while month.timestamp() <= end_ts:
+            following = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+            ranges.append((month.strftime("%Y-%m"), int(month.timestamp()), int(following.timestamp())))
+            month = following
+        return ranges
+
+    def get_stats(self, collections: List[str] = None, client_name: str = None, erp: str = None,
+                  recent_only: bool = False, group_by: str = None, months: int = STATS_MONTHS) -> Dict[str, Any]:
+        """
+        Compte les documents des collections, éventuellement regroupés, sans en lire aucun
 
-                if use_embedding:
-                    results = self.search_in_collection(
-                        collection_name=collection_name,
-                        query=query,
-                        client_name=client_name,
-                        recent_only=recent_only,
-                        limit=remaining,
-                        filters=filters
-                    )
-                    all_results.extend([
-                        self.format_ticket_payload(payload, score, format_type)
-                        for payload, score in results
-                    ])
-                else:
-                    raw_results = self.simple_filter_search(
-                        collection_name=collection_name,
-                        filters=filters,
-                        client_name=client_name,
-                        recent_only=recent_only,
-                        limit=remaining
-                    )
-                    all_results.extend([
-                        self.format_ticket_payload(payload, format_type=format_type)
-                        for payload in raw_results
-                    ])
+        Les comptages (count) et regroupements (facet) sont calculés par Qdrant avec
+        les filtres de apply_filters, toutes collections en parallèle (self.stats_executor).
+        Le regroupement par mois (group_by="month") compte chaque mois de `created` par
+        un filtre de plage, sur 1 à STATS_MAX_MONTHS mois.
+
+        Args:
+            collections: Collections à compter (par défaut celles du client et de l'ERP)
+            client_name: Nom du client (optionnel)
+            erp: Système ERP (optionnel)
+            recent_only: Se limiter aux 6 derniers mois
+            group_by: status, priority, resolution, erp ou month (optionnel)
+            months: Nombre de mois du regroupement mensuel, si la période n'est pas bornée (ramené à 1..STATS_MAX_MONTHS)
+
+        Returns:
+            Dictionnaire : total, regroupement global, détail par collection et collections indisponibles
 
+        Raises:
+            ValueError: Si le regroupement ou une collection est inconnu
+        """
+        if group_by and group_by not in STATS_GROUP_FIELDS + ("month",):
+            raise ValueError(f"Regroupement inconnu: {group_by} (attendu : {', '.join(STATS_GROUP_FIELDS)}, month)")
+        collections = collections or self.get_prioritized_collections(client_name or "", erp or "")
+        unknown = [c for c in collections if c not in self.collections]
+        if unknown:
+            raise ValueError(f"Collections inconnues: {', '.join(unknown)}")
+
+        filters_dict = {}
+        if client_name:
+            filters_dict["client"] = client_name
+        if erp:
+            filters_dict["erp"] = erp
+        now = int(time())
+        period_start = now // 86400 * 86400 - 60*60*24*180 if recent_only else None
+        if period_start:
+            filters_dict["date"] = {"gte": period_start}
+
+        buckets = []
+        if group_by == "month":
+            today = datetime.fromtimestamp(now)
+            months = max(1, min(months, STATS_MAX_MONTHS))
+            month_index = today.year * 12 + today.month - 1 - (months - 1)
+            first_month = datetime(month_index // 12, month_index % 12 + 1, 1)
+            buckets = self.month_ranges(max(period_start or 0, int(first_month.timestamp())), now)
+
+        def count(collection_name, query_filter):
+            physical_name, shards = self.shard_router.route(collection_name, query_filter)
+            return self._guarded_call(collection_name, lambda: self.client.count(
+                collection_name=physical_name,
+                count_filter=query_filter,
+                exact=True,
+                shard_key_selector=shards
+            ).count)
+
+        def facet(collection_name, query_filter):
+            physical_name, shards = self.shard_router.route(collection_name, query_filter)
+            result = self._guarded_call(collection_name, lambda: self.client.facet(
+                collection_name=physical_name,
+                key=group_by,
+                facet_filter=query_filter,
+                limit=STATS_FACET_LIMIT,
+                exact=True,
+                shard_key_selector=shards
+            ))
+            return {str(hit.value): hit.count for hit in result.hits}
+
+        def month_filter(query_filter, start, end):
+            conditions = list(query_filter.must) if query_filter and query_filter.must else []
+            conditions.append(FieldCondition(key="created", range=Range(gte=start, lt=end)))
+            return Filter(must=conditions)
+
+        # Tous les appels Qdrant sont lancés ensemble puis attendus collection par collection
+        futures = {}
+        for collection_name in collections:
+            query_filter = self.apply_filters(filters_dict, collection_name)
+            tasks = {"count": self.stats_executor.submit(count, collection_name, query_filter)}
+            if group_by == "month":
+                for label, start, end in buckets:
+                    tasks[label] = self.stats_executor.submit(count, collection_name,
+                                                              month_filter(query_filter, start, end))
+            elif group_by:
+                tasks["facet"] = self.stats_executor.submit(facet, collection_name, query_filter)
+            futures[collection_name] = tasks
+
+        per_collection, unavailable = {}, []
+        total, groups = 0, defaultdict(int)
+        for collection_name, tasks in futures.items():
+            try:
+                stats = {"count": tasks.pop("count").result()}
+                if group_by == "month":
+                    stats["groups"] = {label: future.result() for label, future in tasks.items()}
+                elif group_by:
+                    stats["groups"] = tasks["facet"].result()
+            except CollectionUnavailableError as e:
+                unavailable.append(collection_name)
+                print(f"[⚡ Disjoncteur] {e}")
+                continue
             except Exception as e:
+                unavailable.append(collection_name)
                 print(f"Erreur dans la collection {collection_name}: {str(e)}")
+                continue
+            per_collection[collection_name] = stats
+            total += stats["count"]
+            for value, value_count in stats.get("groups", {}).items():
+                groups[value] += value_count
+
+        result = {"total": total, "collections": per_collection, "unavailable": unavailable}
+        if group_by:
+            result["group_by"] = group_by
+            result["groups"] = (dict(groups) if group_by == "month"
+                                else dict(sorted(groups.items(), key=lambda item: item[1], reverse=True)))
+        return result
+
+    def _process_query(self, query, client_name, erp, recent_only, limit, format_type, cursor):
+        """Traitement effectif d'une requête (voir process_query)"""
+        USE_EMBEDDING = os.getenv("USE_EMBEDDING", "true").lower() == "true"
+
+        start_index, start_offset = 0, None
+        speculation = None
+        # Sans échéance, un budget infini recueille tout de même les dégradations
+        deadline = current_deadline() or Deadline()
+        if cursor:
+            state = decode_cursor(cursor)
+            collections = state["collections"]
+            filters_dict = state["filters"]
+            limit = state["limit"]
+            start_index, start_offset = state["index"], state["offset"]
+            use_embedding = False
+        else:
+            if SPECULATIVE_SEARCH:
+                speculation = self._start_speculation(query, client_name, erp, recent_only, limit)
+            if not deadline.allows(DEADLINE_ENRICHMENT_MS):
+                deadline.degrade(LOCAL_RULES, "enrichissement par le modèle remplacé par les règles locales")
+                enriched_query = {"filters": self.apply_local_rules(query)}
+            else:
+                try:
+                    enriched_query = self.enrich_query_with_openai(query)
+                except OPENAI_RETRYABLE_ERRORS + (DeadlineRejected,) as e:
+                    # Échéance dépassée pendant l'appel, ou attente du quota plus longue que le budget
+                    # restant : la recherche continue avec les règles locales
+                    if deadline.allows(0) and not isinstance(e, DeadlineRejected):
+                        if speculation:
+                            speculation.discard()
+                        raise
+                    deadline.degrade(LOCAL_RULES, f"enrichissement en échec ({type(e).__name__})")
+                    enriched_query = {"filters": self.apply_local_rules(query)}
+                except Exception:
+                    if speculation:
+                        speculation.discard()
+                    raise
+
+            collections = enriched_query.get("collections")
+            if not collections:
+                collections = self.get_prioritized_collections(client_name, erp)
+
+            filters_dict = enriched_query.get("filters", {})
+            limit = enriched_query.get("limit", limit)
+            use_embedding = enriched_query.get("use_embedding", USE_EMBEDDING)
+        limit = max(1, min(int(limit), MAX_QUERY_LIMIT))
+
+        # Un filtre par collection : le client y porte ses identifiants propres à la source
+        filters_by_collection = {c: self.apply_filters(filters_dict, c) for c in collections}
+
+        next_cursor = None
+        if use_embedding:
+            scope_client = filters_dict.get("client") or client_name
+            scope_erp = filters_dict.get("erp") or erp or self.get_client_erp(scope_client)
+            scopes = HitStatistics.scopes(normalize_string(scope_client), scope_erp)
+            # Les sources indiquées sont les collections effectivement interrogées
+            raw_hits, collections, unavailable = self._collect_vector_hits(
+                query, collections, filters_by_collection, limit, scopes, client_name, recent_only, speculation
+            )
+        else:
+            raw_hits, next_cursor, unavailable = self._collect_filter_hits(
+                collections, filters_by_collection, filters_dict, limit, start_index, start_offset, client_name,
+                recent_only
+            )
+        if unavailable:
+            deadline.degrade(PARTIAL_RESULTS, f"collections indisponibles ou en erreur : {', '.join(unavailable)}")
+
+        if speculation:
+            speculation.discard()
+            self.speculation_stats[speculation.status] += 1
+            print(f"[🔮 Spéculation] {speculation.to_dict()}")
+
+        if not (use_embedding and RECENCY_RANKING):
+            # Tri chronologique sur le timestamp brut (les dates formatées jj/mm/aaaa ne se trient pas)
+            raw_hits = sorted(raw_hits, key=lambda hit: created_timestamp(hit[0]), reverse=True)
+        # Sinon l'ordre de Qdrant, qui combine déjà similarité et fraîcheur, est conservé
+        if format_type in SYNTHESIS_FALLBACKS and not deadline.allows(DEADLINE_SYNTHESIS_MS):
+            format_type = self._synthesis_fallback(deadline, format_type, "échéance proche")
+        all_results = format_hits(raw_hits, format_type)
+
+        try:
+            content = self._synthesize(query, all_results[:limit], format_type)
+        except OPENAI_RETRYABLE_ERRORS + (AdmissionRejected,) as e:
+            # Le résumé extractif remplace toujours la synthèse Summary ; le format Detail ne
+            # remplace la synthèse Guide qu'une fois l'échéance dépassée ou hors d'atteinte
+            if format_type not in SYNTHESIS_FALLBACKS or (format_type == "Guide" and deadline.allows(0)
+                                                          and not isinstance(e, DeadlineRejected)):
+                raise
+            format_type = self._synthesis_fallback(deadline, format_type, f"modèle indisponible ({type(e).__name__})")
+            content = self._synthesize(query, format_hits(raw_hits[:limit], format_type), format_type)
+
+        return {
+            "format": format_type,
+            "content": content,
+            "sources": ", ".join([c for c in collections if c not in unavailable]
+                                 + [f"{c} (indisponible)" for c in unavailable]),
+            "cursor": next_cursor,
+            "speculation": speculation.status if speculation else None,
+            "degradations": list(deadline.degradations)
+        }
 
-        all_results.sort(key=lambda r: r.get("created", ""), reverse=True)
+    @staticmethod
+    def _synthesis_fallback(deadline: Deadline, format_type: str, reason: str) -> str:
+        """Enregistre le remplacement d'une synthèse par le modèle et renvoie le format de repli"""
+        fallback = SYNTHESIS_FALLBACKS[format_type]
+        degradation = EXTRACTIVE_INSTEAD_OF_SYNTHESIS if fallback == "Summary-fast" else DETAIL_INSTEAD_OF_SYNTHESIS
+        deadline.degrade(degradation, f"synthèse {format_type} remplacée par {fallback} : {reason}")
+        return fallback
+
+    def _synthesize(self, query: str, results: List[Any], format_type: str) -> List[str]:
+        """
+        Contenu de la réponse : synthèse par le modèle (Summary, Guide), résumé extractif
+        local (Summary-fast) ou résultats rendus (Detail)
 
+        Args:
+            query: Texte de la requête utilisateur
+            results: Résultats formatés retenus (TicketHit)
+            format_type: Format de la réponse
+
+        Returns:
+            Liste des éléments de contenu
+        """
         if format_type == "Summary":
-            joined_summaries = "\n".join(r.get("summary", "") for r in all_results[:limit])
+            joined_summaries, context_tokens = pack_context(
+                query,
+                [(r.summary, r.digest[0] if r.digest else "") for r in results],
+                CONTEXT_TOKEN_BUDGET
+            )
+            print(f"[📦 Contexte Summary] {context_tokens} tokens (budget {CONTEXT_TOKEN_BUDGET})")
             prompt = f"Voici une liste de tickets utilisateurs concernant : {query}\n\n{joined_summaries}\n\nFais-en un résumé clair et concis."
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
+            return [self.create_completion(
                 messages=[
                     {"role": "system", "content": "Tu es un assistant expert en synthèse de tickets clients."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
                 max_tokens=300
-            )
-            summary_text = response.choices[0].message.content.strip()
-            return {
-                "format": format_type,
-                "content": [summary_text],
-                "sources": ", ".join(collections)
-            }
+            )]
 
-        elif format_type == "Guide":
-            guide_input = "\n".join(r.get("summary", "") + "\n" + r.get("content", "") for r in all_results[:limit] if "content" in r)
+        if format_type == "Guide":
+            guide_input, context_tokens = pack_context(
+                query,
+                [(r.summary, self._guide_passages(r)) for r in results],
+                CONTEXT_TOKEN_BUDGET
+            )
+            print(f"[📦 Contexte Guide] {context_tokens} tokens (budget {CONTEXT_TOKEN_BUDGET})")
             prompt = f"Voici des extraits de tickets. Rédige un guide pratique en étapes pour résoudre le problème évoqué :\n\n{guide_input}"
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
+            return [self.create_completion(
                 messages=[
                     {"role": "system", "content": "Tu es un assistant qui transforme des contenus de tickets en guide étape par étape."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
                 max_tokens=500
-            )
-            guide_text = response.choices[0].message.content.strip()
-            return {
-                "format": format_type,
-                "content": [guide_text],
-                "sources": ", ".join(collections)
-            }
-
-        else:  # Detail
-            formatted_results = [self.format_response(r, format_type) for r in all_results[:limit]]
-            return {
-                "format": format_type,
-                "content": formatted_results,
-                "sources": ", ".join(collections)
-            }
+            )]
+
+        if format_type == "Summary-fast":
+            # Documents trop courts pour en extraire des phrases : leurs titres sont listés
+            sentences = summarize(query, [f"{r.summary}.\n{r.content or ''}" for r in results]) or \
+                [r.summary for r in results]
+            return ["\n".join(f"- {sentence}" for sentence in sentences)]
+
+        # Detail
+        return render_details(results)
 
 
 # Fonction principale pour tester le système
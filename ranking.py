@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Classement combinant similarité et fraîcheur des documents
+Le score final est calculé par Qdrant (API query : prefetch vectoriel puis
+formule) : une part RECENCY_WEIGHT du score provient d'une décroissance
+exponentielle sur la date du document, qui vaut 1 aujourd'hui et 0.5 après
+une demi-vie propre à chaque collection. Qdrant renvoie directement les k
+meilleurs résultats, sans reclassement côté client.
+
+Les seuils exprimés en similarité (EARLY_STOP_SCORE, HIT_USEFUL_SCORE) ne
+s'appliquent pas au score combiné : la similarité en est retrouvée par le calcul
+inverse (similarity_score), la date du document étant connue.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from qdrant_client.http import models
+
+# Classement tenant compte de la fraîcheur (nécessite Qdrant 1.14 ou plus)
+RECENCY_RANKING = os.getenv("RECENCY_RANKING", "false").lower() == "true"
+
+# Part de la fraîcheur dans le score final (0 : similarité seule)
+RECENCY_WEIGHT = float(os.getenv("RECENCY_WEIGHT", "0.3"))
+
+# Champ de date utilisé (timestamp) : created ou updated
+RECENCY_FIELD = os.getenv("RECENCY_FIELD", "created")
+
+# Candidats vectoriels lus par Qdrant pour chaque résultat renvoyé
+RECENCY_PREFETCH_FACTOR = int(os.getenv("RECENCY_PREFETCH_FACTOR", "4"))
+
+# Demi-vie en jours par collection (RECENCY_HALF_LIFE_DAYS_<COLLECTION>, 0 : pas de fraîcheur)
+DEFAULT_HALF_LIFE_DAYS = float(os.getenv("RECENCY_HALF_LIFE_DAYS", "180"))
+
+
+def half_life_days(collection_name: str) -> float:
+    """Demi-vie de la fraîcheur d'une collection, en jours (0 : classement par similarité seule)"""
+    value = os.getenv(f"RECENCY_HALF_LIFE_DAYS_{collection_name}")
+    return float(value) if value else DEFAULT_HALF_LIFE_DAYS
+
+
+def recency_enabled(collection_name: str) -> bool:
+    """Indique si le classement d'une collection tient compte de la fraîcheur"""
+    return RECENCY_RANKING and RECENCY_WEIGHT > 0 and half_life_days(collection_name) > 0
+
+
+def recency_query(collection_name: str, query_vector, query_filter: Optional[models.Filter], limit: int,
+                  now: float) -> Dict[str, Any]:
+    """
+    Paramètres de l'API query de Qdrant pour un classement similarité + fraîcheur
+
+    Args:
+        collection_name: Collection interrogée
+        query_vector: Embedding de la requête
+        query_filter: Filtre appliqué aux candidats
+        limit: Nombre de résultats renvoyés
+        now: Date de référence (timestamp)
+
+    Returns:
+        Arguments prefetch et query de query_points / query_points_groups
+    """
+    decay = models.ExpDecayExpression(exp_decay=models.DecayParamsExpression(
+        x=RECENCY_FIELD,
+        target=now,
+        scale=half_life_days(collection_name) * 86400,
+        midpoint=0.5
+    ))
+    formula = models.SumExpression(sum=[
+        models.MultExpression(mult=[1 - RECENCY_WEIGHT, "$score"]),
+        models.MultExpression(mult=[RECENCY_WEIGHT, decay]),
+    ])
+    return {
+        "prefetch": models.Prefetch(query=query_vector, filter=query_filter, limit=limit * RECENCY_PREFETCH_FACTOR),
+        # Un document sans date est traité comme très ancien
+        "query": models.FormulaQuery(formula=formula, defaults={RECENCY_FIELD: 0}),
+    }
+
+
+def blend_recency(collection_name: str, score: float, payload: Dict[str, Any], now: float) -> float:
+    """
+    Même calcul que la formule Qdrant, pour les résultats du miroir local
+
+    Args:
+        collection_name: Collection du résultat
+        score: Similarité cosinus
+        payload: Payload du résultat
+        now: Date de référence (timestamp)
+
+    Returns:
+        Score combiné
+    """
+    value = payload.get(RECENCY_FIELD)
+    date = value if isinstance(value, (int, float)) else 0
+    decay = 0.5 ** (abs(now - date) / (half_life_days(collection_name) * 86400))
+    return (1 - RECENCY_WEIGHT) * score + RECENCY_WEIGHT * decay
+
+
+def similarity_score(collection_name: str, score: float, payload: Dict[str, Any], now: float) -> float:
+    """
+    Similarité cosinus d'un résultat classé par fraîcheur (inverse de blend_recency)
+
+    Args:
+        collection_name: Collection du résultat
+        score: Score renvoyé par la recherche
+        payload: Payload du résultat
+        now: Date de référence (timestamp)
+
+    Returns:
+        Similarité seule (le score tel quel si la collection n'est pas classée par fraîcheur)
+    """
+    if not recency_enabled(collection_name):
+        return score
+    value = payload.get(RECENCY_FIELD)
+    date = value if isinstance(value, (int, float)) else 0
+    decay = 0.5 ** (abs(now - date) / (half_life_days(collection_name) * 86400))
+    return (score - RECENCY_WEIGHT * decay) / (1 - RECENCY_WEIGHT)
+
+
+def created_timestamp(payload: Dict[str, Any]) -> float:
+    """Date de création d'un payload pour le tri chronologique (0 si absente ou non numérique)"""
+    value = payload.get("created")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return 0
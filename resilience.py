@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Outils de résilience pour les appels distants (OpenAI et Qdrant)
+- retry_call : nouvelles tentatives avec délai exponentiel et gigue aléatoire
+- hedged_call : requête dupliquée si la première tarde au-delà d'un percentile de latence
+- CircuitBreaker : mise à l'écart temporaire d'une collection en échec ou trop lente
+- is_transient_error / is_client_error : classement des erreurs Qdrant (réseau et 5xx, ou requête invalide)
+"""
+
+import random
+import threading
+from collections import deque
+from concurrent.futures import Executor, as_completed, wait
+from time import monotonic, sleep
+from typing import Any, Callable, Optional, Tuple, Type
+
+import httpx
+import numpy as np
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+
+class CollectionUnavailableError(Exception):
+    """Collection temporairement écartée par son disjoncteur"""
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Indique si une nouvelle tentative peut réussir : erreur de connexion ou réponse 5xx
+
+    Un délai dépassé n'en fait pas partie : la tentative suivante attendrait aussi longtemps.
+    """
+    if isinstance(error, ResponseHandlingException):
+        error = error.source
+    if isinstance(error, (TimeoutError, httpx.TimeoutException)):
+        return False
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code is not None and error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+def is_client_error(error: BaseException) -> bool:
+    """Indique si l'erreur vient de la requête elle-même (réponse 4xx hors 429 : filtre invalide, collection absente)"""
+    return (isinstance(error, UnexpectedResponse) and error.status_code is not None
+            and 400 <= error.status_code < 500 and error.status_code != 429)
+
+
+def retry_call(fn: Callable[[], Any], attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+               retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+               retry_if: Optional[Callable[[BaseException], bool]] = None,
+               before_retry: Optional[Callable[[], bool]] = None) -> Any:
+    """
+    Exécute fn avec de nouvelles tentatives en cas d'erreur
+
+    Le délai entre deux tentatives est tiré uniformément entre 0 et
+    base_delay * 2^tentative (plafonné à max_delay), pour éviter que des
+    appels échoués en même temps ne soient relancés en même temps.
+
+    Args:
+        fn: Appel à exécuter
+        attempts: Nombre total de tentatives
+        base_delay: Délai de base en secondes
+        max_delay: Délai maximal en secondes
+        retry_on: Exceptions donnant lieu à une nouvelle tentative
+        retry_if: Filtre supplémentaire sur l'exception (ex. is_transient_error)
+        before_retry: Appelé avant chaque nouvelle tentative ; False abandonne (échéance dépassée)
+
+    Returns:
+        Résultat de fn
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt == attempts - 1 or (retry_if is not None and not retry_if(e)):
+                raise
+            sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+            if before_retry is not None and not before_retry():
+                raise
+
+
+class HedgePool:
+    """
+    Pool borné des requêtes dupliquées
+
+    Une requête dupliquée n'est lancée que si un emplacement est libre : lors
+    d'un blocage de Qdrant, les duplications ne s'accumulent pas et ne prennent
+    pas les threads des recherches principales.
+    """
+
+    def __init__(self, executor: Executor, max_in_flight: int):
+        self.executor = executor
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self.skipped = 0
+
+    def try_submit(self, fn: Callable[[], Any]):
+        """Lance fn si un emplacement est libre, sinon renvoie None"""
+        if not self._slots.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        future = self.executor.submit(fn)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def hedged_call(executor: Executor, fn: Callable[[], Any], hedge_delay: Optional[float], timeout: float,
+                hedge_pool: Optional[HedgePool] = None) -> Any:
+    """
+    Exécute fn et lance une seconde requête identique si la première n'a pas
+    répondu après hedge_delay secondes. Le premier résultat obtenu est retenu.
+
+    Args:
+        executor: Pool de threads exécutant les requêtes principales
+        fn: Appel à exécuter (doit être idempotent)
+        hedge_delay: Délai avant la requête dupliquée (None : pas de duplication)
+        timeout: Durée maximale totale en secondes
+        hedge_pool: Pool borné des requêtes dupliquées (par défaut executor)
+
+    Returns:
+        Résultat de la première requête réussie
+
+    Raises:
+        TimeoutError: Si aucune requête n'a abouti dans le délai
+    """
+    start = monotonic()
+    futures = [executor.submit(fn)]
+    if hedge_delay is not None and hedge_delay < timeout:
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done:
+            hedge = hedge_pool.try_submit(fn) if hedge_pool is not None else executor.submit(fn)
+            if hedge is not None:
+                futures.append(hedge)
+
+    last_error = None
+    try:
+        for future in as_completed(futures, timeout=max(0.0, timeout - (monotonic() - start))):
+            try:
+                return future.result()
+            except Exception as e:
+                last_error = e
+    except Exception as e:  # Délai dépassé
+        raise TimeoutError(f"Aucune réponse en {timeout:.1f}s") from e
+    raise last_error
+
+
+class LatencyTracker:
+    """Latences récentes d'un appel, pour calculer le délai de duplication"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float):
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentile p (0-100) des latences récentes, None sans mesure"""
+        with self._lock:
+            if not self._samples:
+                return None
+            return float(np.percentile(self._samples, p))
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'une collection
+
+    Après `failure_threshold` échecs consécutifs (erreurs ou appels plus lents que
+    slow_call_ms), la collection est écartée pendant `cooldown` secondes. Un seul
+    appel d'essai est ensuite autorisé : s'il réussit le disjoncteur se referme,
+    sinon il se rouvre.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0, slow_call_ms: float = 3000.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.slow_call_ms = slow_call_ms
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if monotonic() - self.opened_at >= self.cooldown:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Indique si un appel peut être tenté"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self, latency_ms: float):
+        if latency_ms > self.slow_call_ms:
+            self.record_failure()
+            return
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_ignored(self):
+        """Appel sans incidence sur l'état (erreur propre à la requête) : libère l'appel d'essai"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = monotonic()
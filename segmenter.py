@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Découpage des documents en étapes pour le format Guide
+Le texte est parcouru une seule fois, ligne par ligne, avec une expression
+régulière précompilée qui reconnaît les étapes numérotées (« 1. », « 2) »),
+les étapes nommées (« Étape 3 : », « Step 4 - ») et les puces. Le résultat est
+une liste de positions dans le texte, mise en cache par identifiant de point et
+content_hash : un document déjà découpé n'est plus analysé.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Nombre maximal de découpages conservés en cache
+SEGMENT_CACHE_SIZE = int(os.getenv("SEGMENT_CACHE_SIZE", "10000"))
+
+NUMBERED, BULLET, PARAGRAPH = "numbered", "bullet", "paragraph"
+
+# Marqueurs de début d'étape, en début de ligne
+_MARKER_RE = re.compile(
+    r"[ \t]*(?:"
+    r"(?P<named>(?:[ÉéEe]tape|[Ss]tep)[ \t]*\d{1,3}[ \t]*[:.)\-–]?)"
+    r"|(?P<number>\d{1,3}[.)])(?=\s)"
+    r"|(?P<bullet>[-*•·–])(?=\s)"
+    r")[ \t]*"
+)
+
+# (début de la ligne du marqueur, début du texte de l'étape, fin de l'étape)
+Span = Tuple[int, int, int]
+
+
+class Segmentation:
+    """Positions des étapes (ou paragraphes) d'un texte"""
+
+    __slots__ = ("kind", "spans")
+
+    def __init__(self, kind: Optional[str], spans: List[Span]):
+        self.kind = kind
+        self.spans = spans
+
+    def steps(self, text: str) -> List[str]:
+        """Texte de chaque étape, espaces normalisés et marqueur retiré"""
+        return [" ".join(text[start:end].split()) for _, start, end in self.spans]
+
+    def passages(self, text: str) -> str:
+        """
+        Texte complet où chaque étape forme un paragraphe « Étape n : ... »,
+        le texte hors étapes étant conservé à sa place
+        """
+        if not self.spans or self.kind == PARAGRAPH:
+            return text
+        blocks, position = [], 0
+        for number, (line_start, start, end) in enumerate(self.spans, 1):
+            before = text[position:line_start].strip()
+            if before:
+                blocks.append(before)
+            blocks.append(f"Étape {number} : " + " ".join(text[start:end].split()))
+            position = end
+        after = text[position:].strip()
+        if after:
+            blocks.append(after)
+        return "\n\n".join(blocks)
+
+
+class _Collector:
+    """Étapes d'un type donné en cours de collecte"""
+
+    __slots__ = ("spans", "line_start", "start", "end", "gap")
+
+    def __init__(self):
+        self.spans = []
+        self.line_start = None
+        self.start = None
+        self.end = None
+        self.gap = False  # Ligne vide rencontrée depuis la dernière ligne de l'étape
+
+    def open(self, line_start: int, start: int, end: int):
+        self.close()
+        self.line_start, self.start, self.end, self.gap = line_start, start, end, False
+
+    def extend(self, end: int):
+        self.end, self.gap = end, False
+
+    def close(self):
+        if self.start is not None and self.end > self.start:
+            self.spans.append((self.line_start, self.start, self.end))
+        self.start = None
+
+
+def segment(text: str) -> Segmentation:
+    """
+    Découpe un texte en étapes, en un seul passage sur ses lignes
+
+    Les étapes numérotées ou nommées sont retenues en priorité, puis les puces
+    (au moins deux), puis les paragraphes (entre 3 et 10, comme auparavant).
+    Une étape se poursuit sur les lignes suivantes ; après une ligne vide,
+    seule une ligne indentée la prolonge.
+
+    Args:
+        text: Texte à découper
+
+    Returns:
+        Segmentation (type None si aucune étape n'est reconnue)
+    """
+    ordered, bullets, paragraphs = _Collector(), _Collector(), _Collector()
+    line_count = 0
+    position = 0
+    length = len(text)
+
+    while position < length:
+        newline = text.find("\n", position)
+        line_end = length if newline < 0 else newline
+        next_position = line_end + 1
+        line_count += 1
+
+        stripped_end = line_end
+        while stripped_end > position and text[stripped_end - 1] in " \t\r":
+            stripped_end -= 1
+
+        if stripped_end == position or text[position:stripped_end].isspace():
+            # Ligne vide : fin de paragraphe, les étapes attendent la ligne suivante
+            paragraphs.close()
+            ordered.gap = bullets.gap = True
+            position = next_position
+            continue
+
+        if paragraphs.start is None:
+            paragraphs.open(position, position, stripped_end)
+        else:
+            paragraphs.extend(stripped_end)
+
+        match = _MARKER_RE.match(text, position, stripped_end)
+        kind = match.lastgroup if match else None
+        indented = text[position] in " \t"
+
+        if kind in ("named", "number"):
+            ordered.open(position, match.end(), stripped_end)
+            bullets.close()
+        elif kind == "bullet":
+            bullets.open(position, match.end(), stripped_end)
+            if ordered.start is not None:
+                ordered.extend(stripped_end)
+        else:
+            for collector in (ordered, bullets):
+                if collector.start is None:
+                    continue
+                if collector.gap and not indented:
+                    collector.close()
+                else:
+                    collector.extend(stripped_end)
+
+        position = next_position
+
+    ordered.close()
+    bullets.close()
+    paragraphs.close()
+
+    if ordered.spans:
+        return Segmentation(NUMBERED, ordered.spans)
+    if len(bullets.spans) >= 2:
+        return Segmentation(BULLET, bullets.spans)
+    if line_count > 3 and 3 <= len(paragraphs.spans) <= 10:
+        return Segmentation(PARAGRAPH, paragraphs.spans)
+    return Segmentation(None, [])
+
+
+class SegmentCache:
+    """Cache LRU des découpages, indexé par (identifiant du point, content_hash)"""
+
+    def __init__(self, max_size: int = SEGMENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Segmentation]:
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value: Segmentation):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+segment_cache = SegmentCache()
+
+
+def get_segmentation(text: str, point_id=None, content_hash: str = None) -> Segmentation:
+    """
+    Découpage d'un document, mis en cache par identifiant de point et content_hash
+
+    Sans content_hash, une empreinte du texte en tient lieu. La longueur du texte
+    fait partie de la clé : les positions en cache ne peuvent pas déborder.
+
+    Args:
+        text: Texte du document
+        point_id: Identifiant du point Qdrant (None : pas de cache)
+        content_hash: Empreinte du contenu fournie par le payload (optionnel)
+
+    Returns:
+        Segmentation du texte
+    """
+    if point_id is None:
+        return segment(text)
+    if not content_hash:
+        content_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    key = (point_id, content_hash, len(text))
+    segmentation = segment_cache.get(key)
+    if segmentation is None:
+        segmentation = segment(text)
+        segment_cache.set(key, segmentation)
+    return segmentation
+
+
+def extract_steps(text: str, point_id=None, content_hash: str = None) -> List[str]:
+    """
+    Extrait les étapes d'un texte
+
+    Args:
+        text: Texte à analyser
+        point_id: Identifiant du point, pour le cache (optionnel)
+        content_hash: Empreinte du contenu, pour le cache (optionnel)
+
+    Returns:
+        Liste des étapes extraites (vide si aucune)
+    """
+    if not text:
+        return []
+    return get_segmentation(text, point_id, content_hash).steps(text)
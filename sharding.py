@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Collections partitionnées par client (sharding personnalisé Qdrant)
+La migration recopie une collection dans <COLLECTION>_BY_CLIENT, créée avec
+une clé de shard par client canonique (ListeClients.csv) et un shard commun
+pour les points sans client connu. Une recherche filtrée sur un client
+n'interroge alors que le shard de ce client : son coût ne dépend plus de la
+taille totale de la collection. Sans filtre client, la recherche reste globale.
+
+Utilisation :
+    python sharding.py                     # JIRA, ZENDESK et CONFLUENCE
+    python sharding.py JIRA
+
+La collection d'origine n'est pas modifiée et reste la cible de l'ingestion.
+La copie est construite sous un nom versionné (<COLLECTION>_BY_CLIENT_<date>)
+puis l'alias <COLLECTION>_BY_CLIENT bascule d'un bloc sur elle : les recherches
+ne voient jamais une copie partielle. La migration est à relancer lorsque
+ListeClients.csv change ou que de nouveaux points sont indexés ; d'ici là, une
+copie dont le nombre de points diffère de l'origine n'est pas utilisée et les
+recherches portent sur la collection d'origine (voir copy_sync.py).
+"""
+
+import os
+import sys
+import threading
+from collections import Counter
+from time import monotonic, time
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from qdrant_client.http.models import (CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+                                       FieldCondition, Filter, MatchAny, MatchValue, PointStruct, ShardingMethod)
+
+# Collections servies par leur copie partitionnée par client (vide : aucune)
+SHARDED_COLLECTIONS = [c.strip() for c in os.getenv("SHARDED_COLLECTIONS", "").split(",") if c.strip()]
+SHARDED_COLLECTION_SUFFIX = os.getenv("SHARDED_COLLECTION_SUFFIX", "_BY_CLIENT")
+
+# Shard des points dont le client est absent ou inconnu
+DEFAULT_SHARD_KEY = os.getenv("DEFAULT_SHARD_KEY", "_AUTRES")
+
+# Nombre de shards physiques par clé
+SHARD_NUMBER = int(os.getenv("SHARD_NUMBER", "1"))
+
+# Durée de validité de la liste des clés de shard lue sur le cluster
+SHARD_KEYS_TTL_S = float(os.getenv("SHARD_KEYS_TTL_S", "300"))
+
+DEFAULT_COLLECTIONS = ["JIRA", "ZENDESK", "CONFLUENCE"]
+SCROLL_BATCH_SIZE = 256
+
+ShardSelector = Optional[Union[str, List[str]]]
+
+
+def sharded_collection_name(collection_name: str) -> str:
+    """Nom de la copie partitionnée par client d'une collection"""
+    return f"{collection_name}{SHARDED_COLLECTION_SUFFIX}"
+
+
+def shard_key(registry, client_value) -> str:
+    """
+    Clé de shard d'une valeur du champ client
+
+    Args:
+        registry: Registre des clients (ClientRegistry)
+        client_value: Valeur du champ client d'un point ou d'un filtre
+
+    Returns:
+        Nom canonique du client, ou DEFAULT_SHARD_KEY s'il est absent ou inconnu
+    """
+    if not client_value:
+        return DEFAULT_SHARD_KEY
+    return registry.canonical_name(str(client_value)) or DEFAULT_SHARD_KEY
+
+
+def filter_client_values(query_filter: Optional[Filter]) -> Optional[List[str]]:
+    """
+    Valeurs du champ client imposées par un filtre
+
+    Seules les conditions `must` de premier niveau restreignent la recherche
+    à des clients précis.
+
+    Args:
+        query_filter: Filtre Qdrant
+
+    Returns:
+        Valeurs acceptées pour le champ client, None si le filtre ne contraint pas le client
+    """
+    if query_filter is None or not query_filter.must:
+        return None
+    must = query_filter.must if isinstance(query_filter.must, list) else [query_filter.must]
+    for condition in must:
+        if isinstance(condition, FieldCondition) and condition.key == "client":
+            if isinstance(condition.match, MatchAny):
+                return list(condition.match.any)
+            if isinstance(condition.match, MatchValue):
+                return [condition.match.value]
+    return None
+
+
+def aliased_collection(client, alias: str) -> Optional[str]:
+    """Collection physique désignée par un alias (None si ce nom n'est pas un alias)"""
+    return {a.alias_name: a.collection_name for a in client.get_aliases().aliases}.get(alias)
+
+
+class ShardRouter:
+    """Choisit la collection et les shards à interroger pour une recherche"""
+
+    def __init__(self, client, registry, collections: List[str] = None, ttl: float = SHARD_KEYS_TTL_S,
+                 copy_sync=None):
+        """
+        Args:
+            client: Client Qdrant
+            registry: Registre des clients (ClientRegistry)
+            collections: Collections servies par leur copie partitionnée (SHARDED_COLLECTIONS par défaut)
+            ttl: Durée de validité de la liste des clés de shard d'une collection
+            copy_sync: Contrôle de fraîcheur des copies (CopySyncChecker) ; None : copies toujours servies
+        """
+        self.client = client
+        self.registry = registry
+        self.collections = set(SHARDED_COLLECTIONS if collections is None else collections)
+        self.ttl = ttl
+        self.copy_sync = copy_sync
+        self._keys: Dict[str, Tuple[float, Set[str]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"routed": 0, "global": 0, "stale": 0}
+
+    def shard_keys(self, physical_name: str) -> Set[str]:
+        """Clés de shard existantes d'une collection (lues sur le cluster, mises en cache)"""
+        with self._lock:
+            cached = self._keys.get(physical_name)
+            if cached and monotonic() - cached[0] < self.ttl:
+                return cached[1]
+        try:
+            # L'API du cluster attend le nom de la collection versionnée, pas l'alias <COLLECTION>_BY_CLIENT
+            versioned_name = aliased_collection(self.client, physical_name) or physical_name
+            # Pas de méthode dédiée dans QdrantClient : appel direct de l'API REST du cluster
+            info = self.client.http.distributed_api.collection_cluster_info(versioned_name).result
+            keys = {shard.shard_key for shard in list(info.local_shards) + list(info.remote_shards)
+                    if shard.shard_key is not None}
+        except Exception as e:
+            print(f"[🧭 Shards] {physical_name}: clés de shard illisibles ({e}), recherche globale")
+            keys = set()
+        with self._lock:
+            self._keys[physical_name] = (monotonic(), keys)
+        return keys
+
+    def route(self, collection_name: str, query_filter: Optional[Filter]) -> Tuple[str, ShardSelector]:
+        """
+        Collection physique et shards à interroger
+
+        Args:
+            collection_name: Collection logique (JIRA, ZENDESK...)
+            query_filter: Filtre de la recherche
+
+        Returns:
+            Tuple (collection à interroger, sélecteur de shards ou None pour tous les shards)
+        """
+        if collection_name not in self.collections:
+            return collection_name, None
+        physical_name = sharded_collection_name(collection_name)
+        # Copie en retard sur l'ingestion : la collection d'origine est interrogée
+        if self.copy_sync and not self.copy_sync.in_sync(self.client, collection_name, physical_name):
+            self.stats["stale"] += 1
+            return collection_name, None
+
+        values = filter_client_values(query_filter)
+        existing = self.shard_keys(physical_name) if values else set()
+        if not existing:
+            self.stats["global"] += 1
+            return physical_name, None
+
+        # Un client ajouté depuis la migration a encore ses points dans le shard commun
+        keys = {shard_key(self.registry, value) for value in values}
+        selected = sorted({key if key in existing else DEFAULT_SHARD_KEY for key in keys})
+        if DEFAULT_SHARD_KEY in selected and DEFAULT_SHARD_KEY not in existing:
+            selected.remove(DEFAULT_SHARD_KEY)
+        if not selected:
+            self.stats["global"] += 1
+            return physical_name, None
+        self.stats["routed"] += 1
+        return physical_name, selected if len(selected) > 1 else selected[0]
+
+
+def migrate_collection(client, registry, collection_name: str) -> Dict[str, int]:
+    """
+    Recopie une collection dans sa version partitionnée par client
+
+    La copie est créée sous un nom versionné, avec la configuration des vecteurs
+    et les index de payload de la collection d'origine. Une fois remplie, l'alias
+    <COLLECTION>_BY_CLIENT bascule sur elle et la copie précédente est supprimée ;
+    en cas d'échec, la copie précédente reste servie.
+
+    Args:
+        client: Client Qdrant
+        registry: Registre des clients (ClientRegistry)
+        collection_name: Collection d'origine
+
+    Returns:
+        Nombre de points copiés par clé de shard
+    """
+    source = client.get_collection(collection_name)
+    alias = sharded_collection_name(collection_name)
+    target = f"{alias}_{int(time())}"
+    client.create_collection(
+        target,
+        vectors_config=source.config.params.vectors,
+        sharding_method=ShardingMethod.CUSTOM,
+        shard_number=SHARD_NUMBER
+    )
+    try:
+        for field, schema in (source.payload_schema or {}).items():
+            client.create_payload_index(target, field, schema.data_type)
+        counts = _copy_points(client, registry, collection_name, target)
+    except Exception:
+        client.delete_collection(target)
+        raise
+
+    previous = aliased_collection(client, alias)
+    operations = []
+    if previous:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    elif client.collection_exists(alias):
+        # Copie construite avant l'usage des alias : elle porte le nom de l'alias
+        client.delete_collection(alias)
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    if previous:
+        client.delete_collection(previous)
+    return dict(counts)
+
+
+def _copy_points(client, registry, collection_name: str, target: str) -> Counter:
+    """Copie les points d'une collection dans le shard de leur client"""
+    counts = Counter()
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=SCROLL_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        by_shard: Dict[str, list] = {}
+        for point in points:
+            key = shard_key(registry, (point.payload or {}).get("client"))
+            by_shard.setdefault(key, []).append(point)
+
+        for key, shard_points in by_shard.items():
+            if key not in counts:
+                client.create_shard_key(target, key)
+            client.upsert(
+                target,
+                points=[PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in shard_points],
+                shard_key_selector=key
+            )
+            counts[key] += len(shard_points)
+
+        if offset is None:
+            break
+    return counts
+
+
+def main():
+    """Migre les collections demandées vers leur version partitionnée par client"""
+    from dotenv import load_dotenv
+    from qdrant_client import QdrantClient
+    from client_registry import get_registry
+
+    load_dotenv()
+    collections = sys.argv[1:] or DEFAULT_COLLECTIONS
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=60)
+    registry = get_registry("ListeClients.csv")
+
+    for collection_name in collections:
+        start = time()
+        counts = migrate_collection(client, registry, collection_name)
+        print(f"[🧭 Shards] {collection_name} → {sharded_collection_name(collection_name)}: "
+              f"{sum(counts.values())} points, {len(counts)} clés de shard en {time() - start:.1f}s")
+    print(f"[🧭 Shards] Ajouter {','.join(collections)} à SHARDED_COLLECTIONS pour router les recherches ; "
+          f"relancer après chaque indexation")
+
+
+if __name__ == "__main__":
+    main()
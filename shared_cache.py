@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache partagé entre les processus de l'API
+Les embeddings, les requêtes enrichies et les résultats de recherche sont
+conservés dans une base SQLite locale en mode WAL : tous les workers uvicorn
+d'une même machine lisent et alimentent le même cache, si bien qu'ajouter des
+workers ne divise pas le taux de succès du cache.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from time import time
+from typing import Any, Optional
+
+# Fichier SQLite du cache partagé (vide : cache désactivé)
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+
+# Durées de conservation (secondes) par type d'entrée
+EMBEDDING_CACHE_TTL_S = float(os.getenv("EMBEDDING_CACHE_TTL_S", str(7 * 24 * 3600)))
+ENRICHMENT_CACHE_TTL_S = float(os.getenv("ENRICHMENT_CACHE_TTL_S", str(24 * 3600)))
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "300"))
+
+# Intervalle minimal entre deux purges des entrées expirées
+PURGE_INTERVAL_S = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID
+"""
+
+
+class SharedCache:
+    """
+    Cache clé-valeur partagé entre processus, adossé à SQLite (mode WAL)
+
+    Chaque thread de chaque processus ouvre sa propre connexion : le cache
+    reste utilisable après un fork. Une erreur SQLite est traitée comme une
+    absence d'entrée, le cache ne fait jamais échouer une requête.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Lit une entrée du cache
+
+        Args:
+            namespace: Type d'entrée (embedding, enrichment, result...)
+            key: Clé de l'entrée
+
+        Returns:
+            Valeur enregistrée, ou None si absente ou expirée
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, self._digest(key), time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"[🗄️ Cache partagé] Lecture impossible: {e}")
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float):
+        """
+        Enregistre une entrée dans le cache
+
+        Args:
+            namespace: Type d'entrée
+            key: Clé de l'entrée
+            value: Valeur à enregistrer
+            ttl: Durée de conservation en secondes
+        """
+        now = time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, self._digest(key), sqlite3.Binary(value), now + ttl)
+            )
+            with self._lock:
+                purge = now - self._last_purge >= PURGE_INTERVAL_S
+                if purge:
+                    self._last_purge = now
+            if purge:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"[🗄️ Cache partagé] Écriture impossible: {e}")
+
+    def get_json(self, namespace: str, key: str) -> Any:
+        """Lit une entrée enregistrée par set_json (None si absente)"""
+        value = self.get(namespace, key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, namespace: str, key: str, value: Any, ttl: float):
+        """Enregistre une valeur sérialisable en JSON"""
+        self.set(namespace, key, json.dumps(value, ensure_ascii=False).encode("utf-8"), ttl)
+
+    def stats(self) -> dict:
+        """Compteurs du processus courant"""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Exécution spéculative de la recherche
+Pendant l'enrichissement de la requête par OpenAI, l'embedding de la requête et
+une recherche par défaut (collections prioritaires du client, filtres prédits
+par les règles locales) sont lancés en parallèle. Une fois l'enrichissement
+connu, chaque recherche spéculative est réutilisée si sa collection, son filtre
+et sa taille correspondent, sinon elle est écartée et la recherche est refaite.
+"""
+
+import contextvars
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from qdrant_client.http.models import Filter
+
+HIT, PARTIAL, MISS = "hit", "partial", "miss"
+
+
+def submit_in_context(executor: Executor, fn: Callable, *args) -> Future:
+    """Soumet fn en lui transmettant le contexte courant (priorité OpenAI notamment)"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+class Speculation:
+    """Embedding et recherches lancés avant la fin de l'enrichissement d'une requête"""
+
+    def __init__(self, embedding: Future, searches: Dict[str, Tuple[Optional[Filter], int, Future]]):
+        """
+        Args:
+            embedding: Calcul de l'embedding de la requête
+            searches: Recherches par collection : (filtre, nombre de résultats demandés, calcul
+                renvoyant (résultats, latence en ms))
+        """
+        self.embedding = embedding
+        self.searches = searches
+        self.embedding_used = False
+        self.reused: List[str] = []
+        self.redone: List[str] = []
+        self._lock = threading.Lock()
+
+    def query_vector(self) -> List[float]:
+        """Embedding spéculatif (l'erreur éventuelle du calcul est propagée)"""
+        self.embedding_used = True
+        return self.embedding.result()
+
+    def take(self, collection_name: str, query_filter: Optional[Filter], limit: int) -> Optional[Future]:
+        """
+        Retourne la recherche spéculative d'une collection si elle correspond à la recherche voulue
+
+        Args:
+            collection_name: Collection à interroger
+            query_filter: Filtre issu de l'enrichissement
+            limit: Nombre de résultats nécessaires
+
+        Returns:
+            Calcul renvoyant (résultats, latence en ms), ou None si la recherche doit être refaite
+        """
+        with self._lock:
+            speculative = self.searches.pop(collection_name, None)
+            if speculative is not None:
+                speculative_filter, speculative_limit, future = speculative
+                if speculative_filter == query_filter and speculative_limit >= limit:
+                    self.reused.append(collection_name)
+                    return future
+                future.cancel()
+            self.redone.append(collection_name)
+            return None
+
+    def fail(self, collection_name: str):
+        """Signale qu'une recherche spéculative reprise a échoué : elle est refaite"""
+        with self._lock:
+            if collection_name in self.reused:
+                self.reused.remove(collection_name)
+            self.redone.append(collection_name)
+
+    def discard(self):
+        """Abandonne les recherches spéculatives non réutilisées"""
+        with self._lock:
+            for _, _, future in self.searches.values():
+                future.cancel()
+            self.searches.clear()
+            if not self.embedding_used:
+                self.embedding.cancel()
+
+    @property
+    def status(self) -> str:
+        """hit : tout a été réutilisé, partial : une partie, miss : rien"""
+        if self.reused and not self.redone:
+            return HIT
+        if self.reused or self.embedding_used:
+            return PARTIAL
+        return MISS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"status": self.status, "reused": list(self.reused), "redone": list(self.redone)}
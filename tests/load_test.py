@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Banc de charge et d'endurance de l'API (app.py)
+Le banc démarre trois processus :
+- un faux serveur OpenAI HTTP (embeddings et chat) à latence réglable ;
+- l'API FastAPI, avec une instance Qdrant en mémoire alimentée d'après les
+  schémas de payload/*.txt (les clients viennent de ListeClients.csv) ;
+- le générateur de charge (ce processus), qui envoie des requêtes /api/search
+  à concurrence croissante sur les trois formats.
+
+Pour chaque palier : débit, latences p50/p95/p99, taux d'erreur et mémoire
+résidente (RSS) de l'API. Le mode endurance maintient une concurrence fixe et
+relève la RSS à intervalle régulier pour rendre visibles caches et fuites.
+
+Utilisation (depuis la racine du projet) :
+    python tests/load_test.py --levels 1,4,16,32 --duration 20
+    python tests/load_test.py --soak-minutes 30 --soak-concurrency 8 --json soak.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(ROOT)
+
+FORMATS = ["Summary", "Detail", "Guide"]
+EMBEDDING_DIM = 1536
+
+VOCABULARY = (
+    "facture commande livraison stock inventaire paiement écriture comptable rapprochement bancaire "
+    "import export utilisateur droits connexion erreur blocage lenteur impression étiquette devis "
+    "fournisseur client article tarif remise TVA clôture exercice report workflow approbation "
+    "interface synchronisation script sauvegarde recherche champ personnalisé formulaire"
+).split()
+
+
+# ---------------------------------------------------------------------------
+# Faux serveur OpenAI
+# ---------------------------------------------------------------------------
+
+def fake_embedding(text: str) -> list:
+    """Vecteur déterministe et normalisé dérivé du texte"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Réponses au format de l'API OpenAI, après un délai simulé"""
+
+    latency_ms = 100.0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(max(0.0, random.gauss(self.latency_ms, self.latency_ms / 4)) / 1000)
+
+        if self.path.endswith("/embeddings"):
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            self._reply({
+                "object": "list",
+                "model": request.get("model"),
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                         for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": 10 * len(inputs), "total_tokens": 10 * len(inputs)},
+            })
+        elif self.path.endswith("/chat/completions"):
+            messages = request.get("messages", [])
+            if messages and "moteur de recherche IT SPIRIT" in messages[0]["content"]:
+                # Enrichissement : collections selon les mots-clés de la requête
+                query = messages[-1]["content"].upper()
+                collections = ["JIRA", "CONFLUENCE", "ZENDESK"]
+                if "SAP" in query:
+                    collections.append("SAP")
+                if "NETSUITE" in query:
+                    collections += ["NETSUITE", "NETSUITE_DUMMIES"]
+                content = json.dumps({"collections": collections, "filters": {}, "use_embedding": True, "limit": 5})
+            else:
+                content = " ".join(random.choices(VOCABULARY, k=request.get("max_tokens", 100) // 2))
+            self._reply({
+                "id": "chatcmpl-load", "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+            })
+        else:
+            self.send_error(404)
+
+
+def serve_openai(port: int, latency_ms: float):
+    FakeOpenAIHandler.latency_ms = latency_ms
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+# ---------------------------------------------------------------------------
+# API avec Qdrant en mémoire
+# ---------------------------------------------------------------------------
+
+def read_schemas(payload_dir: str) -> dict:
+    """Champs de payload de chaque collection, d'après payload/*.txt"""
+    schemas = {}
+    for name in sorted(os.listdir(payload_dir)):
+        with open(os.path.join(payload_dir, name), encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        if lines:
+            schemas[lines[0]] = lines[1:]
+    return schemas
+
+
+def fake_value(field: str, collection: str, client: dict, rng: random.Random, index: int):
+    """Valeur plausible d'un champ de payload"""
+    now = int(time.time())
+    if field == "client":
+        return client["aliases"].get(collection) or client["name"]
+    if field in ("erp",):
+        return client["erp"]
+    if field in ("created", "updated", "last_upserted", "last_updated"):
+        return now - rng.randint(0, 3 * 365) * 86400
+    if field == "source_type":
+        return collection
+    if field in ("id", "ticket_id", "space_id"):
+        return index
+    if field == "key":
+        return f"SUP-{index}"
+    if field in ("url", "space_url", "page_url"):
+        return f"https://example.invalid/{collection.lower()}/{index}"
+    if field == "pdf_path":
+        return f"docs/{collection.lower()}/{index}.pdf"
+    if field == "content_hash":
+        return hashlib.md5(f"{collection}{index}".encode()).hexdigest()
+    if field in ("status", "priority", "resolution", "assignee", "company_name", "time_spent"):
+        return rng.choice(["open", "closed", "high", "low", "Alice", "Bob", client["name"]])
+    words = 8 if field in ("summary", "title") else 120
+    return " ".join(rng.choices(VOCABULARY, k=words))
+
+
+def seed_qdrant(points_per_collection: int):
+    """Crée une instance Qdrant en mémoire alimentée de points synthétiques"""
+    from qdrant_client import QdrantClient, models
+    from client_registry import ALIAS_COLUMNS, read_client_rows
+
+    rng = random.Random(42)
+    clients = [{
+        "name": row["Client"].strip(),
+        "erp": row["ERP"],
+        "aliases": {collection: row[column] for collection, column in ALIAS_COLUMNS.items() if row[column]},
+    } for row in read_client_rows(os.path.join(ROOT, "ListeClients.csv"))]
+
+    qdrant = QdrantClient(":memory:")
+    for collection, fields in read_schemas(os.path.join(ROOT, "payload")).items():
+        qdrant.create_collection(collection, vectors_config=models.VectorParams(
+            size=EMBEDDING_DIM, distance=models.Distance.COSINE))
+        points = []
+        for index in range(points_per_collection):
+            payload = {field: fake_value(field, collection, rng.choice(clients), rng, index) for field in fields}
+            text = payload.get("summary") or payload.get("title") or payload.get("text") or ""
+            points.append(models.PointStruct(id=index, vector=fake_embedding(text), payload=payload))
+        qdrant.upsert(collection, points)
+    return qdrant
+
+
+def serve_app(port: int, points_per_collection: int):
+    """Démarre l'API, le client Qdrant de chaque worker étant remplacé par l'instance en mémoire"""
+    from contextlib import asynccontextmanager
+    import uvicorn
+
+    os.chdir(ROOT)
+    import app as app_module
+
+    qdrant = seed_qdrant(points_per_collection)
+    original = app_module.app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(application):
+        async with original(application):
+            app_module.qdrant_system.client = qdrant
+            yield
+
+    app_module.app.router.lifespan_context = lifespan
+    uvicorn.run(app_module.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+# ---------------------------------------------------------------------------
+# Générateur de charge
+# ---------------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    """Mémoire résidente d'un processus (Linux, /proc)"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def make_queries(count: int, rng: random.Random) -> list:
+    """Requêtes variées ; la loi de Zipf du tirage reproduit des requêtes populaires"""
+    suffixes = ["", " SAP", " NetSuite", " ticket récent"]
+    return [" ".join(rng.choices(VOCABULARY, k=rng.randint(2, 5))) + rng.choice(suffixes) for _ in range(count)]
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else None
+
+
+class LoadRun:
+    """Envoi de requêtes /api/search à concurrence fixe pendant une durée donnée"""
+
+    def __init__(self, base_url: str, queries: list, clients: list, seed: int = 0):
+        self.base_url = base_url
+        self.queries = queries
+        self.clients = clients
+        self.rng = random.Random(seed)
+        self.weights = [1 / (rank + 1) for rank in range(len(queries))]
+
+    def _payload(self) -> dict:
+        return {
+            "query": self.rng.choices(self.queries, weights=self.weights)[0],
+            "client": self.rng.choice(self.clients + [None]),
+            "format": self.rng.choice(FORMATS),
+            "limit": 5,
+        }
+
+    async def run(self, concurrency: int, duration: float, on_tick=None) -> dict:
+        import httpx
+
+        latencies = {fmt: [] for fmt in FORMATS}
+        errors = {}
+        deadline = time.monotonic() + duration
+
+        async def worker(client):
+            while time.monotonic() < deadline:
+                payload = self._payload()
+                start = time.monotonic()
+                try:
+                    response = await client.post("/api/search", json=payload)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                if status == 200:
+                    latencies[payload["format"]].append((time.monotonic() - start) * 1000)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+
+        async def ticker():
+            while time.monotonic() < deadline:
+                await asyncio.sleep(1)
+                on_tick()
+
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=60, limits=limits) as client:
+            start = time.monotonic()
+            tasks = [worker(client) for _ in range(concurrency)]
+            if on_tick:
+                tasks.append(ticker())
+            await asyncio.gather(*tasks)
+            elapsed = time.monotonic() - start
+
+        all_latencies = [value for values in latencies.values() for value in values]
+        total = len(all_latencies) + sum(errors.values())
+        return {
+            "concurrency": concurrency,
+            "requests": total,
+            "throughput_rps": round(len(all_latencies) / elapsed, 2),
+            "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+            "errors": errors,
+            "latency_ms": {
+                "p50": percentile(all_latencies, 50),
+                "p95": percentile(all_latencies, 95),
+                "p99": percentile(all_latencies, 99),
+            },
+            "p95_ms_by_format": {fmt: percentile(values, 95) for fmt, values in latencies.items()},
+        }
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 120):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("L'API s'est arrêtée au démarrage")
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("L'API n'a pas démarré")
+
+
+def fmt_ms(value):
+    return f"{value:8.1f}" if value is not None else "       -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge et d'endurance de l'API /api/search")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="Paliers de concurrence")
+    parser.add_argument("--duration", type=float, default=15, help="Durée de chaque palier (s)")
+    parser.add_argument("--soak-minutes", type=float, default=0, help="Durée de l'essai d'endurance (0 : aucun)")
+    parser.add_argument("--soak-concurrency", type=int, default=8)
+    parser.add_argument("--soak-sample-s", type=float, default=10, help="Intervalle des relevés de RSS")
+    parser.add_argument("--openai-latency-ms", type=float, default=150)
+    parser.add_argument("--points", type=int, default=500, help="Points par collection")
+    parser.add_argument("--distinct-queries", type=int, default=300)
+    parser.add_argument("--json", help="Fichier de sortie des résultats")
+    parser.add_argument("--serve", choices=["app", "openai"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve == "openai":
+        return serve_openai(args.port, args.openai_latency_ms)
+    if args.serve == "app":
+        return serve_app(args.port, args.points)
+
+    openai_port, app_port = free_port(), free_port()
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "load-test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        # Le quota OpenAI réel n'est pas en jeu : l'ordonnanceur ne doit pas brider le banc
+        "OPENAI_RPM": env.get("OPENAI_RPM", "1000000"),
+        "OPENAI_TPM": env.get("OPENAI_TPM", "1000000000"),
+        "QDRANT_URL": "http://127.0.0.1:1",
+        "PYTHONUNBUFFERED": "1",
+    })
+    script = os.path.abspath(__file__)
+    openai_process = subprocess.Popen(
+        [sys.executable, script, "--serve", "openai", "--port", str(openai_port),
+         "--openai-latency-ms", str(args.openai_latency_ms)], env=env)
+    app_process = subprocess.Popen(
+        [sys.executable, script, "--serve", "app", "--port", str(app_port), "--points", str(args.points)],
+        env=env, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    results = {"levels": [], "soak": None}
+    try:
+        wait_ready(base_url, app_process)
+        rng = random.Random(1)
+        clients = ["AZERGO", "ADVIGO", "FORACO", "PUR PROJECT", "GREENMOT"]
+        run = LoadRun(base_url, make_queries(args.distinct_queries, rng), clients)
+
+        print(f"RSS initiale de l'API : {rss_mb(app_process.pid):.1f} Mo")
+        print(" conc.    req/s   erreurs     p50      p95      p99   RSS (Mo)")
+        for level in [int(level) for level in args.levels.split(",")]:
+            stats = asyncio.run(run.run(level, args.duration))
+            stats["rss_mb"] = round(rss_mb(app_process.pid), 1)
+            results["levels"].append(stats)
+            latency = stats["latency_ms"]
+            print(f"{level:6d} {stats['throughput_rps']:8.1f} {stats['error_rate']:8.2%} "
+                  f"{fmt_ms(latency['p50'])} {fmt_ms(latency['p95'])} {fmt_ms(latency['p99'])} {stats['rss_mb']:9.1f}")
+
+        if args.soak_minutes > 0:
+            samples = []
+            last_sample = [0.0]
+
+            def sample():
+                now = time.monotonic()
+                if now - last_sample[0] >= args.soak_sample_s:
+                    last_sample[0] = now
+                    samples.append((now, rss_mb(app_process.pid)))
+                    print(f"[endurance] {len(samples) * args.soak_sample_s:6.0f}s RSS {samples[-1][1]:.1f} Mo")
+
+            stats = asyncio.run(run.run(args.soak_concurrency, args.soak_minutes * 60, on_tick=sample))
+            times = np.array([t - samples[0][0] for t, _ in samples]) if samples else np.array([])
+            rss = np.array([value for _, value in samples])
+            # Pente sur la seconde moitié : les caches se remplissent d'abord, une fuite continue de croître
+            half = len(samples) // 2
+            slope = float(np.polyfit(times[half:], rss[half:], 1)[0]) * 3600 if len(samples) - half >= 2 else None
+            stats["rss_mb"] = {
+                "start": round(float(rss[0]), 1) if len(rss) else None,
+                "end": round(float(rss[-1]), 1) if len(rss) else None,
+                "max": round(float(rss.max()), 1) if len(rss) else None,
+                "growth_mb_per_hour_second_half": round(slope, 1) if slope is not None else None,
+                "samples": [round(float(value), 1) for value in rss],
+            }
+            results["soak"] = stats
+            print(f"Endurance : {stats['throughput_rps']} req/s, erreurs {stats['error_rate']:.2%}, "
+                  f"p95 {fmt_ms(stats['latency_ms']['p95']).strip()} ms, "
+                  f"RSS {stats['rss_mb']['start']} → {stats['rss_mb']['end']} Mo "
+                  f"({stats['rss_mb']['growth_mb_per_hour_second_half']} Mo/h en fin d'essai)")
+
+        try:
+            import httpx
+            results["metrics"] = httpx.get(base_url + "/api/metrics", timeout=10).json()
+        except Exception as e:
+            print(f"Métriques indisponibles: {e}")
+    finally:
+        app_process.terminate()
+        openai_process.terminate()
+        app_process.wait(timeout=30)
+        openai_process.wait(timeout=30)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        print(f"Résultats enregistrés dans {args.json}")
+
+
+if __name__ == "__main__":
+    main()
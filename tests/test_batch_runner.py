@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du traitement par lot des requêtes JSONL (reprise après interruption)
+"""
+
+import sys
+import os
+import json
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from main import completed_lines, run_batch
+from openai_scheduler import BATCH, _priority
+
+
+class FakeSystem:
+    """QdrantSystem minimal : enregistre les appels"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.primed_embeddings = {}
+        self.primed = []
+        self.calls = []
+        self.priorities = set()
+        self.cached = set()
+
+    def prime_embeddings(self, texts):
+        self.primed.append(list(texts))
+        self.primed_embeddings.update({t: [0.0] for t in texts})
+
+    def process_query(self, query, client_name=None, erp=None, recent_only=False, limit=5, format_type="Summary",
+                      deadline_ms=None, use_cache=True):
+        self.calls.append((query, client_name, erp, limit, format_type))
+        self.cached.add(use_cache)
+        self.priorities.add(_priority.get())
+        if query in self.failing:
+            raise RuntimeError("quota")
+        return {"format": format_type, "content": [query.upper()]}
+
+
+def write_queries(path, queries):
+    path.write_text("".join(json.dumps(q) + "\n" for q in queries), encoding="utf-8")
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_batch_writes_results_and_batches_embeddings(tmp_path):
+    """Chaque requête produit une ligne de résultat ; les embeddings sont demandés par fenêtre"""
+    queries = tmp_path / "queries.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_queries(queries, [{"query": f"q{i}", "client": "AZERGO", "format": "Detail", "limit": 3} for i in range(5)])
+    system = FakeSystem()
+
+    stats = run_batch(system, str(queries), str(output), workers=2, embedding_batch=2)
+
+    assert stats["processed"] == 5 and stats["errors"] == 0 and stats["queries_per_s"] > 0
+    assert system.primed == [["q0", "q1"], ["q2", "q3"], ["q4"]]
+    assert system.primed_embeddings == {}
+    assert ("q0", "AZERGO", None, 3, "Detail") in system.calls
+    assert system.priorities == {BATCH}
+    assert system.cached == {False}
+    records = read_records(output)
+    assert sorted(r["line"] for r in records) == [1, 2, 3, 4, 5]
+    assert all(r["result"]["content"] == [r["query"].upper()] for r in records)
+
+
+def test_resume_skips_done_lines_and_retries_errors(tmp_path):
+    """Une reprise ne traite que les lignes sans résultat ou en erreur"""
+    queries = tmp_path / "queries.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_queries(queries, [{"query": "a"}, {"query": "b"}, {"query": "c"}])
+
+    first = run_batch(FakeSystem(failing={"b"}), str(queries), str(output), workers=1)
+    assert first["processed"] == 2 and first["errors"] == 1
+
+    system = FakeSystem()
+    second = run_batch(system, str(queries), str(output), workers=1)
+    assert [call[0] for call in system.calls] == ["b"]
+    assert second["skipped"] == 2 and second["processed"] == 1
+    assert completed_lines(str(output)) == {1, 2, 3}
+    # L'erreur de la première exécution a été retirée : une seule ligne de résultat par requête
+    records = read_records(output)
+    assert sorted(r["line"] for r in records) == [1, 2, 3]
+    assert not any("error" in r for r in records)
+
+
+def test_truncated_last_line_is_dropped(tmp_path):
+    """Une ligne de résultat incomplète (arrêt brutal) est retirée et la requête rejouée"""
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"line": 1, "result": {}}) + "\n" + '{"line": 2, "res', encoding="utf-8")
+    assert completed_lines(str(output)) == {1}
+    assert output.read_text(encoding="utf-8").endswith("}\n")
+
+
+def test_corrupt_result_line_is_dropped(tmp_path):
+    """Une ligne de résultat illisible au milieu du fichier est retirée et la requête rejouée"""
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"line": 1, "result": {}}) + "\n" + '{"line": 2, "res\x00\n'
+                      + "[]\n" + json.dumps({"line": 3, "result": {}}) + "\n", encoding="utf-8")
+    assert completed_lines(str(output)) == {1, 3}
+    assert [r["line"] for r in read_records(output)] == [1, 3]
+
+
+def test_invalid_query_line_is_reported(tmp_path):
+    """Une ligne sans requête est signalée avec son numéro"""
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text('{"query": "a"}\n{"client": "AZERGO"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=":2:"):
+        run_batch(FakeSystem(), str(queries), str(tmp_path / "out.jsonl"))
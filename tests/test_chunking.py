@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests de l'indexation par fragments et de la recherche groupée par document
+"""
+
+import sys
+import os
+import warnings
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from chunking import chunk_collection, chunk_collection_name, split_chunks
+from context_packer import count_tokens
+
+
+def fake_embed(texts):
+    return [[1.0, float(len(text) % 7)] for text in texts]
+
+
+def make_collection(documents):
+    client = QdrantClient(":memory:")
+    client.create_collection("SAP", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    client.upsert("SAP", points=[PointStruct(id=i, vector=[1.0, 0.0], payload=p) for i, p in documents.items()])
+    return client
+
+
+def chunks_of(client, parent_id):
+    points = client.scroll(chunk_collection_name("SAP"), limit=100, with_payload=True)[0]
+    return sorted((p.payload for p in points if p.payload["parent_id"] == str(parent_id)),
+                  key=lambda payload: payload["chunk_index"])
+
+
+def test_split_chunks_respects_size_and_overlaps():
+    """Les fragments tiennent dans le budget et reprennent la fin du fragment précédent"""
+    text = "\n\n".join(f"Paragraphe {i} sur la configuration des comptes fournisseurs." for i in range(40))
+    chunks = split_chunks(text, max_tokens=60, overlap_tokens=20)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 60 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split("\n")[0] in previous
+    assert split_chunks("Texte court") == ["Texte court"]
+
+
+def test_split_chunks_without_punctuation():
+    """Un texte de PDF sans ponctuation ni paragraphes est découpé par mots"""
+    chunks = split_chunks(" ".join(["mot"] * 500), max_tokens=100, overlap_tokens=0)
+    assert len(chunks) >= 5
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+
+
+def test_chunk_collection_is_incremental():
+    """Seuls les documents modifiés sont redécoupés, les documents supprimés perdent leurs fragments"""
+    long_text = "\n\n".join(f"Étape {i} : paramétrer la table T{i} avant la clôture mensuelle." for i in range(60))
+    client = make_collection({
+        1: {"client": "AZERGO", "erp": "SAP", "title": "Guide clôture", "text": long_text, "pdf_path": "a.pdf"},
+        2: {"client": "ADVIGO", "erp": "SAP", "title": "Note", "text": "Court document"},
+    })
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        stats = chunk_collection(client, "SAP", fake_embed)
+    assert stats["documents"] == 2 and stats["chunks"] > 2
+
+    chunks = chunks_of(client, 1)
+    assert len(chunks) > 1
+    assert chunks[0]["client"] == "AZERGO" and chunks[0]["pdf_path"] == "a.pdf"
+    assert "text" not in chunks[0]
+
+    client.set_payload("SAP", payload={"text": "Document réécrit"}, points=[1])
+    client.delete("SAP", points_selector=[2])
+    stats = chunk_collection(client, "SAP", fake_embed)
+    assert stats == {"documents": 1, "unchanged": 0, "removed": 1, "chunks": 1}
+    assert [c["content"] for c in chunks_of(client, 1)] == ["Document réécrit"]
+    assert chunks_of(client, 2) == []
+    assert chunk_collection(client, "SAP", fake_embed)["unchanged"] == 1
+
+
+def test_grouped_search_returns_one_chunk_per_document():
+    """La recherche groupée (group_by parent_id) ne renvoie qu'un fragment par document"""
+    client = make_collection({
+        1: {"client": "AZERGO", "text": "\n\n".join(["alpha " * 60] * 6)},
+        2: {"client": "AZERGO", "text": "beta"},
+    })
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        chunk_collection(client, "SAP", fake_embed)
+    groups = client.query_points_groups(chunk_collection_name("SAP"), query=[1.0, 0.0], group_by="parent_id",
+                                        group_size=1, limit=5, with_payload=True).groups
+    assert sorted(group.id for group in groups) == ["1", "2"]
+    assert all(len(group.hits) == 1 for group in groups)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du registre des clients (détection des noms et rechargement à chaud)
+"""
+
+import sys
+import os
+import time
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from client_registry import ClientRegistry, load_clients
+
+HEADER = "Client;Consultant;Statut;JIRA;ZENDESK;CONFLUENCE;ERP\n"
+
+
+def write_csv(path, rows, mtime=None):
+    path.write_text(HEADER + "".join(rows), encoding="utf-8-sig")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_load_clients_merges_duplicate_rows(tmp_path):
+    """Les lignes d'un même client complètent les champs vides"""
+    path = tmp_path / "clients.csv"
+    write_csv(path, ["AZERGO;Alice;OK;;AZERGO;;\n", "AZERGO;Bob;;AZ;;AZ-Wiki;SAP\n"])
+    clients = load_clients(str(path))
+    assert clients["AZERGO"]["consultant"] == "Alice"
+    assert clients["AZERGO"]["jira"] == "AZ"
+    assert clients["AZERGO"]["erp"] == "SAP"
+
+
+def test_match_exact_and_fuzzy(tmp_path):
+    """Un nom cité dans la requête est reconnu, y compris avec une faute de frappe"""
+    path = tmp_path / "clients.csv"
+    write_csv(path, ["AZERGO;;;;;;SAP\n", "ADVIGO;;;;;;NetSuite\n"])
+    registry = ClientRegistry(str(path), reload_interval=0)
+    assert registry.match("problème de facture chez azergo") == ("AZERGO", 100.0, {"source": "AZERGO"})
+    assert registry.match("ADVIGOO")[0] == "ADVIGO"
+    assert registry.match("problème de connexion") == (None, 0.0, {})
+
+
+def test_reload_swaps_index_when_file_changes(tmp_path):
+    """Une modification du fichier remplace le dictionnaire et l'index de détection"""
+    path = tmp_path / "clients.csv"
+    write_csv(path, ["AZERGO;;;;;;SAP\n"], mtime=1_000_000)
+    registry = ClientRegistry(str(path), reload_interval=0)
+    previous = registry.index
+    assert registry.reload_if_changed() is False
+
+    write_csv(path, ["AZERGO;;;;;;SAP\n", "NOUVEAU CLIENT;;;;;;NetSuite\n"], mtime=2_000_000)
+    assert registry.reload_if_changed() is True
+    assert "NOUVEAU CLIENT" in registry.clients
+    assert registry.match("ticket NOUVEAU CLIENT")[0] == "NOUVEAU CLIENT"
+    # L'ancien état reste intact pour les requêtes qui l'utilisaient encore
+    assert "NOUVEAU CLIENT" not in previous.clients
+
+
+def test_unreadable_file_keeps_previous_state(tmp_path):
+    """Un fichier supprimé ou invalide ne vide pas le registre"""
+    path = tmp_path / "clients.csv"
+    write_csv(path, ["AZERGO;;;;;;SAP\n"], mtime=1_000_000)
+    registry = ClientRegistry(str(path), reload_interval=0)
+
+    path.write_text("Nom;Autre\nx;y\n", encoding="utf-8")
+    os.utime(path, (2_000_000, 2_000_000))
+    assert registry.reload_if_changed() is False
+    path.unlink()
+    assert registry.reload_if_changed() is False
+    assert list(registry.clients) == ["AZERGO"]
+
+
+def test_background_watcher_reloads(tmp_path):
+    """La surveillance en arrière-plan détecte la modification sans appel explicite"""
+    path = tmp_path / "clients.csv"
+    write_csv(path, ["AZERGO;;;;;;SAP\n"], mtime=1_000_000)
+    registry = ClientRegistry(str(path), reload_interval=0.02)
+    registry.start()
+    try:
+        write_csv(path, ["ADVIGO;;;;;;NetSuite\n"], mtime=2_000_000)
+        deadline = time.monotonic() + 2
+        while "ADVIGO" not in registry.clients and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert list(registry.clients) == ["ADVIGO"]
+    finally:
+        registry.stop()
+
+
+def test_aliases_per_collection(tmp_path):
+    """Chaque collection reçoit les identifiants du client dans sa source, toutes lignes confondues"""
+    path = tmp_path / "clients.csv"
+    write_csv(path, [
+        "ADVIGO;;;;ADVIGO;ADVIQO-Support;NetSuite\n",
+        "FORACO;;;FORACO - GENERAL;Foraco;FORACO;SAP\n",
+        "FORACO;;;FORACO - Support;Foraco AU;FORACO - Support;SAP\n",
+    ])
+    registry = ClientRegistry(str(path), reload_interval=0)
+    assert registry.client_aliases("ADVIGO", "CONFLUENCE") == ["ADVIGO", "ADVIQO-Support"]
+    assert registry.client_aliases("ADVIGO", "JIRA") == ["ADVIGO"]
+    assert registry.client_aliases("FORACO", "JIRA") == ["FORACO", "FORACO - GENERAL", "FORACO - Support"]
+    assert registry.client_aliases("FORACO", "SAP") == ["FORACO"]
+    # Un identifiant de source ramène au client canonique
+    assert registry.client_aliases("foraco au", "ZENDESK") == ["FORACO", "Foraco", "Foraco AU"]
+    assert registry.client_aliases("Inconnu", "JIRA") == ["Inconnu"]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du regroupement des requêtes identiques concurrentes
+"""
+
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from coalescing import SingleFlight
+
+
+def test_concurrent_identical_calls_run_once():
+    """Dix appels concurrents sur la même clé n'exécutent le calcul qu'une fois"""
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return {"format": "Summary", "content": ["ok"]}
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futures = [pool.submit(flight.do, "même requête", compute) for _ in range(10)]
+        while flight.stats()["coalesced"] < 9:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == {"format": "Summary", "content": ["ok"]} for r in results)
+    assert flight.stats() == {"executed": 1, "coalesced": 9, "in_flight": 0}
+
+
+def test_errors_are_shared_and_not_cached():
+    """Une erreur est transmise aux appelants regroupés, l'appel suivant est réexécuté"""
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("Qdrant indisponible")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", fail)
+
+    assert flight.do("k", lambda: 42) == 42
+    assert flight.stats()["executed"] == 2
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests de l'assemblage du contexte LLM sous budget de tokens
+"""
+
+import sys
+import os
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from context_packer import count_tokens, pack_context, split_passages
+
+
+def test_pack_context_respects_budget():
+    """Le contexte assemblé ne dépasse jamais le budget"""
+    body = "\n\n".join(f"Paragraphe {i} sans rapport avec la question posée." for i in range(50))
+    documents = [(f"Ticket {i} : erreur de connexion SAP", body) for i in range(10)]
+
+    context, tokens = pack_context("erreur de connexion SAP", documents, budget=200)
+
+    assert tokens <= 200
+    assert tokens == count_tokens(context)
+    assert context.startswith("Ticket 0")
+
+
+def test_pack_context_counts_separators():
+    """Les retours à la ligne entre en-têtes et passages sont comptés dans le budget"""
+    documents = [(f"Ticket {i}", f"Erreur {i}.\n\nCorrection {i}.") for i in range(20)]
+    # Budget égal à la somme des textes seuls : sans les séparateurs, tout tiendrait
+    budget = sum(count_tokens(header) + count_tokens(f"Erreur {i}.") + count_tokens(f"Correction {i}.")
+                 for i, (header, _) in enumerate(documents))
+
+    context, tokens = pack_context("erreur", documents, budget=budget)
+
+    assert tokens <= budget
+    assert "Correction 19." not in context
+
+
+def test_pack_context_prefers_relevant_passages():
+    """Les passages qui partagent des termes avec la requête sont retenus en priorité"""
+    body = "\n\n".join([
+        "Introduction générale au module de ventes.",
+        "Historique du projet et liste des intervenants.",
+        "Pour corriger l'erreur de connexion, réinitialiser le mot de passe du compte SAP.",
+    ])
+    header = "Problème utilisateur"
+    budget = count_tokens(header) + count_tokens(body.split("\n\n")[2]) + 1
+
+    context, _ = pack_context("erreur connexion SAP", [(header, body)], budget=budget)
+
+    assert "réinitialiser le mot de passe" in context
+    assert "Historique du projet" not in context
+
+
+def test_split_passages_splits_long_paragraphs():
+    """Un paragraphe trop long est découpé en groupes de phrases"""
+    paragraph = " ".join(f"Phrase numéro {i} du document." for i in range(100))
+
+    passages = split_passages(paragraph, max_tokens=30)
+
+    assert len(passages) > 1
+    assert all(count_tokens(p) <= 30 for p in passages)
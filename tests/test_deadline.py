@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests de l'échéance des requêtes (budget de latence et dégradations)
+"""
+
+import sys
+import os
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Le client OpenAI est créé à l'import du module, aucune requête n'est envoyée ici
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+import query_system
+from deadline import (EXTRACTIVE_INSTEAD_OF_SYNTHESIS, FEWER_COLLECTIONS, LOCAL_RULES, MIN_CALL_TIMEOUT_S, PARTIAL_RESULTS,
+                      call_timeout, current_deadline, request_deadline)
+from embedding_migration import LEGACY_SPACE, StubEmbedder
+from hit_stats import HitStatistics
+from query_system import QdrantSystem
+from shared_cache import SharedCache
+
+CLIENTS_FILE = os.path.join(os.path.dirname(__file__), "..", "ListeClients.csv")
+TEXTS = ["Erreur de facturation", "Facture bloquée", "Connexion impossible"]
+
+
+@pytest.fixture
+def system(monkeypatch):
+    monkeypatch.setattr(query_system, "SPECULATIVE_SEARCH", False)
+    embedder = StubEmbedder(default_dimensions=16)
+    client = QdrantClient(":memory:")
+    for collection_name in ("JIRA", "ZENDESK"):
+        client.create_collection(collection_name, vectors_config=VectorParams(size=16, distance=Distance.COSINE))
+        client.upsert(collection_name, points=[
+            PointStruct(id=i, vector=vector, payload={"summary": text, "created": 1700000000 + i})
+            for i, (text, vector) in enumerate(zip(TEXTS, embedder(TEXTS, LEGACY_SPACE)))
+        ])
+    system = QdrantSystem(CLIENTS_FILE)
+    system.client = client
+    system.local_mirror = None
+    system.shared_cache = None
+    system.embedder = embedder
+    system.completions = []
+    system.enrich_query_with_openai = lambda query: {"collections": ["JIRA", "ZENDESK"], "filters": {}}
+    system.create_completion = lambda messages, temperature, max_tokens: system.completions.append(messages) or "synthèse"
+    return system
+
+
+def test_request_deadline_context():
+    """L'échéance n'existe que dans son contexte ; 0 désactive toute limite"""
+    assert current_deadline() is None and call_timeout(20) == 20
+    with request_deadline(1000) as deadline:
+        assert current_deadline() is deadline
+        assert 0.5 < call_timeout(20) <= 1.0
+        deadline.degrade(LOCAL_RULES, "test")
+        deadline.degrade(LOCAL_RULES, "test")
+        assert deadline.degradations == [LOCAL_RULES]
+    with request_deadline(0) as deadline:
+        assert deadline is None and current_deadline() is None
+    with request_deadline(1):
+        assert call_timeout(20) == MIN_CALL_TIMEOUT_S
+
+
+def test_comfortable_budget_keeps_full_pipeline(system):
+    """Avec un budget suffisant, enrichissement et synthèse ont lieu sans dégradation"""
+    result = system.process_query("facturation", deadline_ms=60000)
+    assert result["format"] == "Summary" and result["content"] == ["synthèse"]
+    assert result["degradations"] == []
+
+
+def test_short_budget_degrades_enrichment_and_synthesis(system):
+    """Budget trop court : règles locales au lieu du modèle, résumé extractif au lieu de la synthèse"""
+    system.enrich_query_with_openai = lambda query: pytest.fail("enrichissement par le modèle inattendu")
+    system.get_prioritized_collections = lambda client_name, erp: ["JIRA", "ZENDESK"]
+    result = system.process_query("facturation", format_type="Summary", deadline_ms=2000)
+    assert result["degradations"][0] == LOCAL_RULES and EXTRACTIVE_INSTEAD_OF_SYNTHESIS in result["degradations"]
+    assert result["format"] == "Summary-fast" and "facturation" in result["content"][0]
+    assert system.completions == []
+
+
+def test_short_budget_searches_fewer_collections(system, monkeypatch):
+    """Échéance proche : seule la collection la plus prioritaire est interrogée"""
+    monkeypatch.setattr(query_system, "DEADLINE_SEARCH_MS", 5000)
+    filters = {c: None for c in ("JIRA", "ZENDESK")}
+    with request_deadline(1000) as deadline:
+        hits, searched, _ = system._collect_vector_hits("facture", ["JIRA", "ZENDESK"], filters, 5,
+                                                        HitStatistics.scopes())
+    assert searched == ["JIRA"] and hits
+    assert deadline.degradations == [FEWER_COLLECTIONS]
+
+
+def test_partial_results_are_flagged_and_not_cached(system, tmp_path):
+    """Une collection en erreur est signalée comme indisponible et la réponse partielle n'est pas mise en cache"""
+    system.shared_cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    stored = []
+    system.shared_cache.set_json = lambda namespace, key, value, ttl: stored.append(namespace)
+    system.client.delete_collection("ZENDESK")
+    result = system.process_query("facturation", format_type="Detail", deadline_ms=60000)
+    assert result["degradations"] == [PARTIAL_RESULTS]
+    assert "ZENDESK (indisponible)" in result["sources"]
+    assert "result" not in stored
+
+
+def test_requests_with_different_budgets_are_not_coalesced(system):
+    """Une requête au budget court n'attend pas le traitement d'une requête au budget long, et inversement"""
+    budgets = []
+    system.single_flight.do = lambda key, fn: budgets.append(key[-2])
+    system.process_query("facturation", deadline_ms=60000)
+    system.process_query("facturation", deadline_ms=2000)
+    assert budgets == [60000, 2000]
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests de l'élimination des quasi-doublons entre collections
+"""
+
+import sys
+import os
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import dedup
+from dedup import HitDeduplicator, compute_fingerprint, get_fingerprint
+
+INCIDENT = (
+    "Impossible de valider les factures fournisseurs dans SAP Business One depuis la mise à jour. "
+    "Le message d'erreur indique un problème de droits sur la table OPCH pour l'utilisateur comptable. "
+    "Le contournement consiste à réattribuer la licence professionnelle puis à relancer le client."
+)
+
+
+def test_near_duplicates_across_collections():
+    """Le même incident copié dans JIRA et ZENDESK n'est retenu qu'une fois"""
+    dedup = HitDeduplicator()
+    jira = {"summary": "Factures fournisseurs bloquées", "content": INCIDENT}
+    zendesk = {"summary": "Factures fournisseurs bloquées", "content": INCIDENT + " Merci."}
+    other = {"summary": "Export des écritures", "content": "Le fichier d'export comptable est vide pour le mois de mars."}
+
+    assert not dedup.is_duplicate("JIRA", 1, jira)
+    assert dedup.is_duplicate("ZENDESK", 1, zendesk)
+    assert not dedup.is_duplicate("CONFLUENCE", 7, other)
+    assert dedup.duplicates == 1
+
+
+def test_content_hash_is_used_when_present():
+    """Deux points avec le même content_hash sont des doublons, même avec des textes différents"""
+    dedup = HitDeduplicator()
+
+    assert not dedup.is_duplicate("NETSUITE", "a", {"content_hash": "abc", "content": "Texte A"})
+    assert dedup.is_duplicate("NETSUITE", "b", {"content_hash": "abc", "content": "Texte B"})
+
+
+def test_content_hash_does_not_hide_near_duplicates():
+    """Un point muni de content_hash reste comparé par SimHash aux copies qui n'en ont pas"""
+    dedup = HitDeduplicator()
+    netsuite = {"content_hash": "abc", "summary": "Factures fournisseurs bloquées", "content": INCIDENT}
+    zendesk = {"summary": "Factures fournisseurs bloquées", "content": INCIDENT + " Merci."}
+    jira = {"content_hash": "def", "summary": "Factures fournisseurs bloquées", "content": INCIDENT}
+
+    assert not dedup.is_duplicate("NETSUITE", "ns-2", netsuite)
+    assert dedup.is_duplicate("ZENDESK", "zd-2", zendesk)
+    assert dedup.is_duplicate("JIRA", "jira-2", jira)
+
+
+def test_fingerprint_is_cached_per_content(monkeypatch):
+    """L'empreinte d'un point n'est calculée qu'une fois par contenu ; un nouveau texte est réempreinté"""
+    computed = []
+    monkeypatch.setattr(dedup, "compute_fingerprint",
+                        lambda payload: computed.append(payload) or compute_fingerprint(payload))
+    payload = {"summary": "Erreur de connexion", "content": INCIDENT}
+    first = get_fingerprint("JIRA", 42, payload)
+    assert get_fingerprint("JIRA", 42, dict(payload)) == first
+    assert len(computed) == 1
+
+    # Même identifiant, texte réindexé (ou autre fragment d'un document en recherche groupée)
+    updated = get_fingerprint("JIRA", 42, {"summary": "Export comptable vide", "content": "Le fichier est vide."})
+    assert updated != first and len(computed) == 2
+
+
+def test_short_texts_require_exact_match():
+    """Deux tickets courts qui ne diffèrent que par un numéro ne sont pas des doublons"""
+    dedup = HitDeduplicator()
+
+    assert not dedup.is_duplicate("JIRA", 100, {"summary": "Erreur facture 1234"})
+    assert not dedup.is_duplicate("ZENDESK", 100, {"summary": "Erreur facture 5678"})
+    assert dedup.is_duplicate("CONFLUENCE", 100, {"summary": "erreur  FACTURE 1234"})
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests des digests précalculés (résumé et étapes écrits dans les payloads)
+"""
+
+import sys
+import os
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from digests import digest_collection
+from hit_formatter import current_digest, format_hits
+
+
+def make_collection(payloads):
+    client = QdrantClient(":memory:")
+    client.create_collection("JIRA", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    client.upsert("JIRA", points=[PointStruct(id=i, vector=[1.0, 0.0], payload=p) for i, p in enumerate(payloads, 1)])
+    return client
+
+
+def payloads(client):
+    return {p.id: p.payload for p in client.scroll("JIRA", limit=10, with_payload=True)[0]}
+
+
+def test_digests_written_once_per_content_hash():
+    """Le digest n'est recalculé que si le content_hash du point change"""
+    client = make_collection([
+        {"summary": "Export bloqué", "content": "1. Ouvrir SAP\n2. Relancer l'export", "content_hash": "h1"},
+        {"summary": "", "content": ""},
+    ])
+    calls = []
+
+    def summarize(text):
+        calls.append(text)
+        return "Export relancé depuis SAP."
+
+    assert digest_collection(client, "JIRA", summarize) == (1, 1)
+    payload = payloads(client)[1]
+    assert payload["digest_abstract"] == "Export relancé depuis SAP."
+    assert payload["digest_steps"] == ["Ouvrir SAP", "Relancer l'export"]
+    assert payload["digest_hash"] == "h1"
+
+    assert digest_collection(client, "JIRA", summarize) == (0, 2)
+    client.set_payload("JIRA", payload={"content_hash": "h2"}, points=[1])
+    assert digest_collection(client, "JIRA", summarize) == (1, 1)
+    assert len(calls) == 2
+
+
+def test_failed_summary_leaves_point_unchanged():
+    """Un résumé en erreur n'écrit rien : le point sera repris au prochain passage"""
+    client = make_collection([{"summary": "Connexion", "content": "Mot de passe expiré"}])
+
+    def summarize(text):
+        raise RuntimeError("quota")
+
+    assert digest_collection(client, "JIRA", summarize) == (0, 0)
+    assert "digest_hash" not in payloads(client)[1]
+
+
+def test_stale_digest_is_ignored():
+    """Sans content_hash, l'empreinte du texte détecte un digest périmé"""
+    client = make_collection([{"summary": "Connexion", "content": "Mot de passe expiré"}])
+    digest_collection(client, "JIRA", lambda text: "Mot de passe à renouveler.")
+    payload = payloads(client)[1]
+    assert current_digest(payload) == ("Mot de passe à renouveler.", [])
+
+    payload["content"] = "Compte verrouillé"
+    assert current_digest(payload) is None
+
+
+def test_format_hits_carries_digest_for_synthesis_formats():
+    """Les formats Summary et Guide reçoivent le digest, Detail l'ignore"""
+    payload = {"summary": "Export", "content_hash": "h1", "digest_hash": "h1",
+               "digest_abstract": "Résumé", "digest_steps": ["Ouvrir"]}
+    assert format_hits([(payload, 0.9, 1)], "Summary")[0].digest == ("Résumé", ["Ouvrir"])
+    assert format_hits([(payload, 0.9, 1)], "Guide")[0].digest == ("Résumé", ["Ouvrir"])
+    assert format_hits([(payload, 0.9, 1)], "Detail")[0].digest is None
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests de la migration vers le modèle d'embedding réduit (collections réduites, double lecture, bascule)
+"""
+
+import sys
+import os
+import threading
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Le client OpenAI est créé à l'import du module, aucune requête n'est envoyée ici
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from embedding_migration import (LEGACY_SPACE, SHADOW_SPACE, DualReadStats, StubEmbedder, build_shadow_collection,
+                                 overlap_at_k)
+from query_system import QdrantSystem
+
+CLIENTS_FILE = os.path.join(os.path.dirname(__file__), "..", "ListeClients.csv")
+LEGACY_DIM = 64
+TEXTS = ["Erreur de facturation SAP", "Connexion NetSuite impossible", "Export comptable en échec",
+         "Mot de passe oublié", "Facture SAP bloquée en validation"]
+
+
+@pytest.fixture
+def embedder():
+    return StubEmbedder(default_dimensions=LEGACY_DIM)
+
+
+@pytest.fixture
+def client(embedder):
+    client = QdrantClient(":memory:")
+    client.create_collection("JIRA", vectors_config=VectorParams(size=LEGACY_DIM, distance=Distance.COSINE))
+    client.upsert("JIRA", points=[
+        PointStruct(id=i, vector=vector, payload={"summary": text, "client": "AZERGO"})
+        for i, (text, vector) in enumerate(zip(TEXTS, embedder(TEXTS, LEGACY_SPACE)))
+    ])
+    return client
+
+
+def test_stub_embedder_is_deterministic(embedder):
+    """Même texte, même vecteur normé ; la dimension dépend du modèle"""
+    legacy = embedder(["facture SAP"], LEGACY_SPACE)[0]
+    assert legacy == embedder(["facture SAP"], LEGACY_SPACE)[0]
+    assert len(legacy) == LEGACY_DIM
+    shadow = embedder(["facture SAP", ""], SHADOW_SPACE)
+    assert len(shadow[0]) == SHADOW_SPACE.dimensions
+    assert sum(x * x for x in shadow[1]) == pytest.approx(1.0)
+
+
+def test_overlap_and_cutover_thresholds():
+    """L'overlap@k mesure la part des résultats d'ada-002 retrouvés ; la bascule exige assez d'échantillons"""
+    assert overlap_at_k([1, 2, 3, 4], [4, 3, 9, 8], k=4) == 0.5
+    assert overlap_at_k(["1", 2], [1, "2"], k=2) == 1.0
+    assert overlap_at_k([], [1], k=3) == 1.0
+
+    stats = DualReadStats(min_overlap=0.8, min_samples=2)
+    stats.record("JIRA", 1.0, 40.0, 20.0)
+    assert not stats.ready("JIRA")
+    stats.record("JIRA", 0.8, 60.0, 30.0)
+    assert stats.ready("JIRA")
+    assert stats.summary()["JIRA"]["shadow_ms"] == 25.0
+
+
+def test_shadow_scores_are_calibrated():
+    """Les scores réduits sont ramenés sur l'échelle d'ada-002 ; la double lecture propose la transformation"""
+    assert LEGACY_SPACE.calibrate(0.8) == 0.8
+    assert SHADOW_SPACE.raw_score(SHADOW_SPACE.calibrate(0.42)) == pytest.approx(0.42)
+
+    stats = DualReadStats()
+    assert stats.calibration("JIRA") is None
+    # ada-002 ≈ 0.5 × réduit + 0.6
+    stats.record("JIRA", 1.0, 10.0, 5.0, [0.9, 0.85, 0.8], [0.6, 0.5, 0.4])
+    assert stats.calibration("JIRA") == {"scale": 0.5, "offset": 0.6}
+
+
+def test_build_shadow_collection_is_incremental(client, embedder):
+    """Les points inchangés ne sont pas revectorisés ; le payload est conservé"""
+    embed = lambda texts: embedder(texts, SHADOW_SPACE)
+    assert build_shadow_collection(client, "JIRA", embed) == {"embedded": 5, "unchanged": 0, "deleted": 0}
+    target = SHADOW_SPACE.collection_name("JIRA")
+    assert client.get_collection(target).config.params.vectors.size == SHADOW_SPACE.dimensions
+
+    client.set_payload("JIRA", payload={"summary": "Facture SAP rejetée"}, points=[4])
+    assert build_shadow_collection(client, "JIRA", embed) == {"embedded": 1, "unchanged": 4, "deleted": 0}
+    assert client.retrieve(target, ids=[4])[0].payload["summary"] == "Facture SAP rejetée"
+
+    client.delete("JIRA", points_selector=[0, 1])
+    assert build_shadow_collection(client, "JIRA", embed) == {"embedded": 0, "unchanged": 3, "deleted": 2}
+    assert client.count(target).count == 3
+
+
+def test_cutover_and_dual_read(client, embedder):
+    """Une collection basculée est cherchée dans sa version réduite ; la double lecture compare les deux chemins"""
+    build_shadow_collection(client, "JIRA", lambda texts: embedder(texts, SHADOW_SPACE))
+    system = QdrantSystem(CLIENTS_FILE)
+    system.client = client
+    system.local_mirror = None
+    system.embedder = embedder
+
+    legacy_hits = system.search_in_collection("JIRA", "facture SAP", limit=2)
+    system.cutover_collections.add("JIRA")
+    assert system.embedding_space("JIRA") is SHADOW_SPACE
+    shadow_hits = system.search_in_collection("JIRA", "facture SAP", limit=2)
+    # Le vecteur réduit (512 dimensions) ne peut être cherché que dans JIRA_SMALL
+    assert shadow_hits[0][2] == legacy_hits[0][2] == 4
+    assert 0.6 <= shadow_hits[0][1] <= 1.1
+
+    # Point indexé après la construction de JIRA_SMALL : la collection est servie par ada-002
+    system.copy_sync.ttl = 0
+    client.upsert("JIRA", points=[PointStruct(id=9, vector=embedder(["Avoir SAP"], LEGACY_SPACE)[0],
+                                              payload={"summary": "Avoir SAP"})])
+    assert system.embedding_space("JIRA") is LEGACY_SPACE
+    assert system.get_metrics()["copy_lag"] == {"JIRA_SMALL": 1}
+    client.delete("JIRA", points_selector=[9])
+
+    system.cutover_collections.clear()
+    system._start_dual_read("JIRA", "facture SAP", None, 2, legacy_hits, 12.0)
+    system.dual_read_executor.shutdown(wait=True)
+    summary = system.get_metrics()["embedding_migration"]["dual_read"]["JIRA"]
+    assert summary["samples"] == 1 and summary["legacy_ms"] == 12.0
+    assert 0.0 <= summary["overlap_at_10"] <= 1.0
+
+
+def test_shadow_routing_does_not_recount_concurrently(client, embedder, monkeypatch):
+    """Pendant le recomptage d'une requête, les autres restent sur la version réduite sans recompter"""
+    build_shadow_collection(client, "JIRA", lambda texts: embedder(texts, SHADOW_SPACE))
+    system = QdrantSystem(CLIENTS_FILE)
+    system.client = client
+    system.cutover_collections.add("JIRA")
+    system.copy_sync.ttl = 0
+    assert system.embedding_space("JIRA") is SHADOW_SPACE
+
+    started, release = threading.Event(), threading.Event()
+    counts = []
+    count = client.count
+
+    def slow_count(name, exact):
+        counts.append(name)
+        started.set()
+        release.wait(5)
+        return count(name, exact=exact)
+
+    monkeypatch.setattr(client, "count", slow_count)
+    refresh = threading.Thread(target=system.embedding_space, args=("JIRA",))
+    refresh.start()
+    assert started.wait(5)
+    assert all(system.embedding_space("JIRA") is SHADOW_SPACE for _ in range(10))
+    assert counts == ["JIRA"]
+    release.set()
+    refresh.join()
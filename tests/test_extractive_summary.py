@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du résumé extractif local (format Summary-fast et repli du format Summary)
+"""
+
+import sys
+import os
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Le client OpenAI est créé à l'import du module, aucune requête n'est envoyée ici
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+import query_system
+from deadline import EXTRACTIVE_INSTEAD_OF_SYNTHESIS
+from embedding_migration import LEGACY_SPACE, StubEmbedder
+from extractive_summary import sentence_terms, split_sentences, summarize
+from openai_scheduler import AdmissionRejected
+from query_system import QdrantSystem
+
+CLIENTS_FILE = os.path.join(os.path.dirname(__file__), "..", "ListeClients.csv")
+
+DOCUMENTS = [
+    "Bonjour, merci pour votre retour. La facture SAP reste bloquée au statut brouillon après validation. "
+    "Le blocage vient du contrôle de TVA intracommunautaire sur la facture.",
+    "La facture SAP reste bloquée au statut brouillon après la validation !\n"
+    "Correction : renseigner le numéro de TVA intracommunautaire du client puis relancer la validation de la facture.",
+    "Le serveur d'impression a été redémarré ce matin. Les étiquettes logistiques sortent de nouveau.",
+]
+
+
+def test_sentences_and_french_stop_words():
+    """Phrases découpées sur la ponctuation et les retours à la ligne ; mots vides et nombres ignorés"""
+    assert split_sentences("Première phrase. Deuxième ligne\n- Puce finale") == [
+        "Première phrase.", "Deuxième ligne", "Puce finale"]
+    assert sentence_terms("Bonjour, la facture n'est toujours pas validée depuis 2024") == [
+        "FACTURE", "VALIDEE"]
+
+
+def test_summary_favours_query_and_drops_near_duplicates():
+    """Les phrases liées à la requête sont retenues, une seule fois, dans l'ordre des documents"""
+    sentences = summarize("facture SAP bloquée", DOCUMENTS, max_sentences=3)
+    assert len(sentences) == 3
+    assert sum("statut brouillon" in s for s in sentences) == 1
+    assert all("impression" not in s and "étiquettes" not in s for s in sentences)
+    assert sentences == sorted(sentences, key=lambda s: next(i for i, d in enumerate(DOCUMENTS) if s[:30] in d))
+    assert summarize("facture", ["", "ok."]) == []
+
+
+@pytest.fixture
+def system(monkeypatch):
+    monkeypatch.setattr(query_system, "SPECULATIVE_SEARCH", False)
+    embedder = StubEmbedder(default_dimensions=16)
+    client = QdrantClient(":memory:")
+    client.create_collection("JIRA", vectors_config=VectorParams(size=16, distance=Distance.COSINE))
+    client.upsert("JIRA", points=[
+        PointStruct(id=i, vector=vector, payload={"summary": f"Ticket {i}", "description": text})
+        for i, (text, vector) in enumerate(zip(DOCUMENTS, embedder(DOCUMENTS, LEGACY_SPACE)))
+    ])
+    system = QdrantSystem(CLIENTS_FILE)
+    system.client = client
+    system.local_mirror = None
+    system.shared_cache = None
+    system.embedder = embedder
+    system.enrich_query_with_openai = lambda query: {"collections": ["JIRA"], "filters": {}}
+    return system
+
+
+def test_summary_fast_needs_no_model(system):
+    """Le format Summary-fast est produit localement, sans appel au modèle"""
+    system.create_completion = lambda *args, **kwargs: pytest.fail("synthèse par le modèle inattendue")
+    result = system.process_query("facture SAP bloquée", format_type="Summary-fast", deadline_ms=0)
+    assert result["format"] == "Summary-fast" and result["degradations"] == []
+    assert result["content"][0].startswith("- ") and "facture" in result["content"][0].lower()
+
+
+def test_summary_falls_back_when_model_unavailable(system):
+    """Modèle indisponible : le format Summary renvoie le résumé extractif au lieu d'une erreur"""
+    def unavailable(*args, **kwargs):
+        raise AdmissionRejected(30)
+
+    system.create_completion = unavailable
+    result = system.process_query("facture SAP bloquée", format_type="Summary", deadline_ms=0)
+    assert result["format"] == "Summary-fast"
+    assert result["degradations"] == [EXTRACTIVE_INSTEAD_OF_SYNTHESIS]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du formatage par lot des résultats de recherche
+"""
+
+import sys
+import os
+from datetime import datetime
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hit_formatter import format_hits, format_timestamp, render_detail, score_colors
+
+
+def test_score_colors():
+    """Les couleurs suivent les seuils 0.50 et 0.80, gris sans score"""
+    assert score_colors([0.95, 0.80, 0.79, 0.50, 0.2, None]) == ["green", "green", "orange", "orange", "red", "gray"]
+
+
+def test_format_timestamp_matches_datetime():
+    """Le cache de dates donne le même résultat que datetime.fromtimestamp"""
+    for ts in [1700000000, 1711846799, 1711846800, 1729980000.5]:
+        assert format_timestamp(ts) == datetime.fromtimestamp(ts).strftime('%d/%m/%Y')
+    assert format_timestamp("1700000000") == datetime.fromtimestamp(1700000000).strftime('%d/%m/%Y')
+    assert format_timestamp("N/A") == "N/A"
+
+
+def test_format_hits_and_render_detail():
+    """Un résultat Detail est rendu avec titre, score et métadonnées"""
+    payload = {"client": "AZERGO", "source_type": "JIRA", "summary": "Erreur facture",
+               "created": 1700000000, "updated": "N/A", "assignee": "Lei MIAO"}
+
+    hit = format_hits([(payload, 0.87654, 12)], "Detail")[0]
+
+    assert hit.point_id == 12
+    assert hit.color == "green"
+    assert hit.to_dict() == {
+        "client": "AZERGO", "source": "JIRA", "summary": "Erreur facture",
+        "created": format_timestamp(1700000000), "updated": "N/A", "assignee": "Lei MIAO",
+        "url": None, "score": 0.8765, "color": "green",
+    }
+    assert render_detail(hit) == (
+        "## Erreur facture\n\nScore de similarité : 0.8765\n\n---\n"
+        f"Créé le: {format_timestamp(1700000000)}\nMis à jour le: N/A\nAssigné à: Lei MIAO"
+    )
+
+
+def test_guide_keeps_full_content():
+    """Le format Guide conserve le contenu complet du payload"""
+    payload = {"summary": "Installer le module", "content": "Étape 1: télécharger", "comments": "OK"}
+
+    hit = format_hits([(payload, None, None)], "Guide")[0]
+
+    assert hit.content == "Installer le module\nÉtape 1: télécharger\nOK"
+    assert hit.color == "gray"
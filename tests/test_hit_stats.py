@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests des statistiques de résultats par collection
+"""
+
+import sys
+import os
+import random
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from hit_stats import HitStatistics
+
+COLLECTIONS = ["JIRA", "CONFLUENCE", "ZENDESK", "SAP"]
+
+
+def _trained_stats(exploration_rate=0.0):
+    stats = HitStatistics(useful_score=0.75, min_queries=5, exploration_rate=exploration_rate, rng=random.Random(3))
+    scopes = HitStatistics.scopes("AZERGO", "SAP")
+    for _ in range(10):
+        stats.record(scopes, "JIRA", [0.62], 40)
+        stats.record(scopes, "CONFLUENCE", [], 30)
+        stats.record(scopes, "ZENDESK", [0.91, 0.83], 50)
+        stats.record(scopes, "SAP", [0.78], 20)
+    return stats, scopes
+
+
+def test_collections_are_ordered_by_usefulness():
+    """Les collections utiles passent en tête, les inutiles sont ignorées"""
+    stats, scopes = _trained_stats()
+
+    ordered, skipped, exploring = stats.plan(scopes, COLLECTIONS)
+
+    assert not exploring
+    assert ordered == ["SAP", "ZENDESK"]
+    assert skipped == ["JIRA", "CONFLUENCE"]
+
+
+def test_unknown_scope_keeps_static_priority():
+    """Sans statistiques pour le client ni l'ERP, l'ordre statique est conservé"""
+    stats = HitStatistics(min_queries=5, exploration_rate=0.0)
+
+    ordered, skipped, _ = stats.plan(HitStatistics.scopes("ADVIGO", "NetSuite"), COLLECTIONS)
+
+    assert ordered == COLLECTIONS
+    assert skipped == []
+
+
+def test_exploration_queries_do_not_skip():
+    """Une requête d'exploration interroge aussi les collections ignorées"""
+    stats, scopes = _trained_stats(exploration_rate=1.0)
+
+    ordered, skipped, exploring = stats.plan(scopes, COLLECTIONS)
+
+    assert exploring
+    assert skipped == []
+    assert set(ordered) == set(COLLECTIONS)
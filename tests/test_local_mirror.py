@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du miroir local des collections (synchronisation et recherche NumPy)
+"""
+
+import sys
+import os
+import random
+import numpy as np
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (Distance, FieldCondition, Filter, MatchAny, MatchValue, PointStruct, Range,
+                                       VectorParams)
+
+from local_mirror import LocalMirror, sync_collection
+
+DIM = 32
+
+
+def _seeded_client(count=300):
+    """Client Qdrant en mémoire avec une collection de vecteurs aléatoires"""
+    rng = random.Random(7)
+    client = QdrantClient(":memory:")
+    client.create_collection("SAP", vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+    client.upsert("SAP", [
+        PointStruct(
+            id=i,
+            vector=[rng.uniform(-1, 1) for _ in range(DIM)],
+            payload={"client": "AZERGO" if i % 3 == 0 else "ADVIGO", "created": 1700000000 + i,
+                     "title": f"Document {i}", "jpg_descript": "description lourde",
+                     "content": f"Contenu du document {i}"}
+        )
+        for i in range(count)
+    ])
+    return client
+
+
+def test_mirror_search_matches_qdrant(tmp_path):
+    """Le miroir renvoie les mêmes résultats que Qdrant, filtres compris"""
+    client = _seeded_client()
+    assert sync_collection(client, "SAP", str(tmp_path)) == 300
+    mirror = LocalMirror(str(tmp_path))
+    query = [random.Random(1).uniform(-1, 1) for _ in range(DIM)]
+    query_filter = Filter(must=[
+        FieldCondition(key="client", match=MatchValue(value="AZERGO")),
+        FieldCondition(key="created", range=Range(gte=1700000100)),
+    ])
+
+    for flt in (None, query_filter):
+        expected = client.search("SAP", query_vector=query, query_filter=flt, limit=5)
+        local = mirror.search("SAP", query, flt, limit=5)
+
+        assert [hit.id for hit in expected] == [point_id for _, _, point_id in local]
+        for hit, (_, score, _) in zip(expected, local):
+            assert abs(hit.score - score) < 1e-4
+
+
+def test_mirror_keeps_compact_payloads(tmp_path):
+    """Les champs volumineux non utilisés ne sont pas copiés ; les textes sont stockés à part"""
+    sync_collection(_seeded_client(count=3), "SAP", str(tmp_path))
+
+    payload, _, point_id = LocalMirror(str(tmp_path)).search("SAP", [1.0] * DIM, limit=1)[0]
+
+    assert "jpg_descript" not in payload
+    assert payload["title"].startswith("Document")
+    assert payload["content"] == f"Contenu du document {point_id}"
+    assert b"Contenu" not in (tmp_path / "SAP" / "payloads.jsonl").read_bytes()
+
+
+def test_filter_columns_prefilter_rows(tmp_path):
+    """Les conditions sur les champs indexés sont évaluées sur les colonnes, sans décoder les payloads"""
+    sync_collection(_seeded_client(count=30), "SAP", str(tmp_path))
+    mirrored = LocalMirror(str(tmp_path)).get("SAP")
+    query_filter = Filter(
+        must=[FieldCondition(key="client", match=MatchAny(any=["AZERGO", "INCONNU"])),
+              FieldCondition(key="created", range=Range(gte=1700000010))],
+        must_not=[FieldCondition(key="client", match=MatchValue(value="ADVIGO"))]
+    )
+    rows = np.flatnonzero(mirrored.filter_mask(query_filter))
+    assert [mirrored.ids[row] for row in rows] == [i for i in range(10, 30) if i % 3 == 0]
+    assert mirrored.filter_mask(Filter(must=[FieldCondition(key="title", match=MatchValue(value="x"))])) is None
+
+    mirrored.payload = lambda row: pytest.fail("payload décodé pour une ligne écartée")
+    assert mirrored.search([1.0] * DIM, Filter(must=[FieldCondition(key="client", match=MatchValue(value="X"))])) == []
+
+
+def test_resync_reloads_collection(tmp_path):
+    """Une nouvelle synchronisation est prise en compte sans redémarrage"""
+    mirror = LocalMirror(str(tmp_path))
+    sync_collection(_seeded_client(count=3), "SAP", str(tmp_path))
+    first = mirror.get("SAP")
+    sync_collection(_seeded_client(count=5), "SAP", str(tmp_path))
+    # Dates de modification distinctes même sur un système de fichiers à faible résolution
+    os.utime(tmp_path / "SAP" / "meta.json", (first.mtime + 1, first.mtime + 1))
+    reloaded = mirror.get("SAP")
+    assert reloaded is not first and len(reloaded.ids) == 5
+    assert len(mirror.search("SAP", [1.0] * DIM, limit=10)) == 5
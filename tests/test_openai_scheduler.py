@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests de l'ordonnanceur des appels OpenAI (quota, priorités, refus anticipé)
+"""
+
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from deadline import request_deadline
+from openai_scheduler import BATCH, AdmissionRejected, DeadlineRejected, OpenAIScheduler, openai_priority
+
+
+def test_submit_consumes_request_and_token_budget():
+    """Chaque appel consomme une requête et ses tokens estimés"""
+    scheduler = OpenAIScheduler(requests_per_minute=60, tokens_per_minute=6000)
+    assert scheduler.submit(lambda: "ok", estimated_tokens=1000) == "ok"
+    stats = scheduler.stats()
+    assert stats["admitted"] == 1
+    assert stats["available_requests"] == pytest.approx(59, abs=0.5)
+    assert stats["available_tokens"] == pytest.approx(5000, abs=10)
+
+
+def test_actual_usage_corrects_estimate():
+    """La consommation réelle renvoyée par l'API remplace l'estimation"""
+    scheduler = OpenAIScheduler(requests_per_minute=60, tokens_per_minute=6000)
+    response = SimpleNamespace(usage=SimpleNamespace(total_tokens=200))
+    scheduler.submit(lambda: response, estimated_tokens=1000)
+    assert scheduler.stats()["available_tokens"] == pytest.approx(5800, abs=10)
+
+
+def test_interactive_call_rejected_when_wait_too_long():
+    """Une recherche interactive est refusée avec un délai Retry-After si le quota est épuisé"""
+    scheduler = OpenAIScheduler(requests_per_minute=60, tokens_per_minute=600, max_wait=1.0)
+    scheduler.submit(lambda: "ok", estimated_tokens=600)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        scheduler.submit(lambda: "ok", estimated_tokens=300)
+    assert excinfo.value.retry_after >= 29
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_wait_is_capped_by_request_deadline():
+    """L'attente admise est ramenée au budget restant de la requête"""
+    scheduler = OpenAIScheduler(requests_per_minute=6000, tokens_per_minute=6000, max_wait=10.0)
+    scheduler.submit(lambda: "ok", estimated_tokens=6000)
+
+    # Environ 3 s d'attente : admise sans échéance, refusée avec 1 s de budget
+    with request_deadline(1000), pytest.raises(DeadlineRejected):
+        scheduler.submit(lambda: "ok", estimated_tokens=300)
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_batch_call_waits_instead_of_being_rejected():
+    """Un appel par lot attend la recharge du quota au lieu d'être refusé"""
+    scheduler = OpenAIScheduler(requests_per_minute=6000, tokens_per_minute=6000, max_wait=0.0)
+    scheduler.submit(lambda: "ok", estimated_tokens=6000)
+
+    start = time.monotonic()
+    with openai_priority(BATCH):
+        assert scheduler.submit(lambda: "ok", estimated_tokens=20) == "ok"
+    assert time.monotonic() - start >= 0.15
+
+
+def test_full_queue_rejects_calls():
+    """Au-delà de la taille maximale de la file, les appels sont refusés"""
+    scheduler = OpenAIScheduler(requests_per_minute=60, tokens_per_minute=60000, max_queue=0)
+    with pytest.raises(AdmissionRejected):
+        scheduler.submit(lambda: "ok", estimated_tokens=10)
+
+
+def test_interactive_calls_served_before_batch():
+    """Les appels interactifs en attente passent devant les appels par lot"""
+    scheduler = OpenAIScheduler(requests_per_minute=600, tokens_per_minute=60000, max_wait=5.0)
+    # Quota de requêtes épuisé : un appel toutes les 0,1 s
+    scheduler.requests.available = 0.0
+    order = []
+
+    def batch():
+        with openai_priority(BATCH):
+            scheduler.submit(lambda: order.append("batch"), estimated_tokens=10)
+
+    def interactive():
+        scheduler.submit(lambda: order.append("interactive"), estimated_tokens=10)
+
+    first = threading.Thread(target=batch)
+    first.start()
+    time.sleep(0.02)
+    threads = [threading.Thread(target=batch), threading.Thread(target=interactive)]
+    threads[0].start()
+    time.sleep(0.02)
+    threads[1].start()
+    for thread in [first] + threads:
+        thread.join()
+
+    # L'appel interactif, arrivé en dernier, passe devant les deux appels par lot en attente
+    assert order == ["interactive", "batch", "batch"]
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests des curseurs de pagination de la recherche sans embedding
+"""
+
+import sys
+import os
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Le client OpenAI est créé à l'import du module, aucune requête n'est envoyée ici
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from query_system import MAX_QUERY_LIMIT, InvalidCursorError, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    """Le curseur restitue l'état de pagination, filtres compris"""
+    state = {
+        "collections": ["JIRA", "ZENDESK"],
+        "filters": {"client": "AZERGO", "date": {"gte": 1700000000}},
+        "limit": 5,
+        "index": 1,
+        "offset": "5f0c3a9e-1d2b-4c3d-9e8f-0a1b2c3d4e5f",
+    }
+
+    assert decode_cursor(encode_cursor(state)) == state
+
+
+def test_cursor_limit_is_clamped():
+    """Une limite excessive est ramenée à MAX_QUERY_LIMIT"""
+    state = {"collections": ["JIRA"], "filters": {}, "limit": 10000, "index": 0, "offset": 12}
+    assert decode_cursor(encode_cursor(state))["limit"] == MAX_QUERY_LIMIT
+
+
+def _forged_cursor():
+    """Curseur valide dont le contenu est remplacé sans nouvelle signature"""
+    valid = encode_cursor({"collections": ["JIRA"], "filters": {}, "limit": 5, "index": 0, "offset": 12})
+    forged = encode_cursor({"collections": ["JIRA"], "filters": {"client": "AUTRE"}, "limit": 5, "index": 0,
+                            "offset": 12})
+    return forged.split(".")[0] + "." + valid.split(".")[1]
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "pas-un-curseur",
+    encode_cursor({"collections": "JIRA"}),
+    encode_cursor({"collections": ["JIRA", "SECRETS"], "filters": {}, "limit": 5, "index": 0, "offset": 1}),
+    encode_cursor({"collections": ["JIRA"], "filters": {}, "limit": 5, "index": 1, "offset": 1}),
+    encode_cursor({"collections": ["JIRA"], "filters": {}, "limit": 5, "index": 0, "offset": 1}).split(".")[0],
+    _forged_cursor(),
+])
+def test_invalid_cursor(cursor):
+    """Un curseur altéré, non signé ou hors des collections connues est rejeté"""
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
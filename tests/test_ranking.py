@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du classement similarité + fraîcheur (formule de l'API query de Qdrant)
+"""
+
+import sys
+import os
+from time import time
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+import ranking
+from ranking import (blend_recency, created_timestamp, half_life_days, recency_enabled, recency_query,
+                     similarity_score)
+
+DAY = 86400
+
+
+@pytest.fixture
+def collection():
+    now = int(time())
+    client = QdrantClient(":memory:")
+    client.create_collection("JIRA", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    client.upsert("JIRA", points=[
+        PointStruct(id=1, vector=[1.0, 0.0], payload={"created": now - 720 * DAY}),
+        PointStruct(id=2, vector=[0.9, 0.3], payload={"created": now - 2 * DAY}),
+        PointStruct(id=3, vector=[0.95, 0.1], payload={}),
+    ])
+    return client, now
+
+
+def test_fresh_document_outranks_slightly_closer_old_one(collection):
+    """Qdrant renvoie directement le classement combiné, le document récent en tête"""
+    client, now = collection
+    points = client.query_points("JIRA", **recency_query("JIRA", [1.0, 0.0], None, 3, now), limit=3,
+                                 with_payload=True).points
+    assert [p.id for p in points] == [2, 1, 3]
+
+
+def test_local_blend_matches_qdrant_formula(collection):
+    """Le calcul local (miroir) donne les mêmes scores que la formule Qdrant"""
+    client, now = collection
+    similarities = {p.id: p.score for p in client.query_points("JIRA", query=[1.0, 0.0], limit=3).points}
+    for point in client.query_points("JIRA", **recency_query("JIRA", [1.0, 0.0], None, 3, now), limit=3,
+                                     with_payload=True).points:
+        expected = blend_recency("JIRA", similarities[point.id], point.payload, now)
+        assert point.score == pytest.approx(expected, abs=1e-4)
+
+
+def test_similarity_recovered_from_combined_score(collection, monkeypatch):
+    """La similarité seule est retrouvée à partir du score combiné renvoyé par Qdrant"""
+    monkeypatch.setattr(ranking, "RECENCY_RANKING", True)
+    client, now = collection
+    similarities = {p.id: p.score for p in client.query_points("JIRA", query=[1.0, 0.0], limit=3).points}
+    for point in client.query_points("JIRA", **recency_query("JIRA", [1.0, 0.0], None, 3, now), limit=3,
+                                     with_payload=True).points:
+        assert similarity_score("JIRA", point.score, point.payload, now) == pytest.approx(similarities[point.id],
+                                                                                           abs=1e-4)
+    # Sans classement par fraîcheur, le score est déjà la similarité
+    monkeypatch.setattr(ranking, "RECENCY_RANKING", False)
+    assert similarity_score("JIRA", 0.42, {"created": now}, now) == 0.42
+
+
+def test_half_life_per_collection(monkeypatch):
+    """Chaque collection a sa demi-vie ; 0 désactive la fraîcheur"""
+    monkeypatch.setattr(ranking, "RECENCY_RANKING", True)
+    monkeypatch.setenv("RECENCY_HALF_LIFE_DAYS_SAP", "0")
+    monkeypatch.setenv("RECENCY_HALF_LIFE_DAYS_ZENDESK", "30")
+    assert half_life_days("ZENDESK") == 30
+    assert half_life_days("JIRA") == ranking.DEFAULT_HALF_LIFE_DAYS
+    assert recency_enabled("JIRA") and not recency_enabled("SAP")
+    # Un document d'une demi-vie conserve la moitié de son bonus de fraîcheur
+    now = 1_000 * DAY
+    assert blend_recency("ZENDESK", 0.0, {"created": now - 30 * DAY}, now) == pytest.approx(ranking.RECENCY_WEIGHT / 2)
+
+
+def test_created_timestamp_for_chronological_sort():
+    """Le tri chronologique utilise le timestamp brut, pas la date formatée"""
+    payloads = [{"created": 1700000000}, {"created": "1710000000"}, {"created": "15/03/2024"}, {}]
+    assert [created_timestamp(p) for p in payloads] == [1700000000, 1710000000, 0, 0]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests des outils de résilience (nouvelles tentatives, requêtes dupliquées, disjoncteurs)
+"""
+
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+from deadline import request_deadline, retry_allowed
+from resilience import (CircuitBreaker, HedgePool, LatencyTracker, hedged_call, is_client_error, is_transient_error,
+                        retry_call)
+
+
+def http_error(status):
+    return UnexpectedResponse(status, "", b"", httpx.Headers())
+
+
+def test_retry_call_retries_then_succeeds():
+    """Les erreurs transitoires sont absorbées par les nouvelles tentatives"""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("coupure réseau")
+        return "ok"
+
+    assert retry_call(flaky, attempts=3, base_delay=0.001) == "ok"
+    assert len(attempts) == 3
+
+
+def test_retry_call_does_not_retry_other_errors():
+    """Seules les exceptions listées donnent lieu à une nouvelle tentative"""
+    attempts = []
+
+    def invalid():
+        attempts.append(1)
+        raise ValueError("requête invalide")
+
+    with pytest.raises(ValueError):
+        retry_call(invalid, attempts=3, base_delay=0.001, retry_on=(ConnectionError,))
+    assert len(attempts) == 1
+
+
+def test_retry_call_stops_at_deadline():
+    """Aucune nouvelle tentative une fois l'échéance de la requête dépassée"""
+    attempts = []
+
+    def down():
+        attempts.append(1)
+        raise ConnectionError("coupure réseau")
+
+    with request_deadline(1), pytest.raises(ConnectionError):
+        retry_call(down, attempts=3, base_delay=0.001, before_retry=retry_allowed)
+    assert len(attempts) == 1
+
+
+def test_qdrant_error_classification():
+    """Seules les coupures réseau et les réponses 5xx sont retentées ; un 4xx est propre à la requête"""
+    assert is_transient_error(ConnectionError("coupure"))
+    assert is_transient_error(http_error(503))
+    assert is_transient_error(ResponseHandlingException(httpx.ConnectError("refusé")))
+    assert not is_transient_error(TimeoutError("délai"))
+    assert not is_transient_error(ResponseHandlingException(httpx.ReadTimeout("délai")))
+    assert not is_transient_error(http_error(400))
+    assert is_client_error(http_error(400)) and not is_client_error(http_error(429))
+
+    attempts = []
+
+    def timeout():
+        attempts.append(1)
+        raise TimeoutError("délai")
+
+    with pytest.raises(TimeoutError):
+        retry_call(timeout, attempts=3, base_delay=0.001, retry_if=is_transient_error)
+    assert len(attempts) == 1
+
+
+def test_hedge_pool_is_bounded():
+    """Pool de duplication plein : la requête principale est attendue seule"""
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=4) as executor, ThreadPoolExecutor(max_workers=1) as hedges:
+        pool = HedgePool(hedges, 1)
+        assert pool.try_submit(release.wait) is not None
+        assert pool.try_submit(release.wait) is None
+        assert hedged_call(executor, lambda: time.sleep(0.1) or "principale", 0.01, 1.0, pool) == "principale"
+        assert pool.skipped == 2
+        release.set()
+
+
+def test_hedged_call_returns_fastest_response():
+    """Une requête bloquée est doublée et la réponse la plus rapide est retenue"""
+    calls = []
+    lock = threading.Lock()
+
+    def search():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        time.sleep(1.0 if first else 0.01)
+        return "lent" if first else "rapide"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        start = time.monotonic()
+        assert hedged_call(executor, search, hedge_delay=0.05, timeout=2.0) == "rapide"
+        assert time.monotonic() - start < 0.5
+
+
+def test_hedged_call_timeout():
+    """Sans réponse dans le délai, une TimeoutError est levée"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(TimeoutError):
+            hedged_call(executor, lambda: time.sleep(0.5), hedge_delay=None, timeout=0.05)
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Le disjoncteur s'ouvre après des échecs répétés puis autorise un appel d'essai"""
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05, slow_call_ms=100)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success(latency_ms=500)  # Appel trop lent : compté comme un échec
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # Un seul appel d'essai à la fois
+    breaker.record_success(latency_ms=10)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_ignores_request_errors():
+    """Une erreur propre à la requête libère l'appel d'essai sans rouvrir le disjoncteur"""
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_ignored()
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.allow()
+
+
+def test_latency_tracker_percentile():
+    """Le percentile est calculé sur les latences récentes"""
+    tracker = LatencyTracker(window=100)
+    for latency in range(1, 101):
+        tracker.record(latency)
+
+    assert tracker.percentile(50) == pytest.approx(50.5)
+    assert len(tracker) == 100
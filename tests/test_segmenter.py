@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du découpage des documents en étapes (format Guide)
+"""
+
+import sys
+import os
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from segmenter import BULLET, NUMBERED, PARAGRAPH, SegmentCache, extract_steps, get_segmentation, segment
+import segmenter
+
+
+def test_numbered_and_named_steps():
+    """Étapes numérotées, « Étape n » et « Step n » sont reconnues, marqueur retiré"""
+    assert extract_steps("1. Ouvrir SAP\n2) Aller dans Paramètres\n3. Valider") == [
+        "Ouvrir SAP", "Aller dans Paramètres", "Valider"]
+    assert extract_steps("Étape 1 : Exporter\nEtape 2 - Importer") == ["Exporter", "Importer"]
+    assert extract_steps("Step 1: Login\nstep 2. Logout") == ["Login", "Logout"]
+
+
+def test_numbers_inside_text_are_not_steps():
+    """Un nombre décimal en début de ligne n'est pas un marqueur d'étape"""
+    assert extract_steps("1.5 Go de données à migrer") == []
+
+
+def test_step_continues_on_following_lines():
+    """Une étape se prolonge sur les lignes suivantes, et sur une ligne indentée après une ligne vide"""
+    text = "Procédure :\n1. Ouvrir le menu\nFichier > Export\n\n   choisir CSV\n\nFin de la procédure"
+    segmentation = segment(text)
+    assert segmentation.kind == NUMBERED
+    assert segmentation.steps(text) == ["Ouvrir le menu Fichier > Export choisir CSV"]
+
+
+def test_bullets_and_paragraphs():
+    """Les puces (au moins deux), puis les paragraphes servent d'étapes à défaut de numéros"""
+    assert segment("- Sauvegarder\n- Redémarrer").kind == BULLET
+    assert segment("- Une seule puce").kind is None
+    text = "Premier bloc\n\nDeuxième bloc\n\nTroisième bloc"
+    assert segment(text).kind == PARAGRAPH
+    assert extract_steps(text) == ["Premier bloc", "Deuxième bloc", "Troisième bloc"]
+
+
+def test_passages_keep_surrounding_text():
+    """Chaque étape devient un paragraphe, le texte hors étapes reste à sa place"""
+    text = "Introduction\n1. Ouvrir\n2. Fermer\n\nConclusion"
+    assert get_segmentation(text).passages(text) == (
+        "Introduction\n\nÉtape 1 : Ouvrir\n\nÉtape 2 : Fermer\n\nConclusion")
+
+
+def test_cache_by_point_and_content_hash(monkeypatch):
+    """Un document déjà découpé n'est plus analysé ; un nouveau content_hash invalide l'entrée"""
+    cache = SegmentCache(max_size=2)
+    monkeypatch.setattr(segmenter, "segment_cache", cache)
+    text = "1. Ouvrir\n2. Fermer"
+    first = get_segmentation(text, "p1", "h1")
+    assert get_segmentation(text, "p1", "h1") is first
+    assert get_segmentation(text, "p1", "h2") is not first
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 2}
+    get_segmentation(text, "p2")
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du partitionnement par client (routage vers le shard du client et migration)
+"""
+
+import sys
+import os
+import threading
+from types import SimpleNamespace
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Le client OpenAI est créé à l'import du module, aucune requête n'est envoyée ici
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (CreateAlias, CreateAliasOperation, Distance, FieldCondition, Filter, MatchAny,
+                                       MatchValue, PointStruct, Range, VectorParams)
+
+from client_registry import ClientRegistry
+from copy_sync import CopySyncChecker
+from embedding_migration import LEGACY_SPACE, StubEmbedder
+from query_system import QdrantSystem
+from sharding import DEFAULT_SHARD_KEY, ShardRouter, filter_client_values, migrate_collection
+
+CLIENTS_FILE = os.path.join(os.path.dirname(__file__), "..", "ListeClients.csv")
+HEADER = "Client;Consultant;Statut;JIRA;ZENDESK;CONFLUENCE;ERP\n"
+
+
+@pytest.fixture
+def registry(tmp_path):
+    path = tmp_path / "clients.csv"
+    path.write_text(HEADER + "FORACO;;;FORACO - Support;Foraco AU;;SAP\nADVIGO;;;;ADVIGO;;NetSuite\n",
+                    encoding="utf-8-sig")
+    return ClientRegistry(str(path), reload_interval=0)
+
+
+class FakeCluster:
+    """Client Qdrant minimal exposant les clés de shard d'une collection"""
+
+    def __init__(self, keys):
+        self.calls = 0
+        shards = [SimpleNamespace(shard_key=key) for key in keys]
+
+        def cluster_info(name):
+            self.calls += 1
+            return SimpleNamespace(result=SimpleNamespace(local_shards=shards, remote_shards=[]))
+
+        self.http = SimpleNamespace(distributed_api=SimpleNamespace(collection_cluster_info=cluster_info))
+
+    def get_aliases(self):
+        return SimpleNamespace(aliases=[])
+
+
+def client_filter(*values):
+    return Filter(must=[FieldCondition(key="client", match=MatchAny(any=list(values))),
+                        FieldCondition(key="created", range=Range(gte=0))])
+
+
+def test_filter_client_values():
+    """Seule une condition client de premier niveau restreint les shards"""
+    assert filter_client_values(client_filter("FORACO", "Foraco AU")) == ["FORACO", "Foraco AU"]
+    assert filter_client_values(Filter(must=[FieldCondition(key="client", match=MatchValue(value="X"))])) == ["X"]
+    assert filter_client_values(Filter(should=[FieldCondition(key="client", match=MatchValue(value="X"))])) is None
+    assert filter_client_values(None) is None
+
+
+def test_route_to_client_shard(registry):
+    """Une recherche filtrée sur un client n'interroge que son shard"""
+    cluster = FakeCluster(["FORACO", "ADVIGO", DEFAULT_SHARD_KEY])
+    router = ShardRouter(cluster, registry, collections=["JIRA"])
+    assert router.route("JIRA", client_filter("FORACO", "FORACO - Support")) == ("JIRA_BY_CLIENT", "FORACO")
+    assert router.route("JIRA", client_filter("Inconnu")) == ("JIRA_BY_CLIENT", DEFAULT_SHARD_KEY)
+    assert router.route("JIRA", None) == ("JIRA_BY_CLIENT", None)
+    # Collection non partitionnée : recherche globale sur la collection d'origine
+    assert router.route("SAP", client_filter("FORACO")) == ("SAP", None)
+    assert router.stats == {"routed": 2, "global": 1, "stale": 0}
+    assert cluster.calls == 1
+
+
+def test_client_added_after_migration_uses_common_shard(registry):
+    """Un client sans shard dédié est cherché dans le shard commun"""
+    router = ShardRouter(FakeCluster(["FORACO", DEFAULT_SHARD_KEY]), registry, collections=["ZENDESK"])
+    assert router.route("ZENDESK", client_filter("ADVIGO")) == ("ZENDESK_BY_CLIENT", DEFAULT_SHARD_KEY)
+    assert router.route("ZENDESK", client_filter("ADVIGO", "FORACO"))[1] == ["FORACO", DEFAULT_SHARD_KEY]
+
+
+def test_unreadable_shard_keys_fall_back_to_global(registry):
+    """Sans liste des clés de shard, la recherche reste globale plutôt que d'échouer"""
+    def broken(name):
+        raise ConnectionError("cluster indisponible")
+
+    cluster = SimpleNamespace(http=SimpleNamespace(distributed_api=SimpleNamespace(collection_cluster_info=broken)))
+    router = ShardRouter(cluster, registry, collections=["JIRA"])
+    assert router.route("JIRA", client_filter("FORACO")) == ("JIRA_BY_CLIENT", None)
+
+
+def test_stale_copy_routes_to_source(registry):
+    """Une copie en retard sur l'ingestion n'est pas interrogée : la collection d'origine l'est"""
+    cluster = FakeCluster(["FORACO", DEFAULT_SHARD_KEY])
+    counts = {"JIRA": 10, "JIRA_BY_CLIENT": 9}
+    cluster.count = lambda name, exact: SimpleNamespace(count=counts[name])
+    copy_sync = CopySyncChecker(ttl=0)
+    router = ShardRouter(cluster, registry, collections=["JIRA"], copy_sync=copy_sync)
+    assert router.route("JIRA", client_filter("FORACO")) == ("JIRA", None)
+    assert router.stats["stale"] == 1 and copy_sync.snapshot() == {"JIRA_BY_CLIENT": 1}
+
+    counts["JIRA_BY_CLIENT"] = 10
+    assert router.route("JIRA", client_filter("FORACO")) == ("JIRA_BY_CLIENT", "FORACO")
+
+
+def test_copy_sync_refresh_is_single_flight():
+    """Pendant qu'une requête recompte les points, les autres gardent le dernier écart sans recompter"""
+    started, release = threading.Event(), threading.Event()
+    counts = {"JIRA": 10, "JIRA_BY_CLIENT": 9}
+    calls = []
+
+    def count(name, exact):
+        calls.append(name)
+        if len(calls) > 2:
+            started.set()
+            release.wait(5)
+        return SimpleNamespace(count=counts[name])
+
+    client = SimpleNamespace(count=count)
+    copy_sync = CopySyncChecker(ttl=0)
+    assert copy_sync.lag(client, "JIRA", "JIRA_BY_CLIENT") == 1
+
+    counts["JIRA_BY_CLIENT"] = 10
+    refresh = threading.Thread(target=copy_sync.lag, args=(client, "JIRA", "JIRA_BY_CLIENT"))
+    refresh.start()
+    assert started.wait(5)
+    # Comparaison en cours : écart précédent, aucun comptage supplémentaire
+    assert copy_sync.lag(client, "JIRA", "JIRA_BY_CLIENT") == 1 and len(calls) == 3
+    release.set()
+    refresh.join()
+    assert copy_sync.snapshot() == {"JIRA_BY_CLIENT": 0}
+
+
+class LocalCluster(QdrantClient):
+    """Qdrant local (recherches et alias réels) ; l'API du cluster, absente en local, ne connaît que les collections"""
+
+    def __init__(self, keys):
+        super().__init__(":memory:")
+        self.cluster_calls = []
+        shards = [SimpleNamespace(shard_key=key) for key in keys]
+
+        def cluster_info(name):
+            self.cluster_calls.append(name)
+            if name not in {c.name for c in self.get_collections().collections}:
+                raise ValueError(f"Collection {name} not found")
+            return SimpleNamespace(result=SimpleNamespace(local_shards=shards, remote_shards=[]))
+
+        self._cluster = SimpleNamespace(distributed_api=SimpleNamespace(collection_cluster_info=cluster_info))
+
+    @property
+    def http(self):
+        return self._cluster
+
+
+def test_search_through_alias_with_shard_selector(registry):
+    """Recherche réelle dans la copie désignée par l'alias, limitée au shard du client"""
+    embedder = StubEmbedder(default_dimensions=16)
+    client = LocalCluster(["FORACO", DEFAULT_SHARD_KEY])
+    texts = ["Facture SAP bloquée", "Connexion impossible"]
+    for name, origin in (("JIRA", "source"), ("JIRA_BY_CLIENT_1", "copie")):
+        client.create_collection(name, vectors_config=VectorParams(size=16, distance=Distance.COSINE))
+        client.upsert(name, points=[
+            PointStruct(id=i, vector=vector, payload={"summary": text, "client": "FORACO", "created": 1700000000, "origin": origin})
+            for i, (text, vector) in enumerate(zip(texts, embedder(texts, LEGACY_SPACE)))
+        ])
+    client.update_collection_aliases(change_aliases_operations=[
+        CreateAliasOperation(create_alias=CreateAlias(collection_name="JIRA_BY_CLIENT_1", alias_name="JIRA_BY_CLIENT"))
+    ])
+
+    system = QdrantSystem(CLIENTS_FILE)
+    system.client = client
+    system.local_mirror = None
+    system.embedder = embedder
+    system.shard_router = ShardRouter(client, registry, collections=["JIRA"], copy_sync=CopySyncChecker())
+
+    hits = system.search_in_collection("JIRA", "Facture SAP", limit=1, filters=client_filter("FORACO"))
+    assert hits[0][0]["origin"] == "copie" and hits[0][2] == 0
+    # Les clés de shard sont lues sur la collection versionnée, pas sur l'alias
+    assert client.cluster_calls == ["JIRA_BY_CLIENT_1"]
+    assert system.shard_router.stats["routed"] == 1
+
+
+class FakeQdrant:
+    """Client Qdrant minimal enregistrant la migration"""
+
+    def __init__(self, points, alias_target=None):
+        self.points = points
+        self.shard_keys = []
+        self.upserts = {}
+        self.indexes = []
+        self.aliases = {"JIRA_BY_CLIENT": alias_target} if alias_target else {}
+        self.deleted = []
+        self.fail = False
+
+    def get_collection(self, name):
+        return SimpleNamespace(config=SimpleNamespace(params=SimpleNamespace(vectors="VECTORS")),
+                               payload_schema={"client": SimpleNamespace(data_type="keyword")})
+
+    def collection_exists(self, name):
+        return False
+
+    def delete_collection(self, name):
+        self.deleted.append(name)
+
+    def get_aliases(self):
+        return SimpleNamespace(aliases=[SimpleNamespace(alias_name=alias, collection_name=name)
+                                        for alias, name in self.aliases.items()])
+
+    def update_collection_aliases(self, change_aliases_operations):
+        for operation in change_aliases_operations:
+            if hasattr(operation, "create_alias"):
+                self.aliases[operation.create_alias.alias_name] = operation.create_alias.collection_name
+
+    def create_collection(self, name, vectors_config, sharding_method, shard_number):
+        self.created = (name, vectors_config, sharding_method)
+
+    def create_payload_index(self, name, field, schema):
+        self.indexes.append((field, schema))
+
+    def scroll(self, collection_name, limit, offset, with_payload, with_vectors):
+        start = offset or 0
+        batch = self.points[start:start + limit]
+        return batch, (start + limit if start + limit < len(self.points) else None)
+
+    def create_shard_key(self, name, key):
+        self.shard_keys.append(key)
+
+    def upsert(self, name, points, shard_key_selector):
+        if self.fail:
+            raise ConnectionError("Qdrant indisponible")
+        self.upserts.setdefault(shard_key_selector, []).extend(p.id for p in points)
+
+
+def test_migration_places_points_in_client_shards(registry):
+    """Chaque point est copié dans le shard de son client canonique, les autres dans le shard commun"""
+    def point(i, client):
+        return SimpleNamespace(id=i, vector=[1.0, 0.0], payload={"client": client} if client else {})
+
+    qdrant = FakeQdrant([point(1, "FORACO - Support"), point(2, "Foraco AU"), point(3, "ADVIGO"),
+                         point(4, "Inconnu"), point(5, None)], alias_target="JIRA_BY_CLIENT_1700000000")
+    counts = migrate_collection(qdrant, registry, "JIRA")
+    assert counts == {"FORACO": 2, "ADVIGO": 1, DEFAULT_SHARD_KEY: 2}
+    assert qdrant.created[0].startswith("JIRA_BY_CLIENT_") and qdrant.created[1] == "VECTORS"
+    # L'alias désigne la nouvelle copie, la précédente est supprimée après la bascule
+    assert qdrant.aliases == {"JIRA_BY_CLIENT": qdrant.created[0]}
+    assert qdrant.deleted == ["JIRA_BY_CLIENT_1700000000"]
+    assert sorted(qdrant.shard_keys) == sorted(counts)
+    assert qdrant.upserts["FORACO"] == [1, 2]
+    assert qdrant.indexes == [("client", "keyword")]
+
+
+def test_failed_migration_keeps_previous_copy(registry):
+    """Une reconstruction en échec supprime sa copie partielle et laisse l'alias sur la précédente"""
+    qdrant = FakeQdrant([SimpleNamespace(id=1, vector=[1.0], payload={"client": "ADVIGO"})],
+                        alias_target="JIRA_BY_CLIENT_1700000000")
+    qdrant.fail = True
+    with pytest.raises(ConnectionError):
+        migrate_collection(qdrant, registry, "JIRA")
+    assert qdrant.aliases == {"JIRA_BY_CLIENT": "JIRA_BY_CLIENT_1700000000"}
+    assert qdrant.deleted == [qdrant.created[0]]
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests du cache partagé entre processus (SQLite en mode WAL)
+"""
+
+import sys
+import os
+import multiprocessing
+import time
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from shared_cache import SharedCache
+
+
+def test_set_then_get(tmp_path):
+    """Une entrée enregistrée est relue à l'identique"""
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("embedding", "texte", b"\x00\x01\x02", ttl=60)
+    assert cache.get("embedding", "texte") == b"\x00\x01\x02"
+    assert cache.get("embedding", "autre") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_namespaces_are_separate(tmp_path):
+    """Une même clé dans deux espaces de noms désigne deux entrées"""
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set_json("enrichment", "clé", {"filters": {}}, ttl=60)
+    assert cache.get_json("result", "clé") is None
+    assert cache.get_json("enrichment", "clé") == {"filters": {}}
+
+
+def test_expired_entries_are_ignored(tmp_path):
+    """Une entrée expirée n'est plus renvoyée"""
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("result", "clé", b"valeur", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("result", "clé") is None
+
+
+def _write_from_child(path):
+    SharedCache(path).set_json("result", "requête", ["réponse"], ttl=60)
+
+
+def test_entries_shared_between_processes(tmp_path):
+    """Une entrée écrite par un autre processus est visible immédiatement"""
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SharedCache(path)
+    assert cache.get_json("result", "requête") is None
+
+    process = multiprocessing.get_context("spawn").Process(target=_write_from_child, args=(path,))
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 0
+    assert cache.get_json("result", "requête") == ["réponse"]
+
+
+def test_sqlite_errors_are_treated_as_misses(tmp_path):
+    """Une base illisible ne fait pas échouer les requêtes"""
+    path = tmp_path / "cache.sqlite3"
+    path.write_bytes(b"ceci n'est pas une base SQLite" * 100)
+    cache = SharedCache(str(path))
+    assert cache.get("embedding", "texte") is None
+    cache.set("embedding", "texte", b"valeur", ttl=60)
+    assert cache.stats()["errors"] >= 1
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests de l'exécution spéculative (réutilisation des recherches lancées pendant l'enrichissement)
+"""
+
+import sys
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Le client OpenAI est créé à l'import du module, aucune requête n'est envoyée ici
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, FieldCondition, Filter, MatchAny, PointStruct, VectorParams
+
+from embedding_migration import LEGACY_SPACE, StubEmbedder
+from hit_stats import HitStatistics
+from query_system import QdrantSystem
+
+from speculation import HIT, MISS, PARTIAL, Speculation, submit_in_context
+
+
+def done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def client_filter(*aliases):
+    return Filter(must=[FieldCondition(key="client", match=MatchAny(any=list(aliases)))])
+
+
+def make_speculation():
+    return Speculation(done([0.1, 0.2]), {
+        "JIRA": (client_filter("AZERGO", "AZERGO - Support"), 8, done(([], 12.0))),
+        "ZENDESK": (client_filter("AZERGO", "Azergo"), 8, done(([], 15.0))),
+    })
+
+
+def test_matching_searches_are_reused():
+    """Même collection, même filtre et assez de résultats : la recherche est réutilisée"""
+    speculation = make_speculation()
+    assert speculation.query_vector() == [0.1, 0.2]
+    assert speculation.take("JIRA", client_filter("AZERGO", "AZERGO - Support"), 8).result() == ([], 12.0)
+    assert speculation.take("ZENDESK", client_filter("AZERGO", "Azergo"), 5) is not None
+    assert speculation.status == HIT
+
+
+def test_different_filter_or_larger_limit_is_redone():
+    """Un filtre différent ou une limite plus grande impose une nouvelle recherche"""
+    speculation = make_speculation()
+    speculation.query_vector()
+    assert speculation.take("JIRA", None, 8) is None
+    assert speculation.take("ZENDESK", client_filter("AZERGO", "Azergo"), 20) is None
+    assert speculation.take("SAP", None, 8) is None
+    assert speculation.redone == ["JIRA", "ZENDESK", "SAP"]
+    # L'embedding a tout de même servi
+    assert speculation.status == PARTIAL
+
+
+def test_nothing_reused_is_a_miss():
+    """Sans recherche vectorielle, la spéculation est entièrement perdue"""
+    speculation = make_speculation()
+    speculation.discard()
+    assert speculation.searches == {}
+    assert speculation.status == MISS
+
+
+def test_failed_speculative_search_is_redone():
+    """Une recherche spéculative en échec est refaite au lieu d'écarter la collection"""
+    embedder = StubEmbedder(default_dimensions=16)
+    client = QdrantClient(":memory:")
+    client.create_collection("JIRA", vectors_config=VectorParams(size=16, distance=Distance.COSINE))
+    client.upsert("JIRA", points=[PointStruct(id=1, vector=embedder(["Facture bloquée"], LEGACY_SPACE)[0],
+                                              payload={"summary": "Facture bloquée"})])
+    system = QdrantSystem(os.path.join(os.path.dirname(__file__), "..", "ListeClients.csv"))
+    system.client = client
+    system.local_mirror = None
+    system.embedder = embedder
+
+    failed = Future()
+    failed.set_exception(RuntimeError("embedding spéculatif en échec"))
+    speculation = Speculation(failed, {"JIRA": (None, 100, failed)})
+    hits, searched, unavailable = system._collect_vector_hits("facture", ["JIRA"], {"JIRA": None}, 5,
+                                                              HitStatistics.scopes(), speculation=speculation)
+    assert [point_id for _, _, point_id in hits] == [1]
+    assert searched == ["JIRA"] and unavailable == []
+    assert speculation.reused == [] and speculation.redone == ["JIRA"]
+
+
+def test_submit_in_context_propagates_context():
+    """Les tâches spéculatives voient le contexte de la requête (priorité OpenAI)"""
+    var = ContextVar("priority", default=0)
+    var.set(1)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert submit_in_context(executor, var.get).result() == 1
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests des statistiques par collection (count et facet Qdrant, sans lecture des documents)
+"""
+
+import sys
+import os
+from datetime import datetime
+import pytest
+# Ajoute le dossier parent (QdrantWeb) au path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Le client OpenAI est créé à l'import du module, aucune requête n'est envoyée ici
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+import query_system
+from query_system import QdrantSystem
+
+CLIENTS_FILE = os.path.join(os.path.dirname(__file__), "..", "ListeClients.csv")
+
+
+def timestamp(year, month, day=15):
+    return int(datetime(year, month, day).timestamp())
+
+
+@pytest.fixture
+def system():
+    system = QdrantSystem(CLIENTS_FILE)
+    client = QdrantClient(":memory:")
+    payloads = {
+        "JIRA": [("AZERGO", "open", timestamp(2024, 1)), ("AZERGO", "closed", timestamp(2024, 1)),
+                 ("AZERGO", "open", timestamp(2024, 3)), ("AUTRE", "open", timestamp(2024, 3))],
+        "ZENDESK": [("AZERGO", "open", timestamp(2024, 2))],
+    }
+    for collection_name, rows in payloads.items():
+        client.create_collection(collection_name, vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+        client.upsert(collection_name, points=[
+            PointStruct(id=i, vector=[1.0, 0.0], payload={"client": c, "status": status, "created": created})
+            for i, (c, status, created) in enumerate(rows)
+        ])
+    system.client = client
+    return system
+
+
+def test_month_ranges():
+    """Les mois sont contigus, fin exclue, y compris au changement d'année"""
+    ranges = QdrantSystem.month_ranges(timestamp(2023, 11, 20), timestamp(2024, 1, 2))
+    assert [label for label, _, _ in ranges] == ["2023-11", "2023-12", "2024-01"]
+    assert ranges[0][2] == ranges[1][1] == int(datetime(2023, 12, 1).timestamp())
+
+
+def test_counts_grouped_by_facet(system):
+    """Les comptages sont filtrés par client et regroupés par valeur, toutes collections confondues"""
+    stats = system.get_stats(["JIRA", "ZENDESK"], client_name="AZERGO", group_by="status")
+    assert stats["total"] == 4
+    assert stats["collections"]["JIRA"] == {"count": 3, "groups": {"open": 2, "closed": 1}}
+    assert stats["groups"] == {"open": 3, "closed": 1}
+    assert stats["unavailable"] == []
+
+
+def test_counts_grouped_by_month(system, monkeypatch):
+    """Le regroupement mensuel compte chaque mois de created, mois vides compris"""
+    monkeypatch.setattr("query_system.time", lambda: timestamp(2024, 3, 20))
+    stats = system.get_stats(["JIRA", "ZENDESK"], group_by="month", months=3)
+    assert stats["groups"] == {"2024-01": 2, "2024-02": 1, "2024-03": 2}
+    assert stats["collections"]["ZENDESK"]["groups"] == {"2024-01": 0, "2024-02": 1, "2024-03": 0}
+
+
+def test_month_count_is_bounded(system, monkeypatch):
+    """Le nombre de mois est ramené à 1..STATS_MAX_MONTHS"""
+    monkeypatch.setattr("query_system.time", lambda: timestamp(2024, 3, 20))
+    assert len(system.get_stats(["JIRA"], group_by="month", months=10000)["groups"]) == query_system.STATS_MAX_MONTHS
+    assert list(system.get_stats(["JIRA"], group_by="month", months=-5)["groups"]) == ["2024-03"]
+
+
+def test_missing_collection_is_reported(system):
+    """Une collection en erreur est signalée sans faire échouer les autres"""
+    stats = system.get_stats(["JIRA", "SAP"])
+    assert stats["total"] == 4
+    assert stats["unavailable"] == ["SAP"]
+
+
+def test_invalid_group_by(system):
+    """Un regroupement non prévu est refusé"""
+    with pytest.raises(ValueError):
+        system.get_stats(["JIRA"], group_by="assignee")